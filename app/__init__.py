@@ -15,6 +15,16 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max request size
 
+# Dashboard statistics cache: entries expire after STATS_CACHE_TTL seconds and
+# are dropped early once STATS_CACHE_MAX_STALE_WRITES predictions have been saved
+app.config['STATS_CACHE_TTL'] = float(os.environ.get('STATS_CACHE_TTL', 5))
+app.config['STATS_CACHE_MAX_ENTRIES'] = int(os.environ.get('STATS_CACHE_MAX_ENTRIES', 256))
+app.config['STATS_CACHE_MAX_STALE_WRITES'] = int(os.environ.get('STATS_CACHE_MAX_STALE_WRITES', 50))
+
+# Parquet archive of closed daily prediction partitions (interval 0 disables the exporter)
+app.config['ARCHIVE_DIR'] = os.environ.get('ARCHIVE_DIR', 'archive/predictions')
+app.config['ARCHIVE_EXPORT_INTERVAL'] = int(os.environ.get('ARCHIVE_EXPORT_INTERVAL', 3600))
+
 # Enable CORS for frontend access
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
@@ -37,6 +47,7 @@ app.logger.info('Fraud Detection API startup')
 # Pre-load model and preprocessor on startup
 try:
     from app.model_loader import model_loader
+    from app.feature_service import feature_service
     from app.database import init_database
 
     # Initialize database
@@ -45,10 +56,40 @@ try:
     # Pre-load model and preprocessor to avoid cold start on first request
     model_loader.load_model()
     model_loader.load_preprocessor()
+    feature_service.load_risk_tables()
     app.logger.info('Model and preprocessor pre-loaded successfully')
 except Exception as e:
     app.logger.warning(f'Could not pre-load model: {e}. Model will be loaded on first request.')
 
+# Background Parquet exporter for historical predictions, started by the server
+# entry point (run_api.py) rather than on import
+prediction_archiver = None
+
+def start_archiver():
+    """
+    Start the background Parquet exporter of closed prediction partitions,
+    unless ARCHIVE_EXPORT_INTERVAL is 0 or pyarrow is missing.
+
+    Returns:
+        The running PredictionArchiver, or None when disabled
+    """
+    global prediction_archiver
+
+    if app.config['ARCHIVE_EXPORT_INTERVAL'] <= 0:
+        return None
+    if prediction_archiver is not None:
+        return prediction_archiver
+
+    try:
+        from app.archive import PredictionArchiver
+
+        prediction_archiver = PredictionArchiver(archive_dir=app.config['ARCHIVE_DIR'])
+        prediction_archiver.start_background_export(app.config['ARCHIVE_EXPORT_INTERVAL'])
+        app.logger.info(f"Prediction archive exporter started ({app.config['ARCHIVE_DIR']})")
+    except ImportError as e:
+        app.logger.warning(f'Prediction archive exporter disabled: {e}')
+    return prediction_archiver
+
 # Import routes after app initialization to avoid circular imports
 from app import routes, websocket_handlers
 
@@ -0,0 +1,242 @@
+"""
+Prediction Archive Module
+Exports closed daily partitions of the predictions table to compressed, columnar
+Parquet files and queries them with partition pruning and predicate pushdown,
+so historical reporting never touches the live database.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from app import database as db
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+ARCHIVE_DIR = 'archive/predictions'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+# Columns that get min/max statistics in every row group for predicate pushdown
+STATISTICS_COLUMNS = ['timestamp', 'fraud_probability']
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError(
+            "pyarrow is required for the prediction archive. "
+            "Install it with: pip install pyarrow"
+        )
+
+def archive_schema():
+    """Arrow schema of archived prediction files"""
+    _require_pyarrow()
+    return pa.schema([
+        ('id', pa.int64()),
+        ('transaction_id', pa.string()),
+        ('timestamp', pa.timestamp('s')),
+        ('amount', pa.float64()),
+        ('merchant_state', pa.string()),
+        ('merchant_city', pa.string()),
+        ('merchant_category', pa.string()),
+        ('mcc', pa.int32()),
+        ('use_chip', pa.string()),
+        ('user_id', pa.int32()),
+        ('card_id', pa.int32()),
+        ('is_fraud', pa.int8()),
+        ('fraud_probability', pa.float64()),
+        ('risk_score', pa.float64()),
+        ('risk_level', pa.string()),
+        ('prediction_time_ms', pa.float64()),
+        ('model_version', pa.string())
+    ])
+
+def _parse_timestamp(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(str(value)[:19], TIMESTAMP_FORMAT)
+
+
+class PredictionArchiver:
+    """
+    Writes one Parquet file per closed UTC day of predictions.
+    A day is closed once the current UTC date has moved past it; closed days
+    never receive new rows, so each partition is written exactly once.
+    """
+
+    def __init__(self, archive_dir=ARCHIVE_DIR, row_group_size=100000, compression='zstd'):
+        _require_pyarrow()
+        self.archive_dir = archive_dir
+        self.row_group_size = row_group_size
+        self.compression = compression
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def partition_path(self, day):
+        """Path of the Parquet file holding one day of predictions"""
+        return os.path.join(self.archive_dir, f"date={day.strftime(DATE_FORMAT)}", 'predictions.parquet')
+
+    def exported_days(self):
+        """Get the days that already have an archive file"""
+        if not os.path.exists(self.archive_dir):
+            return []
+
+        days = []
+        for name in os.listdir(self.archive_dir):
+            if name.startswith('date=') and os.path.exists(os.path.join(self.archive_dir, name, 'predictions.parquet')):
+                days.append(datetime.strptime(name[len('date='):], DATE_FORMAT))
+        return sorted(days)
+
+    def export_closed_partitions(self, now=None):
+        """
+        Export every closed day that has not been archived yet.
+
+        Args:
+            now: Current UTC time (defaults to the system clock)
+
+        Returns:
+            List of (day, row_count) tuples for the partitions written
+        """
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        current_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        oldest, _ = db.get_prediction_time_range()
+        if oldest is None:
+            return []
+
+        # Partitions are written in order, so resume after the newest exported day
+        exported = self.exported_days()
+        if exported:
+            day = exported[-1] + timedelta(days=1)
+        else:
+            day = _parse_timestamp(oldest).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        written = []
+        while day < current_day:
+            next_day = day + timedelta(days=1)
+            rows = db.get_predictions_between(day.strftime(TIMESTAMP_FORMAT), next_day.strftime(TIMESTAMP_FORMAT))
+            if rows:
+                self._write_partition(day, rows)
+                written.append((day.strftime(DATE_FORMAT), len(rows)))
+            day = next_day
+
+        return written
+
+    def _write_partition(self, day, rows):
+        """Write one day of rows, sorted by timestamp, as an atomically renamed Parquet file"""
+        schema = archive_schema()
+        columns = {name: [row.get(name) for row in rows] for name in schema.names}
+        columns['timestamp'] = [_parse_timestamp(value) for value in columns['timestamp']]
+        table = pa.Table.from_pydict(columns, schema=schema)
+
+        path = self.partition_path(day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+
+        pq.write_table(
+            table, temp_path,
+            compression=self.compression,
+            row_group_size=self.row_group_size,
+            write_statistics=STATISTICS_COLUMNS
+        )
+        os.replace(temp_path, path)
+
+    def start_background_export(self, interval_seconds=3600):
+        """Export closed partitions now and then every interval_seconds in a daemon thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            while True:
+                try:
+                    written = self.export_closed_partitions()
+                    if written:
+                        print(f"Archived {len(written)} prediction partitions to {self.archive_dir}")
+                except Exception as e:
+                    print(f"Prediction archive export failed: {e}")
+                if self._stop_event.wait(interval_seconds):
+                    break
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=run, name='prediction-archiver', daemon=True)
+        self._thread.start()
+
+    def stop_background_export(self):
+        """Stop the background export thread"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def query_archive(start=None, end=None, min_probability=None, max_probability=None,
+                  columns=None, archive_dir=ARCHIVE_DIR):
+    """
+    Read archived predictions as a DataFrame.
+
+    Date bounds prune whole partitions; timestamp and probability bounds are
+    pushed down to row-group statistics so non-matching row groups are skipped.
+
+    Args:
+        start: Inclusive lower timestamp bound (datetime or 'YYYY-MM-DD[ HH:MM:SS]')
+        end: Exclusive upper timestamp bound
+        min_probability: Inclusive lower bound on fraud_probability
+        max_probability: Exclusive upper bound on fraud_probability
+        columns: Columns to read (defaults to all)
+        archive_dir: Archive root directory
+
+    Returns:
+        pandas DataFrame of matching predictions
+    """
+    _require_pyarrow()
+
+    if not os.path.exists(archive_dir):
+        return archive_schema().empty_table().to_pandas()
+
+    dataset = ds.dataset(
+        archive_dir,
+        format='parquet',
+        schema=archive_schema().append(pa.field('date', pa.string())),
+        partitioning=ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+    )
+
+    conditions = []
+    if start is not None:
+        start = _parse_bound(start)
+        conditions.append(ds.field('date') >= start.strftime(DATE_FORMAT))
+        conditions.append(ds.field('timestamp') >= pa.scalar(start, type=pa.timestamp('s')))
+    if end is not None:
+        end = _parse_bound(end)
+        conditions.append(ds.field('date') <= end.strftime(DATE_FORMAT))
+        conditions.append(ds.field('timestamp') < pa.scalar(end, type=pa.timestamp('s')))
+    if min_probability is not None:
+        conditions.append(ds.field('fraud_probability') >= min_probability)
+    if max_probability is not None:
+        conditions.append(ds.field('fraud_probability') < max_probability)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    columns = columns or archive_schema().names
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+def _parse_bound(value):
+    if isinstance(value, datetime):
+        return value
+    value = str(value)
+    return datetime.strptime(value, TIMESTAMP_FORMAT if len(value) > 10 else DATE_FORMAT)
+
+
+if __name__ == '__main__':
+    archiver = PredictionArchiver()
+    written = archiver.export_closed_partitions()
+    for day, row_count in written:
+        print(f"  {day}: {row_count:,} predictions")
+    print(f"Exported {len(written)} partitions to {archiver.archive_dir}")
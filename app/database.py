@@ -1,9 +1,11 @@
 """
 Database module for storing fraud detection predictions
-Uses SQLite for lightweight, serverless data storage
+Defines the storage interface used by the API and the default SQLite backend.
+Set DATABASE_URL to a postgresql:// URL to use the PostgreSQL backend instead.
 """
 
 import sqlite3
+from abc import ABC, abstractmethod
 from datetime import datetime
 import json
 import os
@@ -11,65 +13,594 @@ from contextlib import contextmanager
 
 DB_PATH = 'fraud_detection.db'
 
-@contextmanager
-def get_db_connection():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
+# Columns written for every prediction, in insert order
+PREDICTION_COLUMNS = [
+    'transaction_id', 'amount', 'merchant_state', 'merchant_city',
+    'merchant_category', 'mcc', 'use_chip', 'user_id', 'card_id',
+    'is_fraud', 'fraud_probability', 'risk_score', 'risk_level',
+    'prediction_time_ms', 'model_version'
+]
 
-def init_database():
-    """Initialize database schema"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-
-        # Predictions table - stores all fraud predictions
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS predictions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                transaction_id TEXT UNIQUE NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                amount REAL NOT NULL,
-                merchant_state TEXT,
-                merchant_city TEXT,
-                merchant_category TEXT,
-                mcc INTEGER,
-                use_chip TEXT,
-                user_id INTEGER,
-                card_id INTEGER,
-                is_fraud INTEGER NOT NULL,
-                fraud_probability REAL NOT NULL,
-                risk_score REAL NOT NULL,
-                risk_level TEXT NOT NULL,
-                prediction_time_ms REAL,
-                model_version TEXT DEFAULT '1.0.0'
+def prediction_values(prediction_data):
+    """Convert a prediction dictionary into a row tuple ordered like PREDICTION_COLUMNS"""
+    return (
+        prediction_data.get('transaction_id'),
+        prediction_data.get('amount'),
+        prediction_data.get('merchant_state'),
+        prediction_data.get('merchant_city'),
+        prediction_data.get('merchant_category'),
+        prediction_data.get('mcc'),
+        prediction_data.get('use_chip'),
+        prediction_data.get('user_id'),
+        prediction_data.get('card_id'),
+        1 if prediction_data.get('is_fraud') else 0,
+        prediction_data.get('fraud_probability'),
+        prediction_data.get('risk_score'),
+        prediction_data.get('risk_level'),
+        prediction_data.get('prediction_time_ms'),
+        prediction_data.get('model_version', '1.0.0')
+    )
+
+# High-risk transactions above this amount raise critical alerts
+CRITICAL_AMOUNT = 500
+
+ALERT_SEVERITIES = ['critical', 'high', 'medium']
+ALERT_STATUSES = ['active', 'investigating', 'resolved', 'false_positive']
+
+# Columns written for every alert, in insert order
+ALERT_COLUMNS = [
+    'prediction_id', 'transaction_id', 'severity', 'status', 'title', 'description',
+    'amount', 'merchant_city', 'merchant_state', 'fraud_probability', 'created_at'
+]
+
+def alert_severity(risk_level, amount):
+    """
+    Severity of the alert raised for a flagged prediction. high and medium
+    follow the risk level the model's decision thresholds assigned when the
+    prediction was made; high-risk transactions above CRITICAL_AMOUNT are critical.
+    """
+    if risk_level == 'high':
+        return 'critical' if abs(amount or 0) > CRITICAL_AMOUNT else 'high'
+    return 'medium'
+
+def alert_values(prediction_id, prediction_data):
+    """
+    Build the preformatted alert row for a prediction stored with is_fraud set,
+    ordered like ALERT_COLUMNS. created_at is None when the prediction timestamp
+    is not known yet, in which case the database default is used.
+    """
+    probability = prediction_data.get('fraud_probability')
+    amount = prediction_data.get('amount')
+    severity = alert_severity(prediction_data.get('risk_level'), amount)
+
+    return (
+        prediction_id,
+        prediction_data.get('transaction_id'),
+        severity,
+        'active',
+        f"Fraud Alert - {severity.upper()}",
+        f"Transaction of ${amount:.2f} flagged with {probability:.1%} fraud probability",
+        amount,
+        prediction_data.get('merchant_city'),
+        prediction_data.get('merchant_state'),
+        probability,
+        prediction_data.get('timestamp')
+    )
+
+def _paginate(query, conditions, params, limit, after_id=None, before_id=None, placeholder='?',
+              sort_column=None, table='predictions'):
+    """
+    Build a query with filters and keyset pagination on the primary key.
+
+    query is the bare SELECT ... FROM; its filters are passed separately as
+    conditions (SQL fragments ANDed together, with their params) and the
+    WHERE clause is built here together with the cursor conditions.
+
+    Without a cursor, or with before_id, rows are read newest first by seeking
+    backwards from the cursor. With after_id, rows newer than the cursor are
+    read oldest first so a poller never skips rows, then returned newest first.
+
+    With sort_column, rows are ordered by (sort_column, id) so the seek can use an
+    index that ends in sort_column; the cursor is still the row id and its
+    sort_column value is looked up by primary key.
+    """
+    params = list(params)
+    conditions = list(conditions)
+
+    if sort_column:
+        key = f'({sort_column}, id)'
+        bound = f'((SELECT {sort_column} FROM {table} WHERE id = {placeholder}), {placeholder})'
+    else:
+        key = 'id'
+        bound = placeholder
+
+    for cursor_id, operator in ((after_id, '>'), (before_id, '<')):
+        if cursor_id is not None:
+            conditions.append(f'{key} {operator} {bound}')
+            params.extend([cursor_id] * bound.count(placeholder))
+
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+
+    ascending = after_id is not None
+    direction = 'ASC' if ascending else 'DESC'
+    if sort_column:
+        query += f' ORDER BY {sort_column} {direction}, id {direction}'
+    else:
+        query += f' ORDER BY id {direction}'
+    query += f' LIMIT {placeholder}'
+    params.append(limit)
+
+    return query, params, ascending
+
+def _alert_filters(severity=None, status=None, placeholder='?'):
+    """Conditions and parameters selecting alerts by severity and status"""
+    conditions = []
+    params = []
+
+    if severity in ALERT_SEVERITIES:
+        conditions.append(f'severity = {placeholder}')
+        params.append(severity)
+    if status:
+        conditions.append(f'status = {placeholder}')
+        params.append(status)
+
+    return conditions, params
+
+
+class StorageBackend(ABC):
+    """
+    Interface for prediction storage.
+    Backends store predictions and answer the aggregate queries used by the dashboards.
+    A backend missing any of these methods can't be instantiated.
+    """
+
+    @abstractmethod
+    def init_database(self):
+        """Create tables and indices if they do not exist"""
+
+    @abstractmethod
+    def save_prediction(self, prediction_data):
+        """Save a single prediction and return its ID"""
+
+    @abstractmethod
+    def save_predictions(self, predictions):
+        """Save a batch of predictions, skipping duplicate transaction IDs, and return the number saved"""
+
+    @abstractmethod
+    def get_recent_predictions(self, limit=100, after_id=None, before_id=None):
+        """Get predictions newest first, paginated by after_id/before_id cursors"""
+
+    @abstractmethod
+    def get_fraud_statistics(self, hours=24):
+        """Get transaction, fraud count, average probability and fraud amount totals for the last N hours"""
+
+    @abstractmethod
+    def get_alerts(self, severity=None, status=None, limit=50, after_id=None, before_id=None):
+        """Get materialized alerts, newest first"""
+
+    @abstractmethod
+    def update_alert_status(self, alert_id, status):
+        """Set an alert's status and return True if the alert exists"""
+
+    @abstractmethod
+    def get_hourly_statistics(self, hours=24):
+        """Get per-hour transaction and fraud counts for the last N hours"""
+
+    @abstractmethod
+    def get_risk_distribution(self):
+        """Get prediction counts per risk level"""
+
+    @abstractmethod
+    def get_merchant_statistics(self):
+        """Get transaction and fraud statistics per merchant location"""
+
+    @abstractmethod
+    def get_prediction_time_range(self):
+        """Return (oldest, newest) prediction timestamps, or (None, None) when empty"""
+
+    @abstractmethod
+    def get_predictions_between(self, start, end):
+        """Get predictions with start <= timestamp < end, oldest first"""
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    SQLite storage for single-node deployments.
+    Lightweight and serverless, but serializes all writers.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+
+    @contextmanager
+    def get_db_connection(self):
+        """Context manager for database connections"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+    def init_database(self):
+        """Initialize database schema"""
+        if not os.path.exists(self.db_path):
+            print(f"Creating new database at {self.db_path}")
+
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            # Predictions table - stores all fraud predictions
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS predictions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    transaction_id TEXT UNIQUE NOT NULL,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    amount REAL NOT NULL,
+                    merchant_state TEXT,
+                    merchant_city TEXT,
+                    merchant_category TEXT,
+                    mcc INTEGER,
+                    use_chip TEXT,
+                    user_id INTEGER,
+                    card_id INTEGER,
+                    is_fraud INTEGER NOT NULL,
+                    fraud_probability REAL NOT NULL,
+                    risk_score REAL NOT NULL,
+                    risk_level TEXT NOT NULL,
+                    prediction_time_ms REAL,
+                    model_version TEXT DEFAULT '1.0.0'
+                )
+            ''')
+
+            # Create indices for faster queries
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_timestamp
+                ON predictions(timestamp DESC)
+            ''')
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_is_fraud
+                ON predictions(is_fraud)
+            ''')
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_risk_level
+                ON predictions(risk_level)
+            ''')
+
+            # Alerts table - materialized at write time for predictions flagged as fraud
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'alerts'")
+            alerts_table_exists = cursor.fetchone() is not None
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS alerts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    prediction_id INTEGER UNIQUE NOT NULL REFERENCES predictions(id),
+                    transaction_id TEXT NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    updated_at DATETIME,
+                    severity TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'active',
+                    title TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    amount REAL,
+                    merchant_city TEXT,
+                    merchant_state TEXT,
+                    fraud_probability REAL NOT NULL
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_alerts_severity_created
+                ON alerts(severity, created_at)
+            ''')
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_alerts_status_created
+                ON alerts(status, created_at)
+            ''')
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_alerts_created
+                ON alerts(created_at)
+            ''')
+
+            # Materialize alerts for predictions stored before the table existed
+            if not alerts_table_exists:
+                cursor.execute('''
+                    SELECT * FROM predictions
+                    WHERE is_fraud = 1
+                    ORDER BY id
+                ''')
+                self._insert_alerts(cursor, [dict(row) for row in cursor.fetchall()])
+
+            print("Database initialized successfully")
+
+    def _insert_alerts(self, cursor, prediction_rows):
+        """Insert alerts for the stored prediction rows that were flagged as fraud"""
+        cursor.executemany(f'''
+            INSERT OR IGNORE INTO alerts ({', '.join(ALERT_COLUMNS)})
+            VALUES ({', '.join('?' * (len(ALERT_COLUMNS) - 1))}, COALESCE(?, CURRENT_TIMESTAMP))
+        ''', [
+            alert_values(row['id'], row) for row in prediction_rows if row['is_fraud']
+        ])
+
+    def save_prediction(self, prediction_data):
+        """
+        Save a fraud prediction to the database
+
+        Args:
+            prediction_data: Dictionary containing prediction details
+
+        Returns:
+            int: ID of the saved prediction
+        """
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(f'''
+                INSERT INTO predictions ({', '.join(PREDICTION_COLUMNS)})
+                VALUES ({', '.join('?' * len(PREDICTION_COLUMNS))})
+            ''', prediction_values(prediction_data))
+            prediction_id = cursor.lastrowid
+
+            # Raise the alert in the same transaction as the prediction
+            if prediction_data.get('is_fraud'):
+                self._insert_alerts(cursor, [dict(prediction_data, id=prediction_id)])
+
+            return prediction_id
+
+    def save_predictions(self, predictions):
+        """
+        Save a batch of fraud predictions in a single transaction
+
+        Args:
+            predictions: List of prediction dictionaries
+
+        Returns:
+            int: Number of predictions saved (duplicates are skipped)
+        """
+        if not predictions:
+            return 0
+
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+            # Take the write lock before reading MAX(id): the driver only opens a
+            # transaction at the first INSERT, so without it another writer could
+            # commit between this read and our inserts
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM predictions')
+            last_id = cursor.fetchone()[0]
+
+            cursor.executemany(f'''
+                INSERT OR IGNORE INTO predictions ({', '.join(PREDICTION_COLUMNS)})
+                VALUES ({', '.join('?' * len(PREDICTION_COLUMNS))})
+            ''', [prediction_values(p) for p in predictions])
+
+            # The write lock is held until commit, so every row past last_id belongs to this batch
+            cursor.execute('''
+                SELECT * FROM predictions
+                WHERE id > ?
+                ORDER BY id
+            ''', (last_id,))
+            saved_rows = [dict(row) for row in cursor.fetchall()]
+            self._insert_alerts(cursor, saved_rows)
+
+            return len(saved_rows)
+
+    def get_recent_predictions(self, limit=100, after_id=None, before_id=None):
+        """
+        Get most recent predictions, newest first
+
+        Args:
+            limit: Maximum number of rows to return
+            after_id: Only return predictions with id greater than this cursor
+            before_id: Only return predictions with id less than this cursor
+        """
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+            query, params, ascending = _paginate(
+                'SELECT * FROM predictions', [], [], limit, after_id, before_id
             )
-        ''')
+            cursor.execute(query, params)
+            rows = [dict(row) for row in cursor.fetchall()]
+            return rows[::-1] if ascending else rows
+
+    def get_fraud_statistics(self, hours=24):
+        """Get fraud statistics for the last N hours"""
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            # Total transactions
+            cursor.execute('''
+                SELECT COUNT(*) as total,
+                       SUM(CASE WHEN is_fraud = 1 THEN 1 ELSE 0 END) as fraud_count,
+                       AVG(fraud_probability) as avg_fraud_prob,
+                       SUM(CASE WHEN is_fraud = 1 THEN amount ELSE 0 END) as fraud_amount
+                FROM predictions
+                WHERE timestamp >= datetime('now', '-' || ? || ' hours')
+            ''', (hours,))
+
+            result = cursor.fetchone()
+            if result:
+                return dict(result)
+            return {}
+
+    def get_alerts(self, severity=None, status=None, limit=50, after_id=None, before_id=None):
+        """
+        Get fraud alerts, newest first
+
+        Args:
+            severity: Optional 'critical', 'high' or 'medium' filter
+            status: Optional status filter (see ALERT_STATUSES)
+            limit: Maximum number of alerts to return
+            after_id: Only return alerts newer than this alert id
+            before_id: Only return alerts older than this alert id
+        """
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            conditions, params = _alert_filters(severity, status)
+            query, params, ascending = _paginate(
+                'SELECT * FROM alerts', conditions, params, limit, after_id, before_id,
+                sort_column='created_at', table='alerts'
+            )
+
+            cursor.execute(query, params)
+            rows = [dict(row) for row in cursor.fetchall()]
+            return rows[::-1] if ascending else rows
+
+    def update_alert_status(self, alert_id, status):
+        """
+        Update the status of an alert
+
+        Args:
+            alert_id: Alert ID
+            status: New status (see ALERT_STATUSES)
+
+        Returns:
+            bool: True if the alert exists
+        """
+        if status not in ALERT_STATUSES:
+            raise ValueError(f"Unknown alert status: {status}")
+
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE alerts
+                SET status = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (status, alert_id))
+            return cursor.rowcount > 0
+
+    def get_hourly_statistics(self, hours=24):
+        """Get hourly transaction statistics"""
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT
+                    strftime('%Y-%m-%d %H:00:00', timestamp) as hour,
+                    COUNT(*) as transaction_count,
+                    SUM(CASE WHEN is_fraud = 1 THEN 1 ELSE 0 END) as fraud_count,
+                    AVG(fraud_probability) as avg_fraud_prob,
+                    SUM(amount) as total_amount
+                FROM predictions
+                WHERE timestamp >= datetime('now', '-' || ? || ' hours')
+                GROUP BY hour
+                ORDER BY hour DESC
+            ''', (hours,))
+
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_risk_distribution(self):
+        """Get distribution of risk levels"""
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT
+                    risk_level,
+                    COUNT(*) as count,
+                    AVG(fraud_probability) as avg_prob
+                FROM predictions
+                GROUP BY risk_level
+            ''')
+
+            return [dict(row) for row in cursor.fetchall()]
 
-        # Create indices for faster queries
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_timestamp
-            ON predictions(timestamp DESC)
-        ''')
+    def get_merchant_statistics(self):
+        """Get statistics by merchant location"""
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT
+                    merchant_state,
+                    merchant_city,
+                    COUNT(*) as transaction_count,
+                    SUM(CASE WHEN is_fraud = 1 THEN 1 ELSE 0 END) as fraud_count,
+                    AVG(fraud_probability) as avg_fraud_prob,
+                    SUM(amount) as total_amount
+                FROM predictions
+                WHERE merchant_state IS NOT NULL
+                GROUP BY merchant_state, merchant_city
+                HAVING transaction_count > 0
+                ORDER BY fraud_count DESC
+                LIMIT 50
+            ''')
 
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_is_fraud
-            ON predictions(is_fraud)
-        ''')
+            return [dict(row) for row in cursor.fetchall()]
 
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_risk_level
-            ON predictions(risk_level)
-        ''')
+    def get_prediction_time_range(self):
+        """Get timestamps of the oldest and newest stored predictions"""
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT MIN(timestamp), MAX(timestamp) FROM predictions')
+            oldest, newest = cursor.fetchone()
+            return oldest, newest
 
-        print("Database initialized successfully")
+    def get_predictions_between(self, start, end):
+        """
+        Get predictions in a time range, oldest first
+
+        Args:
+            start: Inclusive lower bound ('YYYY-MM-DD HH:MM:SS', UTC)
+            end: Exclusive upper bound ('YYYY-MM-DD HH:MM:SS', UTC)
+        """
+        with self.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM predictions
+                WHERE timestamp >= ? AND timestamp < ?
+                ORDER BY timestamp, id
+            ''', (start, end))
+            return [dict(row) for row in cursor.fetchall()]
+
+
+def create_backend(database_url=None):
+    """
+    Create a storage backend from a database URL.
+
+    Args:
+        database_url: postgresql://... for PostgreSQL, sqlite:///path for SQLite,
+                      or None for the default SQLite file
+
+    Returns:
+        StorageBackend instance
+    """
+    if database_url and database_url.startswith(('postgres://', 'postgresql://')):
+        from app.postgres_backend import PostgresBackend
+        return PostgresBackend(database_url)
+
+    if database_url and database_url.startswith('sqlite:///'):
+        return SQLiteBackend(database_url[len('sqlite:///'):])
+
+    return SQLiteBackend(DB_PATH)
+
+_backend = None
+
+def get_backend():
+    """Get the active storage backend, creating it from DATABASE_URL on first use"""
+    global _backend
+    if _backend is None:
+        _backend = create_backend(os.environ.get('DATABASE_URL'))
+    return _backend
+
+def set_backend(backend):
+    """Replace the active storage backend"""
+    global _backend
+    _backend = backend
+
+
+# Module-level API used by the routes; delegates to the active backend
+
+def init_database():
+    """Initialize database schema"""
+    get_backend().init_database()
 
 def save_prediction(prediction_data):
     """
@@ -81,152 +612,56 @@ def save_prediction(prediction_data):
     Returns:
         int: ID of the saved prediction
     """
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO predictions (
-                transaction_id, amount, merchant_state, merchant_city,
-                merchant_category, mcc, use_chip, user_id, card_id,
-                is_fraud, fraud_probability, risk_score, risk_level,
-                prediction_time_ms, model_version
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            prediction_data.get('transaction_id'),
-            prediction_data.get('amount'),
-            prediction_data.get('merchant_state'),
-            prediction_data.get('merchant_city'),
-            prediction_data.get('merchant_category'),
-            prediction_data.get('mcc'),
-            prediction_data.get('use_chip'),
-            prediction_data.get('user_id'),
-            prediction_data.get('card_id'),
-            1 if prediction_data.get('is_fraud') else 0,
-            prediction_data.get('fraud_probability'),
-            prediction_data.get('risk_score'),
-            prediction_data.get('risk_level'),
-            prediction_data.get('prediction_time_ms'),
-            prediction_data.get('model_version', '1.0.0')
-        ))
-
-        return cursor.lastrowid
-
-def get_recent_predictions(limit=100):
-    """Get most recent predictions"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM predictions
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (limit,))
-        return [dict(row) for row in cursor.fetchall()]
+    return get_backend().save_prediction(prediction_data)
+
+def save_predictions(predictions):
+    """
+    Save a batch of fraud predictions
+
+    Args:
+        predictions: List of prediction dictionaries
+
+    Returns:
+        int: Number of predictions saved (duplicate transaction IDs are skipped)
+    """
+    return get_backend().save_predictions(predictions)
+
+def get_recent_predictions(limit=100, after_id=None, before_id=None):
+    """Get most recent predictions, newest first"""
+    return get_backend().get_recent_predictions(limit=limit, after_id=after_id, before_id=before_id)
 
 def get_fraud_statistics(hours=24):
     """Get fraud statistics for the last N hours"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-
-        # Total transactions
-        cursor.execute('''
-            SELECT COUNT(*) as total,
-                   SUM(CASE WHEN is_fraud = 1 THEN 1 ELSE 0 END) as fraud_count,
-                   AVG(fraud_probability) as avg_fraud_prob,
-                   SUM(CASE WHEN is_fraud = 1 THEN amount ELSE 0 END) as fraud_amount
-            FROM predictions
-            WHERE timestamp >= datetime('now', '-' || ? || ' hours')
-        ''', (hours,))
-
-        result = cursor.fetchone()
-        if result:
-            return dict(result)
-        return {}
-
-def get_alerts(severity=None, limit=50):
-    """Get fraud alerts (high-risk predictions)"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-
-        query = '''
-            SELECT * FROM predictions
-            WHERE fraud_probability >= 0.5
-        '''
-        params = []
-
-        if severity:
-            if severity == 'critical':
-                query += ' AND fraud_probability >= 0.9'
-            elif severity == 'high':
-                query += ' AND fraud_probability >= 0.7 AND fraud_probability < 0.9'
-            elif severity == 'medium':
-                query += ' AND fraud_probability >= 0.5 AND fraud_probability < 0.7'
-
-        query += ' ORDER BY timestamp DESC LIMIT ?'
-        params.append(limit)
-
-        cursor.execute(query, params)
-        return [dict(row) for row in cursor.fetchall()]
+    return get_backend().get_fraud_statistics(hours=hours)
+
+def get_alerts(severity=None, status=None, limit=50, after_id=None, before_id=None):
+    """Get fraud alerts, newest first"""
+    return get_backend().get_alerts(severity=severity, status=status, limit=limit,
+                                    after_id=after_id, before_id=before_id)
+
+def update_alert_status(alert_id, status):
+    """Update the status of an alert, returning True if the alert exists"""
+    return get_backend().update_alert_status(alert_id, status)
 
 def get_hourly_statistics(hours=24):
     """Get hourly transaction statistics"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT
-                strftime('%Y-%m-%d %H:00:00', timestamp) as hour,
-                COUNT(*) as transaction_count,
-                SUM(CASE WHEN is_fraud = 1 THEN 1 ELSE 0 END) as fraud_count,
-                AVG(fraud_probability) as avg_fraud_prob,
-                SUM(amount) as total_amount
-            FROM predictions
-            WHERE timestamp >= datetime('now', '-' || ? || ' hours')
-            GROUP BY hour
-            ORDER BY hour DESC
-        ''', (hours,))
-
-        return [dict(row) for row in cursor.fetchall()]
+    return get_backend().get_hourly_statistics(hours=hours)
 
 def get_risk_distribution():
     """Get distribution of risk levels"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT
-                risk_level,
-                COUNT(*) as count,
-                AVG(fraud_probability) as avg_prob
-            FROM predictions
-            GROUP BY risk_level
-        ''')
-
-        return [dict(row) for row in cursor.fetchall()]
+    return get_backend().get_risk_distribution()
 
 def get_merchant_statistics():
     """Get statistics by merchant location"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT
-                merchant_state,
-                merchant_city,
-                COUNT(*) as transaction_count,
-                SUM(CASE WHEN is_fraud = 1 THEN 1 ELSE 0 END) as fraud_count,
-                AVG(fraud_probability) as avg_fraud_prob,
-                SUM(amount) as total_amount
-            FROM predictions
-            WHERE merchant_state IS NOT NULL
-            GROUP BY merchant_state, merchant_city
-            HAVING transaction_count > 0
-            ORDER BY fraud_count DESC
-            LIMIT 50
-        ''')
-
-        return [dict(row) for row in cursor.fetchall()]
+    return get_backend().get_merchant_statistics()
+
+def get_prediction_time_range():
+    """Get timestamps of the oldest and newest stored predictions"""
+    return get_backend().get_prediction_time_range()
+
+def get_predictions_between(start, end):
+    """Get predictions with start <= timestamp < end, oldest first"""
+    return get_backend().get_predictions_between(start, end)
 
 # Initialize database on module import
-if not os.path.exists(DB_PATH):
-    print(f"Creating new database at {DB_PATH}")
-    init_database()
-else:
-    # Ensure schema is up to date
-    init_database()
+init_database()
@@ -3,6 +3,7 @@ Feature Service Module
 Real-time feature computation for incoming transactions
 """
 
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -12,13 +13,31 @@ class FeatureService:
     """
     Computes features for real-time fraud detection.
     Maintains in-memory state for velocity and behavioral features.
+
+    Count, deviation and user behavior features follow the point-in-time
+    definitions of create_all_features(point_in_time=True): each transaction
+    sees itself and the transactions before it. They are kept as running
+    counts, sums and sums of squares, so every update is O(1).
+
+    Risk score features come from the fraud rate tables that
+    feature_engineering.RiskTableBuilder saves with the model.
     """
 
+    # Risk table name -> weight in composite_risk_score, as in create_risk_scores
+    RISK_WEIGHTS = {'mcc': 0.3, 'state': 0.3, 'hour': 0.2, 'txn_type': 0.2}
+
     def __init__(self):
         # In-memory storage for transaction history
         self.transaction_history = defaultdict(list)
         self.user_profiles = {}
-        self.merchant_stats = {}
+        # Transaction counts keyed by ('merchant', name), ('mcc', code), ('state', state),
+        # ('card', index) and ('user_merchant', user, name)
+        self.merchant_stats = defaultdict(int)
+        # (count, sum, sum of squares) of amounts keyed by ('user', id) and ('mcc', code)
+        self.amount_stats = {}
+
+        self.risk_tables_path = 'models/risk_tables.npz'
+        self._risk_tables = None
 
     def compute_features(self, transaction):
         """
@@ -57,11 +76,14 @@ class FeatureService:
         features.update(self._compute_geographic_features(transaction))
 
         # User behavior features
-        features.update(self._compute_user_features(user_id))
+        features.update(self._compute_user_features(user_id, card_id, amount, timestamp, transaction))
 
         # Card features
         features.update(self._compute_card_features(transaction))
 
+        # Risk score features
+        features.update(self._compute_risk_features(timestamp, transaction))
+
         # Store transaction in history
         self._update_transaction_history(user_id, card_id, timestamp, amount, transaction)
 
@@ -95,24 +117,31 @@ class FeatureService:
         }
 
         # Deviation from user average
-        if user_id in self.user_profiles:
-            user_avg = self.user_profiles[user_id].get('avg_amount', amount)
-            user_std = self.user_profiles[user_id].get('std_amount', 1)
-            features['amount_vs_user_avg'] = (amount - user_avg) / (user_std + 1)
-        else:
-            features['amount_vs_user_avg'] = 0
+        user_avg, user_std = self._prior_mean_std(('user', user_id), amount)
+        features['amount_vs_user_avg'] = (amount - user_avg) / (user_std + 1)
 
         # Merchant category deviation
         mcc = transaction.get('MCC', 0)
-        if mcc in self.merchant_stats:
-            mcc_avg = self.merchant_stats[mcc].get('avg_amount', amount)
-            mcc_std = self.merchant_stats[mcc].get('std_amount', 1)
-            features['amount_vs_mcc_avg'] = (amount - mcc_avg) / (mcc_std + 1)
-        else:
-            features['amount_vs_mcc_avg'] = 0
+        mcc_avg, mcc_std = self._prior_mean_std(('mcc', mcc), amount)
+        features['amount_vs_mcc_avg'] = (amount - mcc_avg) / (mcc_std + 1)
 
         return features
 
+    def _prior_mean_std(self, key, amount):
+        """
+        Mean and sample standard deviation of earlier amounts for key.
+        Without earlier amounts the mean is the current amount; the standard
+        deviation is 0 until there are two.
+        """
+        count, total, total_sq = self.amount_stats.get(key, (0, 0.0, 0.0))
+        if count == 0:
+            return amount, 0.0
+        mean = total / count
+        if count == 1:
+            return mean, 0.0
+        variance = (total_sq - total * total / count) / (count - 1)
+        return mean, np.sqrt(max(variance, 0.0))
+
     def _compute_velocity_features(self, user_id, card_id, timestamp, amount):
         """Compute transaction velocity features"""
         key = f"{user_id}_{card_id}"
@@ -136,12 +165,13 @@ class FeatureService:
         one_day_ago = timestamp - timedelta(days=1)
         seven_days_ago = timestamp - timedelta(days=7)
 
-        txn_count_1h = sum(1 for txn in history if txn['timestamp'] >= one_hour_ago)
-        txn_count_24h = sum(1 for txn in history if txn['timestamp'] >= one_day_ago)
-        txn_count_7d = sum(1 for txn in history if txn['timestamp'] >= seven_days_ago)
+        # Windows are (start, now], like the offline rolling windows
+        txn_count_1h = sum(1 for txn in history if txn['timestamp'] > one_hour_ago)
+        txn_count_24h = sum(1 for txn in history if txn['timestamp'] > one_day_ago)
+        txn_count_7d = sum(1 for txn in history if txn['timestamp'] > seven_days_ago)
 
         # Amount sum in last 24 hours
-        amount_sum_24h = sum(txn['amount'] for txn in history if txn['timestamp'] >= one_day_ago)
+        amount_sum_24h = sum(txn['amount'] for txn in history if txn['timestamp'] > one_day_ago)
 
         return {
             'time_since_last_txn': time_since_last,
@@ -163,14 +193,14 @@ class FeatureService:
             'is_chip_txn': 1 if 'Chip' in use_chip else 0,
             'is_swipe_txn': 1 if 'Swipe' in use_chip else 0,
             'is_online_txn': 1 if 'Online' in use_chip else 0,
-            'merchant_txn_count': self.merchant_stats.get(merchant_name, {}).get('count', 1),
-            'mcc_frequency': self.merchant_stats.get(mcc, {}).get('frequency', 1)
+            'merchant_txn_count': self.merchant_stats.get(('merchant', merchant_name), 0) + 1,
+            'mcc_frequency': self.merchant_stats.get(('mcc', mcc), 0) + 1
         }
 
         # First time with merchant
-        user_key = f"{user_id}_{merchant_name}"
-        features['is_first_merchant_txn'] = 1 if user_key not in self.user_profiles else 0
-        features['user_merchant_txn_count'] = self.user_profiles.get(user_key, {}).get('count', 0)
+        user_merchant_count = self.merchant_stats.get(('user_merchant', user_id, merchant_name), 0) + 1
+        features['is_first_merchant_txn'] = 1 if user_merchant_count == 1 else 0
+        features['user_merchant_txn_count'] = user_merchant_count
 
         return features
 
@@ -188,19 +218,33 @@ class FeatureService:
             'is_high_risk_state': 1 if state in high_risk_states else 0,
             'is_primary_state': 1 if state in primary_states else 0,
             'missing_geo_data': 1 if not state or pd.isna(state) else 0,
-            'state_txn_count': self.merchant_stats.get(f"state_{state}", {}).get('count', 1)
+            'state_txn_count': 0 if not state or pd.isna(state) else
+                               self.merchant_stats.get(('state', state), 0) + 1
         }
 
-    def _compute_user_features(self, user_id):
-        """Compute user behavior features"""
-        profile = self.user_profiles.get(user_id, {})
+    def _compute_user_features(self, user_id, card_id, amount, timestamp, transaction):
+        """Compute user behavior features over the user's history including this transaction"""
+        profile = self.user_profiles.get(user_id)
+        if profile is None:
+            return {
+                'user_card_count': 1,
+                'user_merchant_diversity': 1,
+                'user_mcc_diversity': 1,
+                'user_avg_amount': amount,
+                'user_txn_per_day': 1.0
+            }
 
+        txn_count = profile['txn_count'] + 1
+        # Transactions can arrive out of time order, so count days from the earliest one seen
+        first_seen = min(profile['first_seen'], timestamp)
+        active_days = max((timestamp - first_seen).days + 1, 1)
         return {
-            'user_card_count': profile.get('card_count', 1),
-            'user_merchant_diversity': profile.get('merchant_diversity', 1),
-            'user_mcc_diversity': profile.get('mcc_diversity', 1),
-            'user_avg_amount': profile.get('avg_amount', 50),
-            'user_txn_per_day': profile.get('txn_per_day', 1)
+            'user_card_count': len(profile['cards']) + (card_id not in profile['cards']),
+            'user_merchant_diversity': len(profile['merchants']) +
+                                       (transaction.get('Merchant Name', 0) not in profile['merchants']),
+            'user_mcc_diversity': len(profile['mccs']) + (transaction.get('MCC', 0) not in profile['mccs']),
+            'user_avg_amount': (profile['amount_sum'] + amount) / txn_count,
+            'user_txn_per_day': txn_count / active_days
         }
 
     def _compute_card_features(self, transaction):
@@ -209,7 +253,7 @@ class FeatureService:
 
         # Placeholder values - in production, fetch from card database
         return {
-            'card_txn_count': 1,
+            'card_txn_count': self.merchant_stats.get(('card', card_id), 0) + 1,
             'card_on_dark_web': 0,
             'card_has_chip': 1,
             'chip_mismatch': 0,
@@ -219,6 +263,56 @@ class FeatureService:
             'is_credit': 0
         }
 
+    def load_risk_tables(self, force_reload=False):
+        """
+        Load the fraud rate tables into dictionaries.
+
+        Args:
+            force_reload: Force reload even if the tables are cached
+
+        Returns:
+            Dictionary of table name -> {key: rate}, plus 'global_rate',
+            or None if no tables have been built
+        """
+        if self._risk_tables is None or force_reload:
+            if not os.path.exists(self.risk_tables_path):
+                print(f"Risk tables not found at {self.risk_tables_path}, "
+                      "risk score features will be left to their defaults")
+                self._risk_tables = {}
+                return None
+
+            with np.load(self.risk_tables_path) as arrays:
+                tables = {'global_rate': float(arrays['global_rate'])}
+                for name in self.RISK_WEIGHTS:
+                    tables[name] = dict(zip(arrays[f'{name}_keys'].tolist(),
+                                            arrays[f'{name}_rates'].tolist()))
+            self._risk_tables = tables
+            print(f"Risk tables loaded from {self.risk_tables_path}")
+
+        return self._risk_tables or None
+
+    def _compute_risk_features(self, timestamp, transaction):
+        """Look up fraud rates by MCC, state, hour and transaction type"""
+        tables = self.load_risk_tables()
+        if tables is None:
+            return {}
+
+        keys = {
+            'mcc': transaction.get('MCC', 0),
+            'state': transaction.get('Merchant State', ''),
+            'hour': timestamp.hour,
+            'txn_type': transaction.get('Use Chip', 'Swipe Transaction')
+        }
+        global_rate = tables['global_rate']
+        features = {
+            f'{name}_fraud_rate': tables[name].get(key, global_rate)
+            for name, key in keys.items()
+        }
+        features['composite_risk_score'] = sum(
+            features[f'{name}_fraud_rate'] * weight for name, weight in self.RISK_WEIGHTS.items()
+        )
+        return features
+
     def _update_transaction_history(self, user_id, card_id, timestamp, amount, transaction):
         """Store transaction in history for velocity calculations"""
         key = f"{user_id}_{card_id}"
@@ -239,26 +333,47 @@ class FeatureService:
             if txn['timestamp'] >= seven_days_ago
         ]
 
-        # Update user profile
-        self._update_user_profile(user_id, amount, transaction)
+        # Update running aggregates
+        self._update_aggregates(user_id, card_id, timestamp, amount, transaction)
+
+    def _update_aggregates(self, user_id, card_id, timestamp, amount, transaction):
+        """Add a transaction to the running counts, amount moments and user profile"""
+        merchant_name = transaction.get('Merchant Name', 0)
+        mcc = transaction.get('MCC', 0)
+        state = transaction.get('Merchant State', '')
+
+        self.merchant_stats[('merchant', merchant_name)] += 1
+        self.merchant_stats[('mcc', mcc)] += 1
+        self.merchant_stats[('card', card_id)] += 1
+        self.merchant_stats[('user_merchant', user_id, merchant_name)] += 1
+        if state and not pd.isna(state):
+            self.merchant_stats[('state', state)] += 1
 
-    def _update_user_profile(self, user_id, amount, transaction):
+        for key in [('user', user_id), ('mcc', mcc)]:
+            count, total, total_sq = self.amount_stats.get(key, (0, 0.0, 0.0))
+            self.amount_stats[key] = (count + 1, total + amount, total_sq + amount * amount)
+
+        self._update_user_profile(user_id, card_id, timestamp, amount, transaction)
+
+    def _update_user_profile(self, user_id, card_id, timestamp, amount, transaction):
         """Update user behavioral profile"""
         if user_id not in self.user_profiles:
             self.user_profiles[user_id] = {
-                'avg_amount': amount,
-                'std_amount': 0,
-                'card_count': 1,
-                'merchant_diversity': 1,
-                'mcc_diversity': 1,
-                'txn_count': 1,
-                'txn_per_day': 1
+                'first_seen': timestamp,
+                'txn_count': 0,
+                'amount_sum': 0.0,
+                'cards': set(),
+                'merchants': set(),
+                'mccs': set()
             }
-        else:
-            profile = self.user_profiles[user_id]
-            profile['txn_count'] += 1
-            # Update running average
-            profile['avg_amount'] = (profile['avg_amount'] * (profile['txn_count'] - 1) + amount) / profile['txn_count']
+
+        profile = self.user_profiles[user_id]
+        profile['first_seen'] = min(profile['first_seen'], timestamp)
+        profile['txn_count'] += 1
+        profile['amount_sum'] += amount
+        profile['cards'].add(card_id)
+        profile['merchants'].add(transaction.get('Merchant Name', 0))
+        profile['mccs'].add(transaction.get('MCC', 0))
 
 
 # Global feature service instance
@@ -4,9 +4,14 @@ Handles loading and caching of trained ML models and preprocessors
 """
 
 import joblib
+import math
 import os
 from datetime import datetime
 
+# Decision thresholds for models saved without optimized ones (same as
+# model_training.py): medium risk is flagged as fraud, high risk is blocked
+DEFAULT_THRESHOLDS = {'medium': 0.5, 'high': 0.8}
+
 class ModelLoader:
     """
     Singleton class to load and cache fraud detection models.
@@ -16,6 +21,7 @@ class ModelLoader:
     _instance = None
     _model = None
     _preprocessor = None
+    _thresholds = None
     _model_loaded_at = None
 
     def __new__(cls):
@@ -48,11 +54,38 @@ class ModelLoader:
             print(f"Loading model from {self.model_path}...")
             model_data = joblib.load(self.model_path)
             self._model = model_data['model']
+            self._thresholds = model_data.get('thresholds', DEFAULT_THRESHOLDS)
+            if not all(math.isfinite(value) for value in self._thresholds.values()):
+                # A model that never flags anything, and thresholds that aren't valid JSON
+                print(f"Warning: saved thresholds {self._thresholds} are not finite, "
+                      f"using the defaults {DEFAULT_THRESHOLDS}")
+                self._thresholds = DEFAULT_THRESHOLDS
             self._model_loaded_at = datetime.now()
             print(f"Model loaded successfully at {self._model_loaded_at}")
 
         return self._model
 
+    def get_thresholds(self):
+        """
+        Decision thresholds saved with the model by model_training.py.
+
+        Returns:
+            Dictionary with 'medium' (flagged as fraud) and 'high' (blocked)
+            fraud probability thresholds
+        """
+        if self._model is None:
+            self.load_model()
+        return self._thresholds
+
+    def risk_level(self, probability):
+        """Risk level ('high', 'medium' or 'low') of a fraud probability"""
+        thresholds = self.get_thresholds()
+        if probability >= thresholds['high']:
+            return 'high'
+        elif probability >= thresholds['medium']:
+            return 'medium'
+        return 'low'
+
     def load_preprocessor(self, force_reload=False):
         """
         Load the data preprocessor pipeline.
@@ -90,6 +123,7 @@ class ModelLoader:
             'model_type': type(self._model).__name__,
             'loaded_at': self._model_loaded_at.isoformat() if self._model_loaded_at else None,
             'model_path': self.model_path,
+            'thresholds': self._thresholds,
             'version': '1.0.0'
         }
 
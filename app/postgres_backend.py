@@ -0,0 +1,344 @@
+"""
+PostgreSQL Storage Backend
+Prediction storage for multi-node deployments, selected with DATABASE_URL=postgresql://...
+Uses a thread-safe connection pool and COPY for batched prediction logging.
+"""
+
+import csv
+import io
+import os
+from contextlib import contextmanager
+from decimal import Decimal
+
+from app.database import (
+    StorageBackend, PREDICTION_COLUMNS, ALERT_COLUMNS, ALERT_STATUSES,
+    prediction_values, alert_values, _paginate, _alert_filters
+)
+
+try:
+    import psycopg2
+    from psycopg2.extras import RealDictCursor, execute_values
+    from psycopg2.pool import ThreadedConnectionPool
+except ImportError:  # pragma: no cover - optional dependency
+    psycopg2 = None
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class PostgresBackend(StorageBackend):
+    """
+    PostgreSQL storage backend.
+    Concurrent writers from several API nodes share one database; batched
+    predictions are streamed in with COPY instead of row-by-row INSERTs.
+    """
+
+    def __init__(self, dsn, min_connections=1, max_connections=None):
+        if psycopg2 is None:
+            raise ImportError(
+                "psycopg2 is required for the PostgreSQL backend. "
+                "Install it with: pip install psycopg2-binary"
+            )
+
+        if max_connections is None:
+            max_connections = int(os.environ.get('DB_POOL_MAX_CONNECTIONS', 10))
+
+        self.dsn = dsn
+        self.pool = ThreadedConnectionPool(min_connections, max_connections, dsn)
+
+    @contextmanager
+    def get_db_connection(self):
+        """Borrow a pooled connection, committing on success and rolling back on error"""
+        conn = self.pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            self.pool.putconn(conn)
+
+    def close(self):
+        """Close all pooled connections"""
+        self.pool.closeall()
+
+    def _fetch_all(self, query, params=()):
+        with self.get_db_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(query, params)
+                return [_to_python(row) for row in cursor.fetchall()]
+
+    def init_database(self):
+        """Initialize database schema"""
+        with self.get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                # Predictions table - stores all fraud predictions
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS predictions (
+                        id BIGSERIAL PRIMARY KEY,
+                        transaction_id TEXT UNIQUE NOT NULL,
+                        timestamp TIMESTAMP DEFAULT (NOW() AT TIME ZONE 'UTC'),
+                        amount DOUBLE PRECISION NOT NULL,
+                        merchant_state TEXT,
+                        merchant_city TEXT,
+                        merchant_category TEXT,
+                        mcc INTEGER,
+                        use_chip TEXT,
+                        user_id INTEGER,
+                        card_id INTEGER,
+                        is_fraud INTEGER NOT NULL,
+                        fraud_probability DOUBLE PRECISION NOT NULL,
+                        risk_score DOUBLE PRECISION NOT NULL,
+                        risk_level TEXT NOT NULL,
+                        prediction_time_ms DOUBLE PRECISION,
+                        model_version TEXT DEFAULT '1.0.0'
+                    )
+                ''')
+
+                # Create indices for faster queries
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_timestamp ON predictions(timestamp DESC)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_is_fraud ON predictions(is_fraud)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_risk_level ON predictions(risk_level)')
+
+                # Alerts table - materialized at write time for predictions flagged as fraud
+                cursor.execute("SELECT to_regclass('alerts') IS NOT NULL")
+                alerts_table_exists = cursor.fetchone()[0]
+
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS alerts (
+                        id BIGSERIAL PRIMARY KEY,
+                        prediction_id BIGINT UNIQUE NOT NULL REFERENCES predictions(id),
+                        transaction_id TEXT NOT NULL,
+                        created_at TIMESTAMP DEFAULT (NOW() AT TIME ZONE 'UTC'),
+                        updated_at TIMESTAMP,
+                        severity TEXT NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'active',
+                        title TEXT NOT NULL,
+                        description TEXT NOT NULL,
+                        amount DOUBLE PRECISION,
+                        merchant_city TEXT,
+                        merchant_state TEXT,
+                        fraud_probability DOUBLE PRECISION NOT NULL
+                    )
+                ''')
+
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_severity_created ON alerts(severity, created_at, id)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_status_created ON alerts(status, created_at, id)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_created ON alerts(created_at, id)')
+
+                # Materialize alerts for predictions stored before the table existed
+                if not alerts_table_exists:
+                    cursor.execute('''
+                        SELECT id, transaction_id, timestamp, amount, merchant_city,
+                               merchant_state, is_fraud, fraud_probability, risk_level
+                        FROM predictions
+                        WHERE is_fraud = 1
+                        ORDER BY id
+                    ''')
+                    self._insert_alerts(cursor, _rows_as_dicts(cursor))
+
+        print("Database initialized successfully")
+
+    def _insert_alerts(self, cursor, prediction_rows):
+        """Insert alerts for the stored prediction rows that were flagged as fraud"""
+        rows = [alert_values(row['id'], row) for row in prediction_rows if row['is_fraud']]
+        if rows:
+            execute_values(cursor, f'''
+                INSERT INTO alerts ({', '.join(ALERT_COLUMNS)})
+                VALUES %s
+                ON CONFLICT (prediction_id) DO NOTHING
+            ''', rows, template=f"({', '.join(['%s'] * (len(ALERT_COLUMNS) - 1))}, "
+                                "COALESCE(%s, NOW() AT TIME ZONE 'UTC'))")
+
+    def save_prediction(self, prediction_data):
+        """
+        Save a fraud prediction to the database
+
+        Args:
+            prediction_data: Dictionary containing prediction details
+
+        Returns:
+            int: ID of the saved prediction
+        """
+        with self.get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f'''
+                    INSERT INTO predictions ({', '.join(PREDICTION_COLUMNS)})
+                    VALUES ({', '.join(['%s'] * len(PREDICTION_COLUMNS))})
+                    RETURNING id, timestamp
+                ''', prediction_values(prediction_data))
+                prediction_id, timestamp = cursor.fetchone()
+
+                # Raise the alert in the same transaction as the prediction
+                if prediction_data.get('is_fraud'):
+                    self._insert_alerts(cursor, [dict(prediction_data, id=prediction_id, timestamp=timestamp)])
+
+                return prediction_id
+
+    def save_predictions(self, predictions):
+        """
+        Bulk-load a batch of predictions with COPY.
+
+        Rows are streamed into a temporary staging table and then merged with
+        ON CONFLICT DO NOTHING, so a duplicate transaction ID does not abort
+        the whole batch.
+
+        Args:
+            predictions: List of prediction dictionaries
+
+        Returns:
+            int: Number of predictions saved
+        """
+        if not predictions:
+            return 0
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for prediction in predictions:
+            # Empty unquoted fields are read back as NULL by COPY ... CSV
+            writer.writerow(['' if value is None else value for value in prediction_values(prediction)])
+        buffer.seek(0)
+
+        columns = ', '.join(PREDICTION_COLUMNS)
+        with self.get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f'''
+                    CREATE TEMP TABLE predictions_staging ON COMMIT DROP AS
+                    SELECT {columns} FROM predictions WITH NO DATA
+                ''')
+                cursor.execute('ALTER TABLE predictions_staging ADD COLUMN row_order SERIAL')
+                cursor.copy_expert(
+                    f'COPY predictions_staging ({columns}) FROM STDIN WITH (FORMAT csv)',
+                    buffer
+                )
+                cursor.execute(f'''
+                    INSERT INTO predictions ({columns})
+                    SELECT {columns} FROM predictions_staging
+                    ORDER BY row_order
+                    ON CONFLICT (transaction_id) DO NOTHING
+                    RETURNING id, transaction_id, timestamp, amount, merchant_city,
+                              merchant_state, is_fraud, fraud_probability, risk_level
+                ''')
+                saved_rows = _rows_as_dicts(cursor)
+                self._insert_alerts(cursor, saved_rows)
+                return len(saved_rows)
+
+    def get_recent_predictions(self, limit=100, after_id=None, before_id=None):
+        """Get most recent predictions, newest first"""
+        query, params, ascending = _paginate(
+            'SELECT * FROM predictions', [], [], limit, after_id, before_id, placeholder='%s'
+        )
+        rows = self._fetch_all(query, params)
+        return rows[::-1] if ascending else rows
+
+    def get_fraud_statistics(self, hours=24):
+        """Get fraud statistics for the last N hours"""
+        rows = self._fetch_all('''
+            SELECT COUNT(*) as total,
+                   SUM(CASE WHEN is_fraud = 1 THEN 1 ELSE 0 END) as fraud_count,
+                   AVG(fraud_probability) as avg_fraud_prob,
+                   SUM(CASE WHEN is_fraud = 1 THEN amount ELSE 0 END) as fraud_amount
+            FROM predictions
+            WHERE timestamp >= (NOW() AT TIME ZONE 'UTC') - %s * INTERVAL '1 hour'
+        ''', (hours,))
+        return rows[0] if rows else {}
+
+    def get_alerts(self, severity=None, status=None, limit=50, after_id=None, before_id=None):
+        """Get fraud alerts, newest first"""
+        conditions, params = _alert_filters(severity, status, placeholder='%s')
+        query, params, ascending = _paginate(
+            'SELECT * FROM alerts', conditions, params, limit, after_id, before_id,
+            placeholder='%s', sort_column='created_at', table='alerts'
+        )
+        rows = self._fetch_all(query, params)
+        return rows[::-1] if ascending else rows
+
+    def update_alert_status(self, alert_id, status):
+        """Update the status of an alert, returning True if the alert exists"""
+        if status not in ALERT_STATUSES:
+            raise ValueError(f"Unknown alert status: {status}")
+
+        with self.get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                    UPDATE alerts
+                    SET status = %s, updated_at = NOW() AT TIME ZONE 'UTC'
+                    WHERE id = %s
+                ''', (status, alert_id))
+                return cursor.rowcount > 0
+
+    def get_hourly_statistics(self, hours=24):
+        """Get hourly transaction statistics"""
+        return self._fetch_all('''
+            SELECT
+                to_char(date_trunc('hour', timestamp), 'YYYY-MM-DD HH24:00:00') as hour,
+                COUNT(*) as transaction_count,
+                SUM(CASE WHEN is_fraud = 1 THEN 1 ELSE 0 END) as fraud_count,
+                AVG(fraud_probability) as avg_fraud_prob,
+                SUM(amount) as total_amount
+            FROM predictions
+            WHERE timestamp >= (NOW() AT TIME ZONE 'UTC') - %s * INTERVAL '1 hour'
+            GROUP BY hour
+            ORDER BY hour DESC
+        ''', (hours,))
+
+    def get_risk_distribution(self):
+        """Get distribution of risk levels"""
+        return self._fetch_all('''
+            SELECT
+                risk_level,
+                COUNT(*) as count,
+                AVG(fraud_probability) as avg_prob
+            FROM predictions
+            GROUP BY risk_level
+        ''')
+
+    def get_merchant_statistics(self):
+        """Get statistics by merchant location"""
+        return self._fetch_all('''
+            SELECT
+                merchant_state,
+                merchant_city,
+                COUNT(*) as transaction_count,
+                SUM(CASE WHEN is_fraud = 1 THEN 1 ELSE 0 END) as fraud_count,
+                AVG(fraud_probability) as avg_fraud_prob,
+                SUM(amount) as total_amount
+            FROM predictions
+            WHERE merchant_state IS NOT NULL
+            GROUP BY merchant_state, merchant_city
+            HAVING COUNT(*) > 0
+            ORDER BY fraud_count DESC
+            LIMIT 50
+        ''')
+
+    def get_prediction_time_range(self):
+        """Get timestamps of the oldest and newest stored predictions"""
+        row = self._fetch_all('SELECT MIN(timestamp) as oldest, MAX(timestamp) as newest FROM predictions')[0]
+        return row['oldest'], row['newest']
+
+    def get_predictions_between(self, start, end):
+        """Get predictions with start <= timestamp < end, oldest first"""
+        return self._fetch_all('''
+            SELECT * FROM predictions
+            WHERE timestamp >= %s AND timestamp < %s
+            ORDER BY timestamp, id
+        ''', (start, end))
+
+
+def _rows_as_dicts(cursor):
+    """Fetch the remaining rows of a plain cursor as dictionaries"""
+    names = [column.name for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+def _to_python(row):
+    """
+    Convert a PostgreSQL row into the same plain types the SQLite backend returns,
+    so API responses look identical regardless of backend.
+    """
+    result = dict(row)
+    for key, value in result.items():
+        if hasattr(value, 'strftime'):
+            result[key] = value.strftime(TIMESTAMP_FORMAT)
+        elif isinstance(value, Decimal):
+            result[key] = float(value)
+    return result
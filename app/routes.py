@@ -11,9 +11,124 @@ from app import database as db
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from collections import OrderedDict
+import threading
 import traceback
 import time
 
+
+class StatisticsCache:
+    """
+    Thread-safe, size-bounded TTL cache for dashboard aggregate queries.
+    Concurrent misses on the same key are coalesced so only one caller runs
+    the query while the others wait for its result.
+    """
+
+    def __init__(self, ttl_seconds=5.0, max_entries=256, max_stale_writes=50):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_stale_writes = max_stale_writes
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight = {}           # key -> threading.Event
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._writes_since_invalidation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, calling compute() on a miss.
+
+        Args:
+            key: Hashable cache key (endpoint name plus query parameters)
+            compute: Zero-argument callable that produces the value
+
+        Returns:
+            Cached or freshly computed value
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+
+                pending = self._in_flight.get(key)
+                if pending is None:
+                    pending = threading.Event()
+                    self._in_flight[key] = pending
+                    self.misses += 1
+                    generation = self._generation
+                    break
+                self.coalesced += 1
+
+            # Another request is already running this query, wait for its result
+            pending.wait()
+
+        try:
+            value = compute()
+            with self._lock:
+                # Skip storing results computed across an invalidation
+                if generation == self._generation:
+                    self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            pending.set()
+
+    def record_write(self, count=1):
+        """Count saved predictions and invalidate once the staleness bound is reached"""
+        with self._lock:
+            self._writes_since_invalidation += count
+            if self._writes_since_invalidation >= self.max_stale_writes:
+                self._invalidate_locked()
+
+    def invalidate(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._invalidate_locked()
+
+    def _invalidate_locked(self):
+        self._entries.clear()
+        self._generation += 1
+        self._writes_since_invalidation = 0
+        self.invalidations += 1
+
+    def get_stats(self):
+        """Get cache counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups > 0 else 0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'max_stale_writes': self.max_stale_writes,
+                'writes_since_invalidation': self._writes_since_invalidation
+            }
+
+
+# Shared cache for the dashboard statistics endpoints
+stats_cache = StatisticsCache(
+    ttl_seconds=app.config['STATS_CACHE_TTL'],
+    max_entries=app.config['STATS_CACHE_MAX_ENTRIES'],
+    max_stale_writes=app.config['STATS_CACHE_MAX_STALE_WRITES']
+)
+
 @app.route('/')
 def index():
     """API root endpoint"""
@@ -26,7 +141,8 @@ def index():
             'predict': '/api/predict',
             'batch_predict': '/api/predict/batch',
             'model_info': '/api/model/info',
-            'statistics': '/api/statistics'
+            'statistics': '/api/statistics',
+            'cache_stats': '/api/cache/stats'
         }
     })
 
@@ -123,20 +239,13 @@ def predict_fraud():
         # Track prediction time
         start_time = time.time()
 
-        # Make prediction
-        prediction = model.predict(features_scaled)[0]
+        # Make prediction (flagged at the model's medium risk threshold)
         probability = model.predict_proba(features_scaled)[0][1]
+        risk_level = model_loader.risk_level(probability)
+        prediction = risk_level != 'low'
 
         prediction_time_ms = (time.time() - start_time) * 1000
 
-        # Determine risk level
-        if probability >= 0.80:
-            risk_level = 'high'
-        elif probability >= 0.50:
-            risk_level = 'medium'
-        else:
-            risk_level = 'low'
-
         # Generate transaction ID
         transaction_id = transaction.get('transaction_id', f"txn_{int(datetime.now().timestamp() * 1000)}")
 
@@ -172,6 +281,7 @@ def predict_fraud():
                 'model_version': '1.0.0'
             }
             db.save_prediction(db_record)
+            stats_cache.record_write()
         except Exception as e:
             app.logger.warning(f"Failed to save prediction to database: {str(e)}")
 
@@ -218,7 +328,9 @@ def predict_batch():
         preprocessor = model_loader.load_preprocessor()
 
         results = []
+        db_records = []
         fraud_count = 0
+        batch_id = int(datetime.now().timestamp() * 1000)
 
         for txn in transactions:
             # Compute features
@@ -234,19 +346,46 @@ def predict_batch():
 
             # Scale and predict
             features_scaled = preprocessor['scaler'].transform(feature_df)
-            prediction = model.predict(features_scaled)[0]
             probability = model.predict_proba(features_scaled)[0][1]
+            risk_level = model_loader.risk_level(probability)
+            prediction = risk_level != 'low'
 
             if prediction:
                 fraud_count += 1
 
+            transaction_id = txn.get('transaction_id', f"txn_{batch_id}_{len(results)}")
+
             results.append({
-                'transaction_id': txn.get('transaction_id', f"txn_{len(results)}"),
+                'transaction_id': transaction_id,
                 'is_fraud': bool(prediction),
                 'fraud_probability': float(probability),
-                'risk_level': 'high' if probability >= 0.80 else 'medium' if probability >= 0.50 else 'low'
+                'risk_level': risk_level
             })
 
+            db_records.append({
+                'transaction_id': transaction_id,
+                'amount': float(txn.get('Amount', 0)),
+                'merchant_state': txn.get('Merchant State'),
+                'merchant_city': txn.get('Merchant City'),
+                'merchant_category': txn.get('Merchant Category'),
+                'mcc': txn.get('MCC'),
+                'use_chip': txn.get('Use Chip'),
+                'user_id': txn.get('User'),
+                'card_id': txn.get('Card'),
+                'is_fraud': bool(prediction),
+                'fraud_probability': float(probability),
+                'risk_score': float(probability * 100),
+                'risk_level': risk_level,
+                'model_version': '1.0.0'
+            })
+
+        # Log the whole batch in one bulk write
+        try:
+            saved = db.save_predictions(db_records)
+            stats_cache.record_write(saved)
+        except Exception as e:
+            app.logger.warning(f"Failed to save batch predictions to database: {str(e)}")
+
         return jsonify({
             'predictions': results,
             'total': len(transactions),
@@ -293,7 +432,9 @@ def reload_model():
 def get_statistics():
     """Get API usage statistics from real predictions"""
     try:
-        stats = db.get_fraud_statistics(hours=24)
+        stats = stats_cache.get_or_compute(
+            ('statistics', 24), lambda: db.get_fraud_statistics(hours=24)
+        )
 
         total = stats.get('total', 0)
         fraud_count = stats.get('fraud_count', 0)
@@ -321,47 +462,92 @@ def get_alerts():
     """Get fraud alerts for dashboard"""
     try:
         severity = request.args.get('severity')
+        status = request.args.get('status')
         limit = int(request.args.get('limit', 50))
+        after_id = request.args.get('after_id', type=int)
+        before_id = request.args.get('before_id', type=int)
 
-        alerts = db.get_alerts(severity=severity, limit=limit)
+        # Fetch one extra row to know whether another page exists
+        alerts = db.get_alerts(severity=severity, status=status, limit=limit + 1,
+                               after_id=after_id, before_id=before_id)
+        alerts, cursor = _paginate_rows(alerts, limit, after_id)
 
-        # Transform for frontend
+        # Alerts are stored preformatted, only rename fields for the frontend
         formatted_alerts = []
         for alert in alerts:
-            severity_level = 'critical' if alert['fraud_probability'] >= 0.9 else \
-                           'high' if alert['fraud_probability'] >= 0.7 else 'medium'
-
             formatted_alerts.append({
                 'id': alert['id'],
                 'transaction_id': alert['transaction_id'],
-                'title': f"Fraud Alert - {severity_level.upper()}",
-                'description': f"Transaction of ${alert['amount']:.2f} flagged with {alert['fraud_probability']:.1%} fraud probability",
-                'severity': severity_level,
-                'timestamp': alert['timestamp'],
+                'title': alert['title'],
+                'description': alert['description'],
+                'severity': alert['severity'],
+                'timestamp': alert['created_at'],
                 'amount': alert['amount'],
                 'merchant_city': alert['merchant_city'],
                 'merchant_state': alert['merchant_state'],
                 'risk_score': alert['fraud_probability'],
-                'status': 'active'
+                'status': alert['status']
             })
 
-        return jsonify({'alerts': formatted_alerts}), 200
+        return jsonify({'alerts': formatted_alerts, 'cursor': cursor}), 200
 
     except Exception as e:
         app.logger.error(f"Alerts error: {str(e)}")
         return jsonify({'alerts': []}), 200
 
+@app.route('/api/dashboard/alerts/<int:alert_id>/status', methods=['PUT'])
+def update_alert_status(alert_id):
+    """
+    Update the status of an alert.
+
+    Expected JSON body:
+    {
+        "status": "active/investigating/resolved/false_positive"
+    }
+    """
+    try:
+        data = request.get_json() or {}
+        status = data.get('status')
+
+        if status not in db.ALERT_STATUSES:
+            return jsonify({
+                'error': 'Invalid status',
+                'valid_statuses': db.ALERT_STATUSES
+            }), 400
+
+        if not db.update_alert_status(alert_id, status):
+            return jsonify({'error': 'Alert not found'}), 404
+
+        return jsonify({
+            'id': alert_id,
+            'status': status,
+            'updated_at': datetime.now().isoformat()
+        }), 200
+
+    except Exception as e:
+        app.logger.error(f"Alert status update error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to update alert status',
+            'message': str(e)
+        }), 500
+
 @app.route('/api/dashboard/recent-transactions', methods=['GET'])
 def get_recent_transactions():
     """Get recent transactions for monitoring dashboard"""
     try:
         limit = int(request.args.get('limit', 100))
-        predictions = db.get_recent_predictions(limit=limit)
+        after_id = request.args.get('after_id', type=int)
+        before_id = request.args.get('before_id', type=int)
+
+        predictions = db.get_recent_predictions(limit=limit + 1,
+                                                after_id=after_id, before_id=before_id)
+        predictions, cursor = _paginate_rows(predictions, limit, after_id)
 
         # Format for frontend
         transactions = []
         for pred in predictions:
             transactions.append({
+                'id': pred['id'],
                 'transaction_id': pred['transaction_id'],
                 'timestamp': pred['timestamp'],
                 'amount': pred['amount'],
@@ -374,7 +560,7 @@ def get_recent_transactions():
                 'confidence': pred['fraud_probability']
             })
 
-        return jsonify({'transactions': transactions}), 200
+        return jsonify({'transactions': transactions, 'cursor': cursor}), 200
 
     except Exception as e:
         app.logger.error(f"Recent transactions error: {str(e)}")
@@ -385,7 +571,9 @@ def get_hourly_stats():
     """Get hourly statistics for charts"""
     try:
         hours = int(request.args.get('hours', 24))
-        stats = db.get_hourly_statistics(hours=hours)
+        stats = stats_cache.get_or_compute(
+            ('hourly_stats', hours), lambda: db.get_hourly_statistics(hours=hours)
+        )
 
         return jsonify({'hourly_stats': stats}), 200
 
@@ -397,7 +585,9 @@ def get_hourly_stats():
 def get_risk_dist():
     """Get risk level distribution"""
     try:
-        distribution = db.get_risk_distribution()
+        distribution = stats_cache.get_or_compute(
+            ('risk_distribution',), db.get_risk_distribution
+        )
         return jsonify({'distribution': distribution}), 200
 
     except Exception as e:
@@ -408,18 +598,47 @@ def get_risk_dist():
 def get_merchant_stats():
     """Get merchant statistics"""
     try:
-        stats = db.get_merchant_statistics()
+        stats = stats_cache.get_or_compute(
+            ('merchant_stats',), db.get_merchant_statistics
+        )
         return jsonify({'merchant_stats': stats}), 200
 
     except Exception as e:
         app.logger.error(f"Merchant stats error: {str(e)}")
         return jsonify({'merchant_stats': []}), 200
 
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get hit/miss counters for the dashboard statistics cache"""
+    return jsonify(stats_cache.get_stats()), 200
+
+def _paginate_rows(rows, limit, after_id):
+    """
+    Trim the look-ahead row from a keyset page and build the cursors for the next request.
+
+    Rows arrive newest first. Pollers pass cursor['after_id'] back as after_id to
+    fetch only newer rows; pagers pass cursor['before_id'] back as before_id to
+    walk further into history. has_more reports whether another page exists in
+    the direction being read.
+    """
+    has_more = len(rows) > limit
+    if has_more:
+        # With after_id the look-ahead row is the newest one, otherwise the oldest
+        rows = rows[1:] if after_id is not None else rows[:limit]
+
+    cursor = {
+        'after_id': rows[0]['id'] if rows else after_id,
+        'before_id': rows[-1]['id'] if rows else None,
+        'has_more': has_more
+    }
+    return rows, cursor
+
 def _get_recommendation(probability):
-    """Get action recommendation based on fraud probability"""
-    if probability >= 0.80:
+    """Get action recommendation based on fraud probability and the model's thresholds"""
+    risk_level = model_loader.risk_level(probability)
+    if risk_level == 'high':
         return "BLOCK: High fraud risk - block transaction and require manual review"
-    elif probability >= 0.50:
+    elif risk_level == 'medium':
         return "CHALLENGE: Medium risk - require additional authentication (2FA/SMS)"
     else:
         return "ALLOW: Low risk - approve transaction with passive monitoring"
@@ -5,6 +5,8 @@ Handles Socket.IO events for live fraud detection alerts
 
 from flask_socketio import emit, join_room, leave_room
 from app import socketio, app
+from app.model_loader import model_loader
+from app.database import alert_severity
 from datetime import datetime
 import random
 
@@ -110,14 +112,11 @@ def _calculate_severity(probability, amount):
     Returns:
         str: 'critical', 'high', 'medium', or 'low'
     """
-    if probability >= 0.90 and amount > 500:
-        return 'critical'
-    elif probability >= 0.80:
-        return 'high'
-    elif probability >= 0.50:
-        return 'medium'
-    else:
+    risk_level = model_loader.risk_level(probability)
+    if risk_level == 'low':
         return 'low'
+    # Same rule as the alerts stored on the dashboard
+    return alert_severity(risk_level, amount)
 
 # Import request from flask
 from flask import request
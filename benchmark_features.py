@@ -0,0 +1,220 @@
+"""
+Feature Engineering Benchmarks
+Times optimized feature steps against the implementations they replaced,
+checks that both produce the same values, and reports peak memory.
+
+Run with: python benchmark_features.py [--rows 1000000] [--datetime-rows 1000000 5000000 24000000]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from data_analysis import build_datetime
+from feature_engineering import FraudFeatureEngine
+
+
+def make_transactions(n_rows, n_users=2000, cards_per_user=3, seed=42):
+    """
+    Generate synthetic transactions shaped like the IBM dataset.
+
+    Args:
+        n_rows: Number of transactions
+        n_users: Number of distinct users
+        cards_per_user: Maximum cards per user
+        seed: Random seed
+
+    Returns:
+        DataFrame sorted by User, Card and DateTime
+    """
+    rng = np.random.default_rng(seed)
+
+    start = np.datetime64('2000-01-01T00:00', 'm').astype(np.int64)
+    minutes = start + rng.integers(0, 20 * 365 * 24 * 60, n_rows)
+
+    df = pd.DataFrame({
+        'User': rng.integers(0, n_users, n_rows),
+        'Card': rng.integers(0, cards_per_user, n_rows),
+        'DateTime': minutes.astype('datetime64[m]').astype('datetime64[ns]'),
+        'Amount': np.round(rng.gamma(2.0, 40.0, n_rows), 2),
+        'MCC': rng.choice([5411, 5912, 5814, 7995, 5541, 5311], n_rows),
+        'Merchant State': rng.choice(['CA', 'NY', 'TX', 'FL', 'OH', 'Italy', None], n_rows)
+    })
+    df['Zip'] = np.where(df['Merchant State'].isna(), np.nan, rng.integers(10000, 99999, n_rows))
+    df = df.sort_values(['User', 'Card', 'DateTime']).reset_index(drop=True)
+
+    df['Year'] = df['DateTime'].dt.year
+    df['Month'] = df['DateTime'].dt.month
+    df['Day'] = df['DateTime'].dt.day
+    df['Time'] = df['DateTime'].dt.strftime('%H:%M')
+    return df
+
+
+def measure(func, df):
+    """
+    Return (result, seconds, peak traced MB) for func(df).
+    Tracing slows allocation-heavy code, so time and memory come from separate runs.
+    """
+    start = time.perf_counter()
+    result = func(df.copy())
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(df.copy())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 1024**2
+
+
+def compare(name, baseline, optimized, columns):
+    """Print timing for two (result, seconds, peak) tuples and check their columns match"""
+    base_result, base_seconds, base_peak = baseline
+    opt_result, opt_seconds, opt_peak = optimized
+
+    # Optimized steps store ratios and durations as float32, so compare at float32 precision
+    for column in columns:
+        if pd.api.types.is_datetime64_any_dtype(base_result[column]):
+            if not base_result[column].equals(opt_result[column].astype(base_result[column].dtype)):
+                raise AssertionError(f"{name}: {column} differs from the baseline implementation")
+            continue
+        if not np.allclose(base_result[column], opt_result[column], rtol=1e-6, atol=1e-6, equal_nan=True):
+            raise AssertionError(f"{name}: {column} differs from the baseline implementation")
+
+    print(f"\n{name}")
+    print(f"  baseline:  {base_seconds:8.2f}s  peak {base_peak:8.1f} MB")
+    print(f"  optimized: {opt_seconds:8.2f}s  peak {opt_peak:8.1f} MB")
+    print(f"  speedup:   {base_seconds / opt_seconds:8.1f}x  (outputs match)")
+
+
+def legacy_velocity_features(df):
+    """groupby().rolling() velocity features, as implemented before the window kernel"""
+    df = df.sort_values(['User', 'Card', 'DateTime']).reset_index(drop=True)
+
+    df['time_since_last_txn'] = df.groupby(['User', 'Card'])['DateTime'].diff().dt.total_seconds()
+    df['time_since_last_txn'] = df['time_since_last_txn'].fillna(86400)
+
+    for column, window, aggregation in [('txn_count_1h', '1h', 'count'),
+                                        ('txn_count_24h', '24h', 'count'),
+                                        ('txn_count_7d', '7D', 'count'),
+                                        ('amount_sum_24h', '24h', 'sum')]:
+        rolling = df.groupby(['User', 'Card']).rolling(window=window, on='DateTime')['Amount']
+        df[column] = getattr(rolling, aggregation)().reset_index(drop=True)
+        df[column] = df[column].fillna(1)
+
+    return df
+
+
+def benchmark_velocity(df):
+    engine = FraudFeatureEngine(verbose=False)
+    columns = ['time_since_last_txn', 'txn_count_1h', 'txn_count_24h', 'txn_count_7d', 'amount_sum_24h']
+    base = df[['User', 'Card', 'DateTime', 'Amount']]
+
+    compare(
+        'Velocity features (groupby().rolling() vs window kernel)',
+        measure(legacy_velocity_features, base),
+        measure(engine.create_velocity_features, base),
+        columns
+    )
+
+
+def legacy_geographic_features(df):
+    """Geographic features with a per-user Series.mode() primary state, as implemented before"""
+    state_txn_counts = df['Merchant State'].value_counts()
+    df['state_txn_count'] = df['Merchant State'].map(state_txn_counts).fillna(0)
+
+    international_states = ['Mexico', 'Italy', 'Poland', 'Philippines', 'Peru',
+                            'Pakistan', 'China', 'Japan', 'Canada', 'UK']
+    df['is_international'] = df['Merchant State'].isin(international_states).astype(int)
+    df['is_high_risk_state'] = df['Merchant State'].isin(['Italy', 'OH']).astype(int)
+    df['is_primary_state'] = df['Merchant State'].isin(['CA', 'NY']).astype(int)
+    df['missing_geo_data'] = (df['Merchant State'].isna() | df['Zip'].isna()).astype(int)
+
+    user_primary_state = df.groupby('User')['Merchant State'].agg(
+        lambda x: x.mode()[0] if len(x.mode()) > 0 else None
+    )
+    df['is_user_primary_state'] = (
+        df['Merchant State'] == df['User'].map(user_primary_state)
+    ).astype(int)
+    return df
+
+
+def benchmark_primary_state(df):
+    engine = FraudFeatureEngine(verbose=False)
+    base = df[['User', 'Merchant State', 'Zip']]
+
+    compare(
+        'Geographic features (per-user mode() vs value-count primary state)',
+        measure(legacy_geographic_features, base),
+        measure(engine.create_geographic_features, base),
+        ['state_txn_count', 'is_user_primary_state']
+    )
+
+
+def make_date_columns(n_rows, seed=42):
+    """
+    Generate only the Year/Month/Day/Time columns, with the dtypes load_data reads them as.
+    Cheap enough to build at the size of the full dataset.
+    """
+    rng = np.random.default_rng(seed)
+    days = np.datetime64('2000-01-01') + rng.integers(0, 20 * 365, n_rows).astype('timedelta64[D]')
+    dates = pd.DatetimeIndex(days)
+    times = [f"{hour:02d}:{minute:02d}" for hour in range(24) for minute in range(60)]
+
+    return pd.DataFrame({
+        'Year': dates.year.astype(np.int16),
+        'Month': dates.month.astype(np.int8),
+        'Day': dates.day.astype(np.int8),
+        'Time': pd.Categorical.from_codes(rng.integers(0, len(times), n_rows), categories=times)
+    })
+
+
+def legacy_datetime(df):
+    """DateTime from string-concatenated date components, as built before"""
+    df['DateTime'] = pd.to_datetime(
+        df['Year'].astype(str) + '-' +
+        df['Month'].astype(str) + '-' +
+        df['Day'].astype(str) + ' ' +
+        df['Time'].astype(str)
+    )
+    return df
+
+
+def numeric_datetime(df):
+    df['DateTime'] = build_datetime(df)
+    return df
+
+
+def benchmark_datetime(n_rows):
+    dates = make_date_columns(n_rows)
+
+    compare(
+        f'DateTime construction, {n_rows:,} rows (string parsing vs numeric assembly)',
+        measure(legacy_datetime, dates),
+        measure(numeric_datetime, dates),
+        ['DateTime']
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark feature engineering steps')
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of synthetic transactions')
+    parser.add_argument('--users', type=int, default=2000, help='Number of synthetic users')
+    parser.add_argument('--datetime-rows', type=int, nargs='*', default=[1000000, 5000000],
+                        help='Row counts for the DateTime benchmark (the full dataset has 24M)')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("FEATURE ENGINEERING BENCHMARKS")
+    print("=" * 80)
+    print(f"\nGenerating {args.rows:,} synthetic transactions for {args.users:,} users...")
+    transactions = make_transactions(args.rows, n_users=args.users)
+
+    benchmark_velocity(transactions)
+    benchmark_primary_state(transactions)
+    del transactions
+
+    for n_rows in args.datetime_rows:
+        benchmark_datetime(n_rows)
@@ -0,0 +1,106 @@
+"""
+Class Imbalance Benchmarks
+Compares the resampling methods of FraudDataPreprocessor.handle_class_imbalance
+on a synthetic dataset with the fraud rate of the real one: resampling time,
+peak memory, training set size, LightGBM training time and test PR-AUC.
+
+Run with: python benchmark_imbalance.py [--rows 1000000] [--methods none smote downsample]
+"""
+
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn.datasets import make_classification
+from sklearn.metrics import average_precision_score
+from sklearn.model_selection import train_test_split
+
+from data_preprocessing import FraudDataPreprocessor
+from model_training import FraudModelTrainer
+
+METHODS = ['none', 'smote', 'undersample', 'downsample', 'minority_smote']
+
+
+def make_imbalanced_data(n_rows, n_features=30, fraud_rate=0.0013, seed=42):
+    """
+    Generate a float32 classification problem with fraud_rate positives.
+
+    Returns:
+        X_train, X_test, y_train, y_test (stratified 80/20 split)
+    """
+    X, y = make_classification(
+        n_samples=n_rows,
+        n_features=n_features,
+        n_informative=10,
+        n_redundant=5,
+        weights=[1 - fraud_rate],
+        flip_y=0,
+        class_sep=0.8,
+        random_state=seed
+    )
+    return train_test_split(X.astype(np.float32), y.astype(np.int8), test_size=0.2,
+                            stratify=y, random_state=seed)
+
+
+def benchmark_method(method, X_train, y_train, X_test, y_test, sampling_strategy):
+    """
+    Resample with one method, train LightGBM on the result and score it.
+
+    Returns:
+        Dictionary of measurements
+    """
+    preprocessor = FraudDataPreprocessor()
+    quiet = io.StringIO()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(quiet):
+        X_resampled, y_resampled = preprocessor.handle_class_imbalance(
+            X_train, y_train, method=method, sampling_strategy=sampling_strategy
+        )
+    resample_seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(quiet):
+        model = FraudModelTrainer().train_lightgbm(X_resampled, y_resampled,
+                                                   sample_weight=preprocessor.sample_weight)
+    train_seconds = time.perf_counter() - start
+
+    return {
+        'rows': len(y_resampled),
+        'resample_seconds': resample_seconds,
+        'peak_mb': peak / 1024**2,
+        'train_seconds': train_seconds,
+        'pr_auc': average_precision_score(y_test, model.predict_proba(X_test)[:, 1])
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark class imbalance handling methods')
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of synthetic transactions')
+    parser.add_argument('--fraud-rate', type=float, default=0.0013, help='Fraction of fraudulent transactions')
+    parser.add_argument('--sampling-strategy', default='0.1',
+                        help="Target minority / majority ratio after resampling ('auto' for 1)")
+    parser.add_argument('--methods', nargs='*', default=METHODS, choices=METHODS + ['smotetomek'],
+                        help='Methods to compare (smotetomek searches neighbours over all rows and is slow)')
+    args = parser.parse_args()
+
+    sampling_strategy = args.sampling_strategy if args.sampling_strategy == 'auto' else float(args.sampling_strategy)
+
+    print("=" * 80)
+    print("CLASS IMBALANCE BENCHMARKS")
+    print("=" * 80)
+    print(f"\nGenerating {args.rows:,} synthetic transactions ({args.fraud_rate:.2%} fraud)...")
+    X_train, X_test, y_train, y_test = make_imbalanced_data(args.rows, fraud_rate=args.fraud_rate)
+    print(f"Training set: {len(y_train):,} rows, {int(y_train.sum()):,} fraud")
+
+    print(f"\n{'method':<16}{'rows':>12}{'resample':>11}{'peak MB':>10}{'train':>9}{'PR-AUC':>9}")
+    for method in args.methods:
+        result = benchmark_method(method, X_train, y_train, X_test, y_test, sampling_strategy)
+        print(f"{method:<16}{result['rows']:>12,}{result['resample_seconds']:>10.2f}s"
+              f"{result['peak_mb']:>10.1f}{result['train_seconds']:>8.2f}s{result['pr_auc']:>9.4f}")
@@ -62,6 +62,9 @@ def proxy_alerts():
         params = {'limit': limit}
         if severity:
             params['severity'] = severity
+        for cursor_arg in ('after_id', 'before_id'):
+            if request.args.get(cursor_arg):
+                params[cursor_arg] = request.args.get(cursor_arg)
 
         response = requests.get(f"{API_BASE_URL}/api/dashboard/alerts", params=params, timeout=5)
         return jsonify(response.json()), response.status_code
@@ -72,9 +75,12 @@ def proxy_alerts():
 def proxy_transactions():
     """Proxy for transactions API"""
     try:
-        limit = request.args.get('limit', 100)
+        params = {'limit': request.args.get('limit', 100)}
+        for cursor_arg in ('after_id', 'before_id'):
+            if request.args.get(cursor_arg):
+                params[cursor_arg] = request.args.get(cursor_arg)
         response = requests.get(f"{API_BASE_URL}/api/dashboard/recent-transactions",
-                              params={'limit': limit}, timeout=5)
+                              params=params, timeout=5)
         return jsonify(response.json()), response.status_code
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -9,6 +9,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
+from dataset_cache import DatasetCache
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -17,22 +18,113 @@ pd.set_option('display.max_columns', None)
 pd.set_option('display.width', None)
 pd.set_option('display.max_colwidth', None)
 
+# Explicit dtypes for the transactions file. Small integer types and categoricals
+# take a fraction of the memory of pandas' int64/object defaults.
+TRANSACTION_DTYPES = {
+    'User': 'int16',
+    'Card': 'int8',
+    'Year': 'int16',
+    'Month': 'int8',
+    'Day': 'int8',
+    'Time': 'category',
+    'Use Chip': 'category',
+    'Merchant Name': 'int64',
+    'Merchant City': 'category',
+    'Merchant State': 'category',
+    'Zip': 'float32',
+    'MCC': 'int16',
+    'Errors?': 'category',
+    'Is Fraud?': 'category'
+}
+
+# Bump when TRANSACTION_DTYPES or _clean_transactions change, to invalidate cached copies
+RAW_DATA_VERSION = 2
+
+def transaction_dtypes(categorical=True):
+    """
+    Dtypes to read the transactions file with.
+
+    Args:
+        categorical: Use categoricals for string columns. Chunked readers pass
+                     False, since each chunk would infer different categories.
+    """
+    if categorical:
+        return dict(TRANSACTION_DTYPES)
+    return {column: dtype for column, dtype in TRANSACTION_DTYPES.items() if dtype != 'category'}
+
+def time_to_minutes(time):
+    """
+    Minutes since midnight for 'HH:MM' time strings.
+    Each distinct value is parsed once: a day has at most 1,440 of them.
+
+    Args:
+        time: Series of 'HH:MM' strings (object, string or categorical)
+
+    Returns:
+        int64 numpy array
+    """
+    codes, uniques = pd.factorize(time)
+    parts = pd.Series(uniques).astype(str).str.split(':', expand=True)
+    minutes = parts[0].astype(np.int64).to_numpy() * 60 + parts[1].astype(np.int64).to_numpy()
+    return minutes[codes]
+
+def build_datetime(df):
+    """
+    Assemble a datetime64[ns] column from the Year, Month, Day and Time columns.
+
+    The date is built arithmetically from the integer fields and Time is
+    parsed via time_to_minutes(), instead of formatting every row as a string
+    and parsing it back with pd.to_datetime. Rows with missing components
+    fall back to the string parser.
+
+    Args:
+        df: Transactions with Year, Month, Day and Time columns
+
+    Returns:
+        Series of datetime64[ns] aligned with df
+    """
+    components = df[['Year', 'Month', 'Day', 'Time']]
+    if components.isna().any().any():
+        return pd.to_datetime(
+            df['Year'].astype(str) + '-' +
+            df['Month'].astype(str) + '-' +
+            df['Day'].astype(str) + ' ' +
+            df['Time'].astype(str)
+        )
+
+    year = df['Year'].to_numpy(dtype=np.int64)
+    month = df['Month'].to_numpy(dtype=np.int64)
+    day = df['Day'].to_numpy(dtype=np.int64)
+
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    days = months.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')
+    if np.any(days.astype('datetime64[M]') != months):
+        raise ValueError("Day is out of range for month")
+    minutes = days.astype('datetime64[m]') + time_to_minutes(df['Time']).astype('timedelta64[m]')
+    return pd.Series(minutes.astype('datetime64[ns]'), index=df.index, name='DateTime')
+
 class CreditCardDataAnalyzer:
     """
     Handles exploratory data analysis for credit card transaction data.
     Provides methods to understand data structure, distributions, and patterns.
     """
 
-    def __init__(self, data_dir='detection_data'):
+    def __init__(self, data_dir='detection_data', use_cache=True):
         self.data_dir = data_dir
+        self.cache = DatasetCache(f'{data_dir}/cache') if use_cache else None
         self.transactions_df = None
         self.cards_df = None
         self.users_df = None
 
+    @property
+    def transactions_path(self):
+        return f'{self.data_dir}/credit_card_transactions-ibm_v2.csv'
+
     def load_data(self, sample_size=None):
         """
         Load the dataset files into memory.
-        Using chunking for large files to avoid memory issues.
+        Cleaned transactions are cached as Parquet, so later runs on an
+        unchanged CSV skip parsing and cleaning.
 
         Args:
             sample_size: Number of rows to load (None for all data)
@@ -42,41 +134,101 @@ class CreditCardDataAnalyzer:
         print("=" * 80)
 
         # Load main transaction file
-        transactions_path = f'{self.data_dir}/credit_card_transactions-ibm_v2.csv'
-        print(f"\nLoading transactions from: {transactions_path}")
+        print(f"\nLoading transactions from: {self.transactions_path}")
+
+        if self.cache is None:
+            self.transactions_df = self._read_transactions(sample_size)
+        else:
+            self.transactions_df = self.cache.get_or_create(
+                'transactions', [self.transactions_path],
+                lambda: self._read_transactions(sample_size),
+                version=RAW_DATA_VERSION, sample_size=sample_size
+            )
 
+        print(f"Loaded {len(self.transactions_df):,} transactions")
+
+        self.load_supplementary_data()
+
+        print("\nData loading completed successfully")
+
+    def _read_transactions(self, sample_size=None):
+        """Parse and clean the transactions CSV"""
         if sample_size:
             print(f"Loading sample of {sample_size:,} rows for initial analysis...")
-            self.transactions_df = pd.read_csv(transactions_path, nrows=sample_size)
+            df = pd.read_csv(self.transactions_path, nrows=sample_size, dtype=transaction_dtypes())
         else:
             print("Loading full dataset (this may take a while)...")
-            self.transactions_df = pd.read_csv(transactions_path)
+            df = pd.read_csv(self.transactions_path, dtype=transaction_dtypes())
 
-        print(f"Loaded {len(self.transactions_df):,} transactions")
+        return self._clean_transactions(df)
 
+    def _clean_transactions(self, df, verbose=True):
+        """
+        Convert raw transaction columns to analysis-ready types.
+
+        Args:
+            df: Raw transactions as read from the CSV
+            verbose: Whether to print progress messages
+
+        Returns:
+            The same dataframe with Amount, fraud label and DateTime converted
+        """
         # Clean and convert the Amount column
-        if 'Amount' in self.transactions_df.columns:
-            print("Converting Amount column to numeric...")
-            self.transactions_df['Amount'] = self.transactions_df['Amount'].str.replace('$', '').str.replace(',', '').astype(float)
+        if 'Amount' in df.columns and not pd.api.types.is_numeric_dtype(df['Amount']):
+            if verbose:
+                print("Converting Amount column to numeric...")
+            df['Amount'] = df['Amount'].str.replace('$', '').str.replace(',', '').astype(float)
 
         # Convert fraud column to binary
-        fraud_columns = [col for col in self.transactions_df.columns
+        fraud_columns = [col for col in df.columns
                         if 'fraud' in col.lower() or 'is_fraud' in col.lower()]
         if fraud_columns:
             fraud_col = fraud_columns[0]
-            print(f"Converting {fraud_col} column to binary...")
-            self.transactions_df[fraud_col] = (self.transactions_df[fraud_col] == 'Yes').astype(int)
+            if verbose:
+                print(f"Converting {fraud_col} column to binary...")
+            df[fraud_col] = (df[fraud_col] == 'Yes').astype(np.int8)
 
         # Create proper datetime column from Year, Month, Day, Time
-        if all(col in self.transactions_df.columns for col in ['Year', 'Month', 'Day', 'Time']):
-            print("Creating datetime column from date components...")
-            self.transactions_df['DateTime'] = pd.to_datetime(
-                self.transactions_df['Year'].astype(str) + '-' +
-                self.transactions_df['Month'].astype(str) + '-' +
-                self.transactions_df['Day'].astype(str) + ' ' +
-                self.transactions_df['Time'].astype(str)
-            )
+        if all(col in df.columns for col in ['Year', 'Month', 'Day', 'Time']):
+            if verbose:
+                print("Creating datetime column from date components...")
+            df['DateTime'] = build_datetime(df)
+
+        return df
+
+    def iter_transaction_chunks(self, chunksize=500000):
+        """
+        Stream the full transactions file in cleaned chunks.
+        Memory use is bounded by the chunk size rather than the file size.
+
+        Args:
+            chunksize: Number of rows per chunk
 
+        Yields:
+            Cleaned transaction dataframes of up to chunksize rows
+        """
+        for chunk in pd.read_csv(self.transactions_path, chunksize=chunksize,
+                                 dtype=transaction_dtypes(categorical=False)):
+            yield self._clean_transactions(chunk, verbose=False)
+
+    def read_new_transactions(self, path):
+        """
+        Read and clean a file of newly arrived transactions in the same
+        format as the main transactions file.
+
+        Args:
+            path: CSV file of new transactions
+
+        Returns:
+            Cleaned transactions dataframe
+        """
+        df = pd.read_csv(path, dtype=transaction_dtypes(categorical=False))
+        return self._clean_transactions(df, verbose=False)
+
+    def load_supplementary_data(self):
+        """
+        Load the card and user detail files, which are small enough to keep in memory.
+        """
         # Load supplementary files
         try:
             self.cards_df = pd.read_csv(f'{self.data_dir}/sd254_cards.csv')
@@ -90,8 +242,6 @@ class CreditCardDataAnalyzer:
         except FileNotFoundError:
             print("Users data file not found, skipping...")
 
-        print("\nData loading completed successfully")
-
     def basic_info(self):
         """
         Display basic information about the dataset structure and contents.
@@ -280,7 +430,7 @@ class CreditCardDataAnalyzer:
             if fraud_columns and len(value_counts) < 1000:
                 fraud_col = fraud_columns[0]
                 try:
-                    fraud_by_merchant = self.transactions_df.groupby(col)[fraud_col].agg(['sum', 'count', 'mean'])
+                    fraud_by_merchant = self.transactions_df.groupby(col, observed=True)[fraud_col].agg(['sum', 'count', 'mean'])
                     fraud_by_merchant.columns = ['Fraud_Count', 'Total_Transactions', 'Fraud_Rate']
                     fraud_by_merchant = fraud_by_merchant.sort_values('Fraud_Rate', ascending=False)
 
@@ -11,9 +11,327 @@ from imblearn.over_sampling import SMOTE
 from imblearn.under_sampling import RandomUnderSampler
 from imblearn.combine import SMOTETomek
 import joblib
+import os
+from dataset_cache import ArrayStore, frame_hash
 import warnings
 warnings.filterwarnings('ignore')
 
+# Scaled float32 train/test matrices written by prepare_data_out_of_core
+ARRAYS_DIR = 'detection_data/arrays'
+
+# Time-ordered splits written by TemporalSplitter.split_to_disk
+SPLITS_DIR = 'detection_data/splits'
+
+# Encoded matrices, split indices and resampled training sets reused across runs
+ARTIFACTS_DIR = 'detection_data/artifacts'
+
+# Bump when imputation or encoding change, to invalidate stored artifacts
+PREPROCESSING_VERSION = 1
+
+def encode_labels(values, classes):
+    """
+    Label-encode a column against the classes of a fitted LabelEncoder.
+
+    Values are compared as strings, like LabelEncoder.fit_transform(values.astype(str)).
+    Each distinct value is looked up once in a hash index of the classes, so
+    the cost is linear in the rows rather than rows x classes; categorical
+    columns are factorized from their codes without touching the strings.
+
+    Args:
+        values: Series to encode
+        classes: Fitted classes (LabelEncoder.classes_)
+
+    Returns:
+        int64 array of codes; values not in classes get len(classes)
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    lookup = pd.Index(classes).get_indexer(pd.Index(uniques).astype(str))
+    lookup[lookup < 0] = len(classes)
+    return lookup.astype(np.int64)[codes]
+
+def majority_fraction(n_minority, n_majority, sampling_strategy='auto'):
+    """
+    Fraction of majority rows to keep so that minority / majority reaches
+    sampling_strategy, as in RandomUnderSampler ('auto' balances the classes).
+    """
+    ratio = 1.0 if sampling_strategy == 'auto' else float(sampling_strategy)
+    if n_majority == 0:
+        return 1.0
+    return min(1.0, n_minority / (ratio * n_majority))
+
+def smote_sample_count(n_minority, n_majority, sampling_strategy='auto'):
+    """Synthetic minority rows needed for minority / majority to reach sampling_strategy, as in SMOTE"""
+    ratio = 1.0 if sampling_strategy == 'auto' else float(sampling_strategy)
+    return max(0, int(ratio * n_majority) - n_minority)
+
+def downsample_majority(y, fraction, uniform):
+    """
+    Stratified majority downsampling. Every minority row is kept; a majority
+    row is kept when its uniform draw is below fraction and then weighted
+    1 / fraction, so weighted class totals match the original data.
+
+    Args:
+        y: Labels
+        fraction: Probability of keeping a majority row
+        uniform: One U(0, 1) draw per row
+
+    Returns:
+        (keep mask, float32 sample weights of the kept rows)
+    """
+    y = np.asarray(y)
+    keep = (y == 1) | (uniform < fraction)
+    weights = np.where(y[keep] == 1, 1.0, 1.0 / fraction).astype(np.float32)
+    return keep, weights
+
+def smote_minority(X_minority, n_samples, k_neighbors=5, random_state=42, chunksize=100000):
+    """
+    SMOTE that only touches minority rows: the k-NN search runs over
+    X_minority alone, and synthetic rows are generated chunksize at a time
+    so they can be written out without materializing them all.
+
+    Args:
+        X_minority: Minority class feature matrix
+        n_samples: Number of synthetic rows to generate
+        k_neighbors: Neighbours to interpolate towards
+        random_state: Random seed
+        chunksize: Rows per yielded chunk
+
+    Yields:
+        Arrays of synthetic rows with the dtype of X_minority
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    X_minority = np.asarray(X_minority)
+    if n_samples == 0 or len(X_minority) < 2:
+        return
+    k = min(k_neighbors, len(X_minority) - 1)
+    neighbors = NearestNeighbors(n_neighbors=k + 1).fit(X_minority).kneighbors(
+        X_minority, return_distance=False
+    )[:, 1:]
+
+    rng = np.random.default_rng(random_state)
+    for start in range(0, n_samples, chunksize):
+        n = min(chunksize, n_samples - start)
+        base = rng.integers(0, len(X_minority), n)
+        neighbor = neighbors[base, rng.integers(0, k, n)]
+        gap = rng.random((n, 1)).astype(X_minority.dtype)
+        yield X_minority[base] + gap * (X_minority[neighbor] - X_minority[base])
+
+def iter_feature_chunks(path, chunksize=500000):
+    """
+    Stream an engineered feature file (Parquet or CSV) in chunks.
+
+    Args:
+        path: Feature file, as returned by feature_engineering.feature_dataset_path()
+        chunksize: Rows per chunk
+
+    Yields:
+        DataFrames of up to chunksize rows
+    """
+    if path.endswith('.parquet'):
+        from dataset_cache import iter_parquet_chunks
+        yield from iter_parquet_chunks(path, chunksize=chunksize)
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+def load_arrays(directory=ARRAYS_DIR):
+    """
+    Open the matrices written by prepare_data_out_of_core as read-only memory maps.
+
+    Args:
+        directory: Directory with X_train.npy, X_test.npy, y_train.npy and y_test.npy
+
+    Returns:
+        X_train, X_test, y_train, y_test
+    """
+    return tuple(
+        np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+        for name in ['X_train', 'X_test', 'y_train', 'y_test']
+    )
+
+def _as_datetimes(values):
+    """DateTime column of a chunk as datetime64 (CSV chunks hold strings)"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values)
+
+def time_quantiles(path, fractions, chunksize=500000):
+    """
+    Approximate DateTime quantiles of a feature file, to day precision.
+    Only the DateTime column is read, counted per day in one streaming pass.
+
+    Args:
+        path: Parquet or CSV file of engineered features
+        fractions: Fractions of rows that should fall before each cutoff
+        chunksize: Rows per chunk
+
+    Returns:
+        List of midnight Timestamps, one per fraction
+    """
+    if path.endswith('.parquet'):
+        from dataset_cache import iter_parquet_chunks
+        chunks = iter_parquet_chunks(path, chunksize=chunksize, columns=['DateTime'])
+    else:
+        chunks = pd.read_csv(path, chunksize=chunksize, usecols=['DateTime'])
+
+    day_counts = pd.Series(dtype='int64')
+    for chunk in chunks:
+        counts = _as_datetimes(chunk['DateTime']).dt.floor('D').value_counts()
+        day_counts = day_counts.add(counts, fill_value=0)
+
+    day_counts = day_counts.sort_index()
+    cumulative = day_counts.cumsum().to_numpy() / day_counts.sum()
+    positions = np.searchsorted(cumulative, fractions)
+    return [day_counts.index[min(position, len(day_counts) - 1)] + pd.Timedelta(days=1)
+            for position in positions]
+
+class TemporalSplitter:
+    """
+    Assigns transactions to train, validation and test sets by DateTime,
+    so models are only ever evaluated on transactions after the ones they
+    were trained on.
+
+    A splitter holds one or more folds. Each fold maps split names to
+    [start, end) DateTime ranges, where None is unbounded. Rolling-origin
+    backtests have one fold per origin. split_to_disk() streams a feature
+    file once and writes every fold's splits as Parquet files.
+    """
+
+    SPLITS = ['train', 'validation', 'test']
+
+    def __init__(self, folds):
+        self.folds = folds
+
+    @classmethod
+    def from_cutoffs(cls, train_end, validation_end=None, test_end=None):
+        """
+        Single train/validation/test split.
+
+        Args:
+            train_end: Training transactions are before this time
+            validation_end: Validation runs from train_end to this time
+                            (None for no validation set)
+            test_end: Test runs from validation_end (or train_end) to this time
+                      (None for everything after)
+        """
+        train_end = pd.Timestamp(train_end)
+        fold = {'train': (None, train_end)}
+        if validation_end is not None:
+            validation_end = pd.Timestamp(validation_end)
+            fold['validation'] = (train_end, validation_end)
+        test_start = validation_end if validation_end is not None else train_end
+        fold['test'] = (test_start, None if test_end is None else pd.Timestamp(test_end))
+        return cls([fold])
+
+    @classmethod
+    def from_fractions(cls, path, validation_size=0.1, test_size=0.2, chunksize=500000):
+        """
+        Single split with cutoffs at the DateTime quantiles that give roughly
+        the requested validation and test fractions (see time_quantiles).
+        """
+        train_end, validation_end = time_quantiles(
+            path, [1 - validation_size - test_size, 1 - test_size], chunksize=chunksize
+        )
+        return cls.from_cutoffs(train_end, validation_end if validation_size > 0 else None)
+
+    @classmethod
+    def rolling_origin(cls, first_origin, n_folds, horizon, validation=None, window=None):
+        """
+        Rolling-origin backtest: fold k tests on [origin_k, origin_k + horizon)
+        with origin_k = first_origin + k * horizon, and trains on everything
+        before origin_k (or before the validation period, if there is one).
+
+        Args:
+            first_origin: Start of the first test period
+            n_folds: Number of folds
+            horizon: Length of each test period (Timedelta or string such as '30D')
+            validation: Length of the validation period just before each origin
+            window: Length of the training period (None for an expanding window)
+        """
+        first_origin = pd.Timestamp(first_origin)
+        horizon = pd.Timedelta(horizon)
+        validation = pd.Timedelta(validation) if validation is not None else None
+        window = pd.Timedelta(window) if window is not None else None
+
+        folds = []
+        for k in range(n_folds):
+            origin = first_origin + k * horizon
+            train_end = origin - validation if validation is not None else origin
+            fold = {'train': (train_end - window if window is not None else None, train_end)}
+            if validation is not None:
+                fold['validation'] = (train_end, origin)
+            fold['test'] = (origin, origin + horizon)
+            folds.append(fold)
+        return cls(folds)
+
+    def assign(self, datetimes):
+        """
+        Split masks of a batch of transactions.
+
+        Args:
+            datetimes: DateTime values
+
+        Returns:
+            List with one dictionary of split name -> boolean mask per fold
+        """
+        values = _as_datetimes(pd.Series(datetimes)).to_numpy()
+        masks = []
+        for fold in self.folds:
+            fold_masks = {}
+            for name, (start, end) in fold.items():
+                mask = np.ones(len(values), dtype=bool)
+                if start is not None:
+                    mask &= values >= start.to_datetime64()
+                if end is not None:
+                    mask &= values < end.to_datetime64()
+                fold_masks[name] = mask
+            masks.append(fold_masks)
+        return masks
+
+    def split_to_disk(self, path, output_dir, chunksize=500000):
+        """
+        Stream a feature file once and write each fold's splits to Parquet.
+
+        Args:
+            path: Parquet or CSV file of engineered features
+            output_dir: Output directory; splits are written as <split>.parquet,
+                        under fold_<k>/ when there is more than one fold
+            chunksize: Rows per chunk
+
+        Returns:
+            List with one dictionary of split name -> (path, row count) per fold.
+            Splits without rows are not written.
+        """
+        from dataset_cache import ParquetChunkWriter
+
+        def split_path(k, name):
+            fold_dir = output_dir if len(self.folds) == 1 else os.path.join(output_dir, f'fold_{k}')
+            return os.path.join(fold_dir, f'{name}.parquet')
+
+        writers = [{name: ParquetChunkWriter(split_path(k, name)) for name in fold}
+                   for k, fold in enumerate(self.folds)]
+        counts = [{name: 0 for name in fold} for fold in self.folds]
+
+        for chunk in iter_feature_chunks(path, chunksize=chunksize):
+            for k, fold_masks in enumerate(self.assign(chunk['DateTime'])):
+                for name, mask in fold_masks.items():
+                    if mask.any():
+                        writers[k][name].write(chunk[mask])
+                        counts[k][name] += int(mask.sum())
+
+        results = []
+        for k, fold_writers in enumerate(writers):
+            fold_results = {}
+            for name, writer in fold_writers.items():
+                writer.close()
+                if counts[k][name]:
+                    fold_results[name] = (writer.path, counts[k][name])
+                elif os.path.exists(writer.path):
+                    # Left over from an earlier split with different cutoffs
+                    os.remove(writer.path)
+            results.append(fold_results)
+        return results
+
 class FraudDataPreprocessor:
     """
     Prepares fraud detection data for model training.
@@ -25,6 +343,8 @@ class FraudDataPreprocessor:
         self.label_encoders = {}
         self.feature_columns = None
         self.target_column = 'Is Fraud?'
+        # Training sample weights from the last resampling (None when unweighted)
+        self.sample_weight = None
 
     def identify_feature_types(self, df):
         """
@@ -42,12 +362,12 @@ class FraudDataPreprocessor:
         # Get all column names
         all_columns = df.columns.tolist()
 
-        # Numeric features
-        numeric_features = df.select_dtypes(include=['int64', 'float64', 'int32']).columns.tolist()
+        # Numeric features (any width, the feature pipeline uses int8-int64 and float32/float64)
+        numeric_features = df.select_dtypes(include=['number']).columns.tolist()
         numeric_features = [f for f in numeric_features if f not in exclude_features]
 
         # Categorical features
-        categorical_features = df.select_dtypes(include=['object', 'category']).columns.tolist()
+        categorical_features = df.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
         categorical_features = [f for f in categorical_features if f not in exclude_features]
 
         print(f"Found {len(numeric_features)} numeric features")
@@ -58,32 +378,29 @@ class FraudDataPreprocessor:
     def encode_categorical_features(self, df, categorical_features, is_training=True):
         """
         Encode categorical variables using label encoding or one-hot encoding.
+        Columns are replaced in place; df is modified and returned.
+        Outside training, categories the encoder has not seen are encoded as
+        len(classes_), one past the last known class.
         """
         print("Encoding categorical features...")
 
-        df_encoded = df.copy()
+        df_encoded = df
 
         for feature in categorical_features:
             if feature not in df_encoded.columns:
                 continue
 
             if is_training:
-                # Fit and transform for training data
+                # Fit on the distinct values only, then encode the column
                 le = LabelEncoder()
-                df_encoded[feature] = le.fit_transform(df_encoded[feature].astype(str))
+                le.fit(pd.Index(df_encoded[feature].unique()).astype(str))
+                df_encoded[feature] = encode_labels(df_encoded[feature], le.classes_)
                 self.label_encoders[feature] = le
             else:
                 # Transform using existing encoder for test data
                 if feature in self.label_encoders:
                     le = self.label_encoders[feature]
-                    # Handle unseen categories
-                    df_encoded[feature] = df_encoded[feature].astype(str).apply(
-                        lambda x: x if x in le.classes_ else 'unknown'
-                    )
-                    # Add unknown category if needed
-                    if 'unknown' not in le.classes_:
-                        le.classes_ = np.append(le.classes_, 'unknown')
-                    df_encoded[feature] = le.transform(df_encoded[feature])
+                    df_encoded[feature] = encode_labels(df_encoded[feature], le.classes_)
 
         print(f"Encoded {len(categorical_features)} categorical features")
         return df_encoded
@@ -91,21 +408,25 @@ class FraudDataPreprocessor:
     def handle_missing_values(self, df, numeric_features, categorical_features):
         """
         Fill missing values appropriately for numeric and categorical features.
+        Only columns with missing values are touched; df is modified and returned.
         """
         print("Handling missing values...")
 
-        df_filled = df.copy()
+        df_filled = df
 
         # Fill numeric missing values with median
         for feature in numeric_features:
-            if feature in df_filled.columns:
+            if feature in df_filled.columns and df_filled[feature].hasnans:
                 median_value = df_filled[feature].median()
                 df_filled[feature] = df_filled[feature].fillna(median_value)
 
         # Fill categorical missing values with mode
         for feature in categorical_features:
-            if feature in df_filled.columns:
+            if feature in df_filled.columns and df_filled[feature].hasnans:
                 mode_value = df_filled[feature].mode()[0] if len(df_filled[feature].mode()) > 0 else 'unknown'
+                if isinstance(df_filled[feature].dtype, pd.CategoricalDtype) and \
+                        mode_value not in df_filled[feature].cat.categories:
+                    df_filled[feature] = df_filled[feature].cat.add_categories([mode_value])
                 df_filled[feature] = df_filled[feature].fillna(mode_value)
 
         print("Missing values handled")
@@ -129,6 +450,20 @@ class FraudDataPreprocessor:
             print("Scaled training data")
             return X_train_scaled
 
+    def unscale_column(self, X, column):
+        """
+        Original values of one feature column of a scaled matrix.
+
+        Args:
+            X: Matrix scaled by this preprocessor
+            column: Feature column name
+
+        Returns:
+            NumPy array of unscaled values
+        """
+        index = self.feature_columns.index(column)
+        return np.asarray(X[:, index], dtype=np.float64) * self.scaler.scale_[index] + self.scaler.mean_[index]
+
     def split_data(self, df, test_size=0.2, random_state=42, stratify=True):
         """
         Split data into train and test sets with optional stratification.
@@ -174,6 +509,9 @@ class FraudDataPreprocessor:
             - 'smote': Synthetic Minority Over-sampling Technique
             - 'undersample': Random undersampling of majority class
             - 'smotetomek': SMOTE followed by Tomek links cleaning
+            - 'downsample': Stratified majority downsampling, with kept majority
+              rows weighted by the inverse sampling fraction (see self.sample_weight)
+            - 'minority_smote': SMOTE with the neighbour search over minority rows only
             - 'none': No resampling
         """
         print("\n" + "=" * 80)
@@ -185,10 +523,46 @@ class FraudDataPreprocessor:
         print(f"  - Fraud: {y_train.sum()} ({y_train.mean()*100:.2f}%)")
         print(f"  - Legitimate: {len(y_train) - y_train.sum()} ({(1-y_train.mean())*100:.2f}%)")
 
+        self.sample_weight = None
+
         if method == 'none':
             print("\nNo resampling applied")
             return X_train, y_train
 
+        n_minority = int((y_train == 1).sum())
+        n_majority = len(y_train) - n_minority
+
+        if method == 'downsample':
+            fraction = majority_fraction(n_minority, n_majority, sampling_strategy)
+            uniform = np.random.default_rng(42).random(len(y_train))
+            keep, self.sample_weight = downsample_majority(y_train, fraction, uniform)
+            X_resampled, y_resampled = X_train[keep], y_train[keep]
+            print(f"\nKept {fraction:.2%} of majority rows, weighted {1 / fraction:.1f}")
+        elif method == 'minority_smote':
+            n_samples = smote_sample_count(n_minority, n_majority, sampling_strategy)
+            X_minority = np.asarray(X_train)[np.asarray(y_train) == 1]
+            synthetic = np.vstack([X_minority[:0]] + list(smote_minority(X_minority, n_samples)))
+            y_synthetic = np.ones(len(synthetic), dtype=np.asarray(y_train).dtype)
+            if isinstance(X_train, pd.DataFrame):
+                X_resampled = pd.concat([X_train, pd.DataFrame(synthetic, columns=X_train.columns)],
+                                        ignore_index=True)
+                y_resampled = pd.concat([y_train, pd.Series(y_synthetic, name=y_train.name)],
+                                        ignore_index=True)
+            else:
+                X_resampled = np.vstack([X_train, synthetic])
+                y_resampled = np.concatenate([y_train, y_synthetic])
+        else:
+            X_resampled, y_resampled = self._resample(X_train, y_train, method, sampling_strategy)
+
+        print(f"\nResampled distribution:")
+        print(f"  - Samples: {len(y_resampled)}")
+        print(f"  - Fraud: {y_resampled.sum()} ({y_resampled.mean()*100:.2f}%)")
+        print(f"  - Legitimate: {len(y_resampled) - y_resampled.sum()} ({(1-y_resampled.mean())*100:.2f}%)")
+
+        return X_resampled, y_resampled
+
+    def _resample(self, X_train, y_train, method, sampling_strategy):
+        """Resample with one of the imblearn samplers"""
         if method == 'smote':
             sampler = SMOTE(sampling_strategy=sampling_strategy, random_state=42)
         elif method == 'undersample':
@@ -198,17 +572,11 @@ class FraudDataPreprocessor:
         else:
             raise ValueError(f"Unknown resampling method: {method}")
 
-        X_resampled, y_resampled = sampler.fit_resample(X_train, y_train)
-
-        print(f"\nResampled distribution:")
-        print(f"  - Samples: {len(y_resampled)}")
-        print(f"  - Fraud: {y_resampled.sum()} ({y_resampled.mean()*100:.2f}%)")
-        print(f"  - Legitimate: {len(y_resampled) - y_resampled.sum()} ({(1-y_resampled.mean())*100:.2f}%)")
-
-        return X_resampled, y_resampled
+        return sampler.fit_resample(X_train, y_train)
 
     def prepare_data_for_training(self, df, test_size=0.2, balance_method='smote',
-                                  sampling_strategy='auto', scale=True):
+                                  sampling_strategy='auto', scale=True, inplace=False,
+                                  artifact_dir=None):
         """
         Complete preprocessing pipeline from raw data to model-ready arrays.
 
@@ -218,6 +586,12 @@ class FraudDataPreprocessor:
             balance_method: Method to handle class imbalance
             sampling_strategy: Ratio for resampling (auto, float, or dict)
             scale: Whether to scale features
+            inplace: Impute and encode df itself instead of a copy. Saves a full
+                     copy of the dataset, but df can't be preprocessed again.
+            artifact_dir: Store the encoded matrix, split indices and resampled
+                          training set here as memory-mapped arrays, keyed by a
+                          hash of df and the configuration, and reuse them on
+                          later calls. Splits are then returned as NumPy arrays.
 
         Returns:
             X_train, X_test, y_train, y_test: Processed train and test sets
@@ -226,6 +600,13 @@ class FraudDataPreprocessor:
         print("DATA PREPROCESSING PIPELINE")
         print("=" * 80)
 
+        if artifact_dir is not None:
+            return self._prepare_with_artifacts(df, artifact_dir, test_size, balance_method,
+                                                sampling_strategy, scale, inplace)
+
+        if not inplace:
+            df = df.copy()
+
         # Identify feature types
         numeric_features, categorical_features = self.identify_feature_types(df)
 
@@ -267,6 +648,276 @@ class FraudDataPreprocessor:
             print("\nData preprocessing complete!")
             return X_train_balanced, X_test, y_train_balanced, y_test
 
+    def _prepare_with_artifacts(self, df, artifact_dir, test_size, balance_method,
+                                sampling_strategy, scale, inplace, random_state=42):
+        """
+        prepare_data_for_training on top of an ArrayStore. Each stage is keyed
+        by the key of the stage before it plus its own parameters, so changing
+        the resampling method reuses the encoded matrix and the split.
+        """
+        store = ArrayStore(artifact_dir)
+
+        # Stage 1: imputed and encoded feature matrix
+        encoded_key = store.make_key(data=frame_hash(df), version=PREPROCESSING_VERSION)
+        encoded = store.load('encoded', encoded_key)
+        if encoded is None:
+            if not inplace:
+                df = df.copy()
+            numeric_features, categorical_features = self.identify_feature_types(df)
+            df = self.handle_missing_values(df, numeric_features, categorical_features)
+            df = self.encode_categorical_features(df, categorical_features, is_training=True)
+            feature_columns = [f for f in numeric_features + categorical_features if f in df.columns]
+
+            encoded = store.save('encoded', encoded_key, {
+                'X': df[feature_columns].to_numpy(dtype=np.float64),
+                'y': df[self.target_column].to_numpy(dtype=np.int8)
+            }, meta={'feature_columns': feature_columns, 'label_encoders': self.label_encoders,
+                     'dtypes': df[feature_columns].dtypes.to_dict()})
+        else:
+            print(f"Loaded encoded features from {store.path('encoded', encoded_key)}")
+
+        arrays, meta = encoded
+        X, y = arrays['X'], arrays['y']
+        self.feature_columns = meta['feature_columns']
+        self.label_encoders = meta['label_encoders']
+        print(f"\nFinal feature set: {len(self.feature_columns)} features")
+
+        # Stage 2: stratified split indices, the same rows train_test_split picks for the frame
+        split_key = store.make_key(encoded=encoded_key, test_size=test_size, random_state=random_state)
+        split = store.load('split', split_key)
+        if split is None:
+            train_idx, test_idx = train_test_split(
+                np.arange(len(y)), test_size=test_size, random_state=random_state, stratify=y
+            )
+            split = store.save('split', split_key, {'train': train_idx, 'test': test_idx})
+        train_idx, test_idx = split[0]['train'], split[0]['test']
+        print(f"Training set: {len(train_idx)} samples, test set: {len(test_idx)} samples")
+
+        X_test, y_test = X[test_idx], y[test_idx]
+
+        # Stage 3: resampled training set
+        self.sample_weight = None
+        if balance_method == 'none':
+            X_train, y_train = X[train_idx], y[train_idx]
+        else:
+            resampled_key = store.make_key(split=split_key, method=balance_method,
+                                           sampling_strategy=sampling_strategy)
+            resampled = store.load('resampled', resampled_key)
+            if resampled is None:
+                # Resample a frame with the original column dtypes, so synthetic
+                # rows are rounded like they are in the non-stored pipeline
+                X_frame = pd.DataFrame(X[train_idx], columns=self.feature_columns).astype(meta['dtypes'])
+                X_train, y_train = self.handle_class_imbalance(
+                    X_frame, pd.Series(y[train_idx], name=self.target_column),
+                    method=balance_method, sampling_strategy=sampling_strategy
+                )
+                arrays = {'X': np.asarray(X_train, dtype=np.float64), 'y': np.asarray(y_train)}
+                if self.sample_weight is not None:
+                    arrays['w'] = self.sample_weight
+                resampled = store.save('resampled', resampled_key, arrays)
+            else:
+                print(f"Loaded {balance_method} training set from {store.path('resampled', resampled_key)}")
+
+            X_train, y_train = resampled[0]['X'], resampled[0]['y']
+            self.sample_weight = resampled[0].get('w')
+
+        if scale:
+            X_train, X_test = self.scale_features(X_train, X_test)
+
+        print("\nData preprocessing complete!")
+        return X_train, X_test, y_train, y_test
+
+    def prepare_data_out_of_core(self, feature_path, output_dir=ARRAYS_DIR, test_size=0.2,
+                                 balance_method='none', sampling_strategy='auto',
+                                 chunksize=500000, random_state=42):
+        """
+        Preprocess an engineered feature file too large for memory.
+
+        The file is streamed three times: to collect row counts, category
+        counts and column means; to fit the scaler with partial_fit on the
+        training rows; and to write scaled float32 matrices into memory-mapped
+        .npy files. Rows are assigned to the test set at random with
+        probability test_size, reproducibly for a given random_state.
+
+        Differences from prepare_data_for_training: missing numeric values
+        are filled with the training mean instead of the median, and only
+        the resampling methods that work on chunks are available.
+
+        Args:
+            feature_path: Parquet or CSV file of engineered features
+            output_dir: Directory for X_train.npy, X_test.npy, y_train.npy and y_test.npy
+            test_size: Proportion of rows for testing
+            balance_method: 'none', 'downsample' (training majority rows are
+                            sampled while writing, and their weights saved
+                            to w_train.npy and self.sample_weight) or
+                            'minority_smote' (synthetic rows from the scaled
+                            minority rows are appended to the training set)
+            sampling_strategy: Target minority / majority ratio ('auto' for 1)
+            chunksize: Rows per chunk
+            random_state: Seed of the train/test assignment and resampling
+
+        Returns:
+            X_train, X_test, y_train, y_test as read-only memory maps
+        """
+        if balance_method not in ['none', 'downsample', 'minority_smote']:
+            raise ValueError(f"Resampling method {balance_method} is not supported out of core")
+
+        print("\n" + "=" * 80)
+        print("OUT-OF-CORE DATA PREPROCESSING")
+        print("=" * 80)
+        print(f"\nStreaming {feature_path} in chunks of {chunksize:,} rows")
+
+        def chunks_with_split():
+            # The same draws in every pass, so all passes agree on split and sample
+            rng = np.random.default_rng(random_state)
+            for chunk in iter_feature_chunks(feature_path, chunksize=chunksize):
+                draws = rng.random((2, len(chunk)))
+                yield chunk, draws[0] < test_size, draws[1]
+
+        # Pass 1: split sizes, category counts and numeric means
+        numeric_features = categorical_features = None
+        category_counts = {}
+        column_sums = column_counts = None
+        n_test = n_minority = n_majority = 0
+
+        for chunk, is_test, _ in chunks_with_split():
+            if numeric_features is None:
+                numeric_features, categorical_features = self.identify_feature_types(chunk)
+                category_counts = {feature: pd.Series(dtype='int64') for feature in categorical_features}
+
+            n_test += int(is_test.sum())
+            train_fraud = int(chunk[self.target_column].to_numpy()[~is_test].sum())
+            n_minority += train_fraud
+            n_majority += int((~is_test).sum()) - train_fraud
+
+            for feature in categorical_features:
+                counts = chunk[feature].value_counts()
+                counts.index = pd.Index(counts.index).astype(str)
+                category_counts[feature] = category_counts[feature].add(counts, fill_value=0)
+
+            train_numeric = chunk.loc[~is_test, numeric_features]
+            sums, counts = train_numeric.sum(), train_numeric.count()
+            column_sums = sums if column_sums is None else column_sums + sums
+            column_counts = counts if column_counts is None else column_counts + counts
+
+        self.feature_columns = numeric_features + categorical_features
+        fill_values = (column_sums / column_counts.replace(0, np.nan)).fillna(0)
+
+        # Fit label encoders on every value seen; missing values take the most frequent one
+        mode_codes = {}
+        for feature in categorical_features:
+            counts = category_counts[feature]
+            le = LabelEncoder()
+            le.fit(counts.index if len(counts) else pd.Index(['unknown']))
+            self.label_encoders[feature] = le
+            mode = counts.idxmax() if len(counts) else 'unknown'
+            mode_codes[feature] = int(np.searchsorted(le.classes_, mode))
+
+        def to_matrix(chunk):
+            X = chunk[self.feature_columns].copy()
+            for feature in numeric_features:
+                if X[feature].hasnans:
+                    X[feature] = X[feature].fillna(fill_values[feature])
+            for feature in categorical_features:
+                codes = encode_labels(X[feature], self.label_encoders[feature].classes_)
+                codes[X[feature].isna().to_numpy()] = mode_codes[feature]
+                X[feature] = codes
+            return X.to_numpy(dtype=np.float64)
+
+        fraction = majority_fraction(n_minority, n_majority, sampling_strategy) \
+            if balance_method == 'downsample' else 1.0
+        n_synthetic = smote_sample_count(n_minority, n_majority, sampling_strategy) \
+            if balance_method == 'minority_smote' and n_minority >= 2 else 0
+
+        def train_rows(chunk, is_test, uniform):
+            """Training rows to write and their sample weights"""
+            y = chunk[self.target_column].to_numpy()
+            keep, weights = downsample_majority(y[~is_test], fraction, uniform[~is_test])
+            rows = np.flatnonzero(~is_test)[keep]
+            return rows, weights
+
+        print(f"\nTraining set: {n_minority + n_majority:,} samples "
+              f"({n_minority:,} fraud), test set: {n_test:,} samples")
+        print(f"Final feature set: {len(self.feature_columns)} features")
+
+        # Pass 2: fit the scaler on all training rows, count the rows to write
+        print("\nFitting scaler...")
+        self.scaler = StandardScaler()
+        n_train = 0
+        for chunk, is_test, uniform in chunks_with_split():
+            X = to_matrix(chunk)
+            if (~is_test).any():
+                self.scaler.partial_fit(X[~is_test])
+            n_train += len(train_rows(chunk, is_test, uniform)[0])
+
+        if balance_method == 'downsample':
+            print(f"Keeping {fraction:.2%} of training majority rows, weighted {1 / fraction:.1f}")
+        elif balance_method == 'minority_smote':
+            print(f"Adding {n_synthetic:,} synthetic fraud rows")
+
+        # Pass 3: write scaled matrices
+        print(f"Writing scaled matrices to {output_dir}...")
+        os.makedirs(output_dir, exist_ok=True)
+        n_features = len(self.feature_columns)
+        n_rows = n_train + n_synthetic
+        arrays = {
+            'X_train': ((n_rows, n_features), np.float32),
+            'X_test': ((n_test, n_features), np.float32),
+            'y_train': ((n_rows,), np.int8),
+            'y_test': ((n_test,), np.int8)
+        }
+        if balance_method == 'downsample':
+            arrays['w_train'] = ((n_rows,), np.float32)
+        elif os.path.exists(os.path.join(output_dir, 'w_train.npy')):
+            os.remove(os.path.join(output_dir, 'w_train.npy'))
+
+        outputs = {
+            name: np.lib.format.open_memmap(os.path.join(output_dir, f'{name}.npy'), mode='w+',
+                                            dtype=dtype, shape=shape)
+            for name, (shape, dtype) in arrays.items()
+        }
+
+        minority_rows = []
+        train_pos = test_pos = 0
+        for chunk, is_test, uniform in chunks_with_split():
+            X = self.scaler.transform(to_matrix(chunk)).astype(np.float32)
+            y = chunk[self.target_column].to_numpy(dtype=np.int8)
+
+            rows, weights = train_rows(chunk, is_test, uniform)
+            n = len(rows)
+            outputs['X_train'][train_pos:train_pos + n] = X[rows]
+            outputs['y_train'][train_pos:train_pos + n] = y[rows]
+            if 'w_train' in outputs:
+                outputs['w_train'][train_pos:train_pos + n] = weights
+            train_pos += n
+
+            if n_synthetic:
+                minority_rows.append(X[rows][y[rows] == 1])
+
+            n = int(is_test.sum())
+            outputs['X_test'][test_pos:test_pos + n] = X[is_test]
+            outputs['y_test'][test_pos:test_pos + n] = y[is_test]
+            test_pos += n
+
+        # Synthetic minority rows go after the real training rows
+        if n_synthetic:
+            for synthetic in smote_minority(np.vstack(minority_rows), n_synthetic,
+                                            random_state=random_state):
+                n = len(synthetic)
+                outputs['X_train'][train_pos:train_pos + n] = synthetic
+                outputs['y_train'][train_pos:train_pos + n] = 1
+                train_pos += n
+
+        for output in outputs.values():
+            output.flush()
+        del outputs
+
+        self.sample_weight = np.load(os.path.join(output_dir, 'w_train.npy'), mmap_mode='r') \
+            if balance_method == 'downsample' else None
+
+        print("\nData preprocessing complete!")
+        return load_arrays(output_dir)
+
     def save_preprocessor(self, filepath='models/preprocessor.pkl'):
         """
         Save the preprocessor for later use in production.
@@ -294,14 +945,81 @@ class FraudDataPreprocessor:
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Preprocess engineered features for training')
+    parser.add_argument('--out-of-core', action='store_true',
+                        help='Stream the full feature dataset (from feature_engineering.py --stream) '
+                             f'into memory-mapped matrices in {ARRAYS_DIR}')
+    parser.add_argument('--temporal-split', action='store_true',
+                        help='Write time-ordered train/validation/test splits of the full feature '
+                             f'dataset to {SPLITS_DIR}')
+    parser.add_argument('--validation-size', type=float, default=0.1,
+                        help='Fraction of the most recent rows before the test set used for validation')
+    parser.add_argument('--test-size', type=float, default=0.2,
+                        help='Fraction of the most recent rows used for testing')
+    parser.add_argument('--backtest', type=int, metavar='FOLDS',
+                        help='With --temporal-split, write a rolling-origin backtest with this many folds '
+                             'covering the end of the data instead')
+    parser.add_argument('--horizon', default='90D',
+                        help='Test period of each backtest fold (e.g. 30D)')
+    parser.add_argument('--chunksize', type=int, default=500000,
+                        help='Rows per chunk in out-of-core and temporal split modes')
+    args = parser.parse_args()
+
+    if args.temporal_split:
+        from feature_engineering import feature_dataset_path
+
+        try:
+            feature_path = feature_dataset_path()
+        except FileNotFoundError as e:
+            print(f"Error: {e}")
+            exit(1)
+
+        if args.backtest:
+            data_end, = time_quantiles(feature_path, [1.0], chunksize=args.chunksize)
+            first_origin = data_end - args.backtest * pd.Timedelta(args.horizon)
+            splitter = TemporalSplitter.rolling_origin(first_origin, args.backtest, args.horizon)
+        else:
+            splitter = TemporalSplitter.from_fractions(feature_path, args.validation_size, args.test_size,
+                                                       chunksize=args.chunksize)
+
+        print(f"Writing temporal splits of {feature_path} to {SPLITS_DIR}...")
+        for k, (fold, written) in enumerate(zip(splitter.folds, splitter.split_to_disk(
+                feature_path, SPLITS_DIR, chunksize=args.chunksize))):
+            print(f"\nFold {k}:" if len(splitter.folds) > 1 else "")
+            for name, (start, end) in fold.items():
+                path, rows = written.get(name, ('(empty)', 0))
+                print(f"  {name:<10} [{start or '...'}, {end or '...'})  {rows:>12,} rows  {path}")
+        exit(0)
+
+    if args.out_of_core:
+        from feature_engineering import feature_dataset_path
+
+        try:
+            feature_path = feature_dataset_path()
+        except FileNotFoundError as e:
+            print(f"Error: {e}")
+            exit(1)
+
+        preprocessor = FraudDataPreprocessor()
+        X_train, X_test, y_train, y_test = preprocessor.prepare_data_out_of_core(
+            feature_path, chunksize=args.chunksize
+        )
+        print(f"\nX_train: {X_train.shape}, X_test: {X_test.shape}")
+        preprocessor.save_preprocessor('models/preprocessor.pkl')
+        exit(0)
+
     print("Loading engineered features...")
 
-    # Load data with features
+    # Load data with features (from the dataset cache when the inputs are unchanged)
+    from feature_engineering import load_feature_dataset
+
     try:
-        df = pd.read_csv('detection_data/transactions_with_features.csv')
+        df = load_feature_dataset()
         print(f"Loaded {len(df)} transactions with {len(df.columns)} columns")
     except FileNotFoundError:
-        print("Error: Please run feature_engineering.py first to generate features")
+        print("Error: Dataset files not found in detection_data/, see DATA_SETUP.md")
         exit(1)
 
     # Initialize preprocessor
@@ -323,7 +1041,8 @@ if __name__ == "__main__":
             test_size=0.2,
             balance_method=method,
             sampling_strategy='auto' if method != 'none' else None,
-            scale=True
+            scale=True,
+            artifact_dir=ARTIFACTS_DIR
         )
 
         print(f"\nFinal shapes:")
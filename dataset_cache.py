@@ -0,0 +1,391 @@
+"""
+Dataset Cache for Fraud Detection
+Stores raw and engineered datasets as Parquet files keyed by a content hash of
+their source files and the version of the code that built them, so pipeline
+stages skip CSV parsing and recomputation when their inputs are unchanged.
+Preprocessing artifacts (encoded matrices, split indices, resampled training
+sets) are stored the same way as memory-mapped .npy arrays.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+CACHE_DIR = 'detection_data/cache'
+MANIFEST_FILE = 'manifest.json'
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+class DatasetCache:
+    """
+    Content-addressed Parquet cache for pipeline datasets.
+
+    Each entry is stored as <name>-<key>.parquet, where the key hashes the
+    contents of the source files together with the build parameters (code
+    version, sample size, ...). File hashes are remembered in a manifest by
+    size and modification time, so large sources are only re-read after they
+    change. Without pyarrow the cache is disabled and every lookup misses.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, compression='zstd'):
+        self.cache_dir = cache_dir
+        self.compression = compression
+        self.enabled = pa is not None
+        self._manifest = None
+
+    def _manifest_path(self):
+        return os.path.join(self.cache_dir, MANIFEST_FILE)
+
+    def _load_manifest(self):
+        if self._manifest is None:
+            try:
+                with open(self._manifest_path()) as f:
+                    self._manifest = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._manifest = {}
+        return self._manifest
+
+    def _save_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{self._manifest_path()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self._manifest, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self._manifest_path())
+
+    def file_hash(self, path):
+        """
+        Content hash of a source file.
+
+        Args:
+            path: File to hash
+
+        Returns:
+            Hex digest, or None if the file does not exist
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        manifest = self._load_manifest()
+        abs_path = os.path.abspath(path)
+        entry = manifest.get(abs_path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['hash']
+
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+
+        manifest[abs_path] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'hash': digest.hexdigest()
+        }
+        if self.enabled:
+            self._save_manifest()
+        return manifest[abs_path]['hash']
+
+    def make_key(self, sources, **params):
+        """
+        Cache key for a dataset built from source files with given parameters.
+
+        Args:
+            sources: Paths of the files the dataset is derived from
+            **params: Anything else the result depends on (code version, sample size, ...)
+
+        Returns:
+            16-character hex key
+        """
+        payload = {
+            'sources': {os.path.basename(path): self.file_hash(path) for path in sources},
+            'params': params
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+    def path(self, name, key):
+        """Parquet file of a cache entry"""
+        return os.path.join(self.cache_dir, f"{name}-{key}.parquet")
+
+    def exists(self, name, key):
+        return self.enabled and os.path.exists(self.path(name, key))
+
+    def load(self, name, key, columns=None):
+        """
+        Read a cache entry.
+
+        Args:
+            name: Dataset name
+            key: Key from make_key()
+            columns: Optional subset of columns to read
+
+        Returns:
+            DataFrame, or None on a cache miss
+        """
+        if not self.exists(name, key):
+            return None
+        return pd.read_parquet(self.path(name, key), columns=columns)
+
+    def save(self, name, key, df):
+        """
+        Write a cache entry atomically. Dtypes, including categoricals, round-trip.
+
+        Args:
+            name: Dataset name
+            key: Key from make_key()
+            df: DataFrame to store
+        """
+        if not self.enabled:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(name, key)
+        temp_path = f"{path}.tmp"
+        df.to_parquet(temp_path, index=False, compression=self.compression)
+        os.replace(temp_path, path)
+
+    def get_or_create(self, name, sources, build, **params):
+        """
+        Return a cached dataset, building and storing it on a miss.
+
+        Args:
+            name: Dataset name
+            sources: Paths of the files the dataset is derived from
+            build: Zero-argument callable that creates the DataFrame
+            **params: Extra key parameters (see make_key)
+
+        Returns:
+            DataFrame
+        """
+        if not self.enabled:
+            return build()
+
+        key = self.make_key(sources, **params)
+        df = self.load(name, key)
+        if df is not None:
+            print(f"Loaded {name} from cache: {self.path(name, key)}")
+            return df
+
+        df = build()
+        self.save(name, key, df)
+        print(f"Cached {name}: {self.path(name, key)}")
+        return df
+
+    def clear(self, name=None):
+        """
+        Delete cache entries.
+
+        Args:
+            name: Only delete entries of this dataset (default: all)
+
+        Returns:
+            Number of files removed
+        """
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        removed = 0
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.parquet'):
+                continue
+            if name is not None and not filename.startswith(f"{name}-"):
+                continue
+            os.remove(os.path.join(self.cache_dir, filename))
+            removed += 1
+        return removed
+
+
+def frame_hash(df):
+    """
+    Content hash of a DataFrame's values and column names.
+
+    Args:
+        df: DataFrame to hash
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([str(column) for column in df.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ArrayStore:
+    """
+    Memory-mapped NumPy artifacts keyed by a configuration hash.
+
+    Each entry is a directory <name>-<key>/ with one .npy file per array and
+    an optional joblib file of small Python objects (fitted encoders, column
+    names). Entries are written to a temporary directory and renamed into
+    place, and read back with mmap_mode='r', so loading costs no memory
+    until the arrays are used.
+    """
+
+    META_FILE = 'meta.joblib'
+
+    def __init__(self, root):
+        self.root = root
+
+    @staticmethod
+    def make_key(**params):
+        """
+        Key of an artifact built with the given configuration.
+
+        Args:
+            **params: Everything the artifact depends on, including the key
+                      of the artifact it was derived from
+
+        Returns:
+            16-character hex key
+        """
+        encoded = json.dumps(params, sort_keys=True, default=str).encode()
+        return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+    def path(self, name, key):
+        """Directory of an artifact"""
+        return os.path.join(self.root, f"{name}-{key}")
+
+    def load(self, name, key):
+        """
+        Open a stored artifact.
+
+        Args:
+            name: Artifact name
+            key: Key from make_key()
+
+        Returns:
+            (dictionary of read-only memory-mapped arrays, meta object or None),
+            or None if the artifact does not exist
+        """
+        path = self.path(name, key)
+        if not os.path.isdir(path):
+            return None
+
+        arrays = {
+            filename[:-len('.npy')]: np.load(os.path.join(path, filename), mmap_mode='r')
+            for filename in os.listdir(path) if filename.endswith('.npy')
+        }
+        meta_path = os.path.join(path, self.META_FILE)
+        meta = joblib.load(meta_path) if os.path.exists(meta_path) else None
+        return arrays, meta
+
+    def save(self, name, key, arrays, meta=None):
+        """
+        Store an artifact atomically and return it memory-mapped.
+
+        Args:
+            name: Artifact name
+            key: Key from make_key()
+            arrays: Dictionary of array name -> array
+            meta: Optional picklable object stored alongside
+
+        Returns:
+            Same as load()
+        """
+        path = self.path(name, key)
+        temp_path = f"{path}.tmp"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+
+        for array_name, array in arrays.items():
+            np.save(os.path.join(temp_path, f"{array_name}.npy"), np.asarray(array))
+        if meta is not None:
+            joblib.dump(meta, os.path.join(temp_path, self.META_FILE))
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temp_path, path)
+        return self.load(name, key)
+
+    def clear(self, name=None):
+        """
+        Delete stored artifacts.
+
+        Args:
+            name: Only delete artifacts with this name (default: all)
+
+        Returns:
+            Number of artifacts removed
+        """
+        if not os.path.isdir(self.root):
+            return 0
+        removed = 0
+        for entry in os.listdir(self.root):
+            if name is not None and not entry.startswith(f"{name}-"):
+                continue
+            shutil.rmtree(os.path.join(self.root, entry))
+            removed += 1
+        return removed
+
+
+def iter_parquet_chunks(path, chunksize=500000, columns=None):
+    """
+    Read a Parquet file as DataFrames of up to chunksize rows.
+    Memory use is bounded by the chunk size rather than the file size.
+
+    Args:
+        path: Parquet file
+        chunksize: Rows per chunk
+        columns: Optional subset of columns to read
+
+    Yields:
+        DataFrames in file order
+    """
+    if pa is None:
+        raise ImportError(
+            "pyarrow is required to read Parquet files. "
+            "Install it with: pip install pyarrow"
+        )
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+        yield batch.to_pandas()
+
+
+class ParquetChunkWriter:
+    """
+    Appends DataFrame chunks to one Parquet file.
+    The first chunk fixes the schema; later chunks are cast to it.
+    The file only appears at its final path once close() succeeds.
+    """
+
+    def __init__(self, path, compression='zstd'):
+        if pa is None:
+            raise ImportError(
+                "pyarrow is required to write Parquet files. "
+                "Install it with: pip install pyarrow"
+            )
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.compression = compression
+        self._writer = None
+
+    def write(self, df):
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            # A text column that is empty in the first chunk would otherwise be typed null
+            schema = pa.schema([
+                field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ], metadata=table.schema.metadata)
+            table = table.cast(schema)
+            self._writer = pq.ParquetWriter(self.temp_path, schema, compression=self.compression)
+        else:
+            table = pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self.temp_path, self.path)
@@ -5,37 +5,563 @@ Creates behavioral, temporal, and risk-based features from raw transaction data
 
 import pandas as pd
 import numpy as np
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from itertools import repeat
+import joblib
+from dataset_cache import DatasetCache, ParquetChunkWriter
+from data_analysis import CreditCardDataAnalyzer, RAW_DATA_VERSION, build_datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+# Bump when any feature definition changes, to invalidate cached feature datasets
+FEATURE_VERSION = 2
+
+# Transactions the pipeline engineers features for unless told otherwise
+DEFAULT_SAMPLE_SIZE = 100000
+
+# Aggregates and velocity history for incremental runs (written by --stream)
+FEATURE_STATE_PATH = 'detection_data/feature_state.joblib'
+
+# Fraud rate lookup tables shipped with the model for FeatureService
+RISK_TABLES_PATH = 'models/risk_tables.npz'
+
+# Pseudo-count of transactions at the global fraud rate added to every
+# risk table key, so rarely seen keys stay close to the global rate
+RISK_SMOOTHING = 100
+
+# Compact dtypes for engineered columns: int8 flags, the smallest integer type
+# that fits each count, and float32 for ratios, encodings and rates.
+# Money amounts and 24h sums stay float64.
+FEATURE_DTYPES = {
+    # Temporal
+    'hour': 'int8', 'day_of_week': 'int8', 'day_of_month': 'int8', 'month': 'int8',
+    'year': 'int16', 'is_weekend': 'int8',
+    'hour_sin': 'float32', 'hour_cos': 'float32', 'dow_sin': 'float32', 'dow_cos': 'float32',
+
+    # Amount
+    'amount_log': 'float32', 'is_round_amount': 'int8', 'is_refund': 'int8',
+    'amount_vs_user_avg': 'float32', 'amount_vs_mcc_avg': 'float32',
+
+    # Merchant
+    'merchant_txn_count': 'int32', 'is_online': 'int8', 'mcc_frequency': 'int32',
+    'user_merchant_txn_count': 'int32', 'is_first_merchant_txn': 'int8',
+    'is_chip_txn': 'int8', 'is_swipe_txn': 'int8', 'is_online_txn': 'int8',
+
+    # Geographic
+    'state_txn_count': 'int32', 'is_international': 'int8', 'is_high_risk_state': 'int8',
+    'is_primary_state': 'int8', 'missing_geo_data': 'int8', 'is_user_primary_state': 'int8',
+
+    # Card
+    'card_txn_count': 'int32', 'card_on_dark_web': 'int8', 'card_has_chip': 'int8',
+    'chip_mismatch': 'int8', 'is_visa': 'int8', 'is_mastercard': 'int8',
+    'is_debit': 'int8', 'is_credit': 'int8',
+    'CARD INDEX': 'int8', 'Card Brand': 'category', 'Card Type': 'category',
+    'Has Chip': 'category', 'Card on Dark Web': 'category',
+
+    # User behavior
+    'user_card_count': 'int8', 'user_merchant_diversity': 'int32', 'user_mcc_diversity': 'int16',
+    'user_avg_amount': 'float32', 'user_txn_per_day': 'float32',
+    'Current Age': 'int8', 'FICO Score': 'int16', 'Num Credit Cards': 'int8',
+    'Yearly Income - Person': 'float32', 'Total Debt': 'float32',
+    'debt_to_income_ratio': 'float32', 'amount_pct_of_income': 'float32',
+
+    # Velocity
+    'time_since_last_txn': 'float32', 'txn_count_1h': 'int32', 'txn_count_24h': 'int32',
+    'txn_count_7d': 'int32',
+
+    # Risk scores
+    'mcc_fraud_rate': 'float32', 'state_fraud_rate': 'float32', 'hour_fraud_rate': 'float32',
+    'txn_type_fraud_rate': 'float32', 'composite_risk_score': 'float32'
+}
+
+class FeatureAggregates:
+    """
+    Whole-dataset statistics behind the frequency, deviation and risk features.
+    Built one chunk at a time with update(), so features that are defined over
+    the full transaction history can be computed without holding it in memory.
+    """
+
+    # Transaction counts per entity, keyed by the grouping columns
+    COUNT_KEYS = {
+        'user': ['User'],
+        'card': ['Card'],
+        'merchant': ['Merchant Name'],
+        'mcc': ['MCC'],
+        'state': ['Merchant State'],
+        'user_card': ['User', 'Card'],
+        'user_merchant': ['User', 'Merchant Name'],
+        'user_mcc': ['User', 'MCC'],
+        'user_state': ['User', 'Merchant State']
+    }
+
+    # Columns with running amount mean/variance
+    AMOUNT_KEYS = ['User', 'MCC']
+
+    # Columns with fraud rate tables
+    FRAUD_KEYS = ['MCC', 'Merchant State', 'hour', 'Use Chip']
+
+    # Tables that span users. Everything else is keyed by user, so when the
+    # data is partitioned by user each partition already has the final values.
+    GLOBAL_COUNT_KEYS = ['card', 'merchant', 'mcc', 'state']
+    GLOBAL_AMOUNT_KEYS = ['MCC']
+
+    def __init__(self):
+        self.counts = {}
+        self.amount_stats = {}
+        self.fraud_stats = {}
+        self.user_time_range = None
+        self.total_count = 0
+        self.fraud_count = 0
+
+    def update(self, df):
+        """
+        Add one chunk of transactions to the running aggregates.
+
+        Args:
+            df: Transactions with Amount and DateTime already converted
+
+        Returns:
+            self
+        """
+        chunk = FeatureAggregates.from_labels(df) if 'Is Fraud?' in df.columns else FeatureAggregates()
+
+        for name, columns in self.COUNT_KEYS.items():
+            chunk.counts[name] = df.groupby(columns, observed=True).size()
+
+        for column in self.AMOUNT_KEYS:
+            chunk.amount_stats[column] = self._chunk_moments(df, column)
+
+        chunk.user_time_range = df.groupby('User')['DateTime'].agg(['min', 'max'])
+        chunk.total_count = len(df)
+
+        return self.merge(chunk)
+
+    @classmethod
+    def from_labels(cls, df):
+        """
+        Aggregates holding only the totals and fraud rate tables of labelled
+        transactions, without the count and amount tables.
+
+        Args:
+            df: Transactions with the fraud label and DateTime (or hour) converted
+
+        Returns:
+            FeatureAggregates
+        """
+        aggregates = cls()
+        aggregates.total_count = len(df)
+        aggregates.fraud_count = int(df['Is Fraud?'].sum())
+        hours = df['DateTime'].dt.hour if 'hour' not in df.columns else df['hour']
+        for column in cls.FRAUD_KEYS:
+            keys = hours if column == 'hour' else df[column]
+            # int64 so merged sums of the int8 label can't overflow
+            aggregates.fraud_stats[column] = (
+                df['Is Fraud?'].groupby(keys, observed=True).agg(['sum', 'count']).astype('int64')
+            )
+        return aggregates
+
+    def merge(self, other):
+        """
+        Fold aggregates built over other transactions into these.
+
+        Args:
+            other: FeatureAggregates of a different chunk or partition
+
+        Returns:
+            self
+        """
+        for name, counts in other.counts.items():
+            if name in self.counts:
+                counts = self.counts[name].add(counts, fill_value=0).astype('int64')
+            self.counts[name] = counts
+
+        for column, stats in other.amount_stats.items():
+            self.amount_stats[column] = self._merge_moments(self.amount_stats.get(column), stats)
+
+        if other.user_time_range is not None:
+            time_range = other.user_time_range
+            if self.user_time_range is not None:
+                time_range = pd.concat([self.user_time_range, time_range]).groupby(level=0).agg(
+                    {'min': 'min', 'max': 'max'}
+                )
+            self.user_time_range = time_range
+
+        self.total_count += other.total_count
+        self.fraud_count += other.fraud_count
+
+        for column, stats in other.fraud_stats.items():
+            if column in self.fraud_stats:
+                stats = self.fraud_stats[column].add(stats, fill_value=0).astype('int64')
+            self.fraud_stats[column] = stats
+
+        return self
+
+    def global_part(self):
+        """
+        Copy of the tables that span users (entity counts, MCC amount
+        moments, fraud rates and totals), without the per-user tables.
+        """
+        part = FeatureAggregates()
+        part.counts = {name: self.counts[name] for name in self.GLOBAL_COUNT_KEYS if name in self.counts}
+        part.amount_stats = {column: self.amount_stats[column]
+                             for column in self.GLOBAL_AMOUNT_KEYS if column in self.amount_stats}
+        part.fraud_stats = dict(self.fraud_stats)
+        part.total_count = self.total_count
+        part.fraud_count = self.fraud_count
+        return part
+
+    def with_global(self, global_aggregates):
+        """
+        Replace the tables that span users with dataset-wide ones.
+        Used on a user partition's aggregates once all partitions are reduced.
+
+        Args:
+            global_aggregates: Merged global_part() of every partition
+
+        Returns:
+            self
+        """
+        self.counts.update(global_aggregates.counts)
+        self.amount_stats.update(global_aggregates.amount_stats)
+        self.fraud_stats = dict(global_aggregates.fraud_stats)
+        self.total_count = global_aggregates.total_count
+        self.fraud_count = global_aggregates.fraud_count
+        return self
+
+    @staticmethod
+    def _chunk_moments(df, column):
+        stats = df.groupby(column)['Amount'].agg(['count', 'mean', 'var'])
+        stats['m2'] = (stats['var'] * (stats['count'] - 1)).fillna(0)
+        return stats[['count', 'mean', 'm2']]
+
+    @staticmethod
+    def _merge_moments(current, new):
+        """Combine count/mean/M2 tables with the parallel variance formula"""
+        if current is None:
+            return new
+        index = current.index.union(new.index)
+        a = current.reindex(index).fillna({'count': 0, 'mean': 0, 'm2': 0})
+        b = new.reindex(index).fillna({'count': 0, 'mean': 0, 'm2': 0})
+
+        count = a['count'] + b['count']
+        delta = b['mean'] - a['mean']
+        mean = a['mean'] + delta * b['count'] / count
+        m2 = a['m2'] + b['m2'] + delta ** 2 * a['count'] * b['count'] / count
+        return pd.DataFrame({'count': count, 'mean': mean, 'm2': m2})
+
+    def amount_mean(self, column):
+        """Mean transaction amount per value of column"""
+        return self.amount_stats[column]['mean']
+
+    def amount_std(self, column):
+        """Sample standard deviation of the amount per value of column (NaN for single rows)"""
+        stats = self.amount_stats[column]
+        return np.sqrt(stats['m2'] / (stats['count'] - 1).where(stats['count'] > 1))
+
+    def distinct_count(self, name):
+        """Number of distinct second-level keys per user for a pair count table"""
+        return self.counts[name].groupby(level=0).size()
+
+    @staticmethod
+    def most_frequent(counts):
+        """
+        Most frequent value per key from a two-level count series.
+        Ties go to the smallest value, matching Series.mode()[0].
+
+        Args:
+            counts: Series of counts indexed by (key, value)
+
+        Returns:
+            Series mapping each key to its most frequent value
+        """
+        key, value = counts.index.names
+        counts = counts.rename('count').reset_index()
+        counts = counts.sort_values([key, 'count', value], ascending=[True, False, True])
+        return counts.drop_duplicates(key).set_index(key)[value]
+
+    def user_txn_per_day(self):
+        """Transactions per active day for each user"""
+        days = (self.user_time_range['max'] - self.user_time_range['min']).dt.days + 1
+        return self.counts['user'] / days
+
+    def fraud_rate(self, column, smoothing=RISK_SMOOTHING):
+        """
+        Fraud rate per value of column, smoothed toward the global fraud rate:
+
+            (fraud + smoothing * global_rate) / (count + smoothing)
+
+        so rarely seen values stay close to the global rate.
+        """
+        stats = self.fraud_stats[column]
+        return (stats['sum'] + smoothing * self.global_fraud_rate) / (stats['count'] + smoothing)
+
+    @property
+    def global_fraud_rate(self):
+        return self.fraud_count / self.total_count if self.total_count else 0.0
+
+
+class VelocityHistory:
+    """
+    Trailing window of transactions per (User, Card) carried between chunks,
+    so rolling velocity windows stay exact across chunk boundaries.
+    Each card's transactions must arrive in time order, as they do in the
+    IBM transactions file.
+    """
+
+    WINDOW = pd.Timedelta(days=7)
+    COLUMNS = ['User', 'Card', 'DateTime', 'Amount']
+
+    def __init__(self):
+        self.tail = None
+        self._dtypes = None
+
+    def prepend(self, df):
+        """Put the carried rows for the cards in df in front of it"""
+        self._dtypes = df.dtypes
+        df = df.assign(_from_history=False)
+        if self.tail is None:
+            return df
+
+        cards = df[['User', 'Card']].drop_duplicates()
+        carried = self.tail.merge(cards, on=['User', 'Card'])
+        if carried.empty:
+            return df
+
+        # Velocity windows are only correct if no card goes back in time
+        first_seen = df.groupby(['User', 'Card'])['DateTime'].min()
+        last_carried = carried.groupby(['User', 'Card'])['DateTime'].max()
+        if (first_seen.reindex(last_carried.index) < last_carried).any():
+            raise ValueError("Transactions must be in time order within each card for streaming velocity features")
+
+        return pd.concat([carried.assign(_from_history=True), df], ignore_index=True)[df.columns]
+
+    def update(self, df):
+        """
+        Keep the last window of transactions per card and drop the carried rows.
+
+        Returns:
+            df without the rows that prepend() added
+        """
+        last_seen = df.groupby(['User', 'Card'])['DateTime'].transform('max')
+        recent = df.loc[df['DateTime'] > last_seen - self.WINDOW, self.COLUMNS]
+
+        if self.tail is None:
+            self.tail = recent.reset_index(drop=True)
+        else:
+            cards = pd.MultiIndex.from_frame(recent[['User', 'Card']])
+            untouched = ~pd.MultiIndex.from_frame(self.tail[['User', 'Card']]).isin(cards)
+            self.tail = pd.concat([self.tail[untouched], recent], ignore_index=True)
+
+        df = df[~df['_from_history']].drop(columns='_from_history').reset_index(drop=True)
+        # Carried rows lack the other columns, which turns their ints into floats
+        return df.astype(self._dtypes[self._dtypes.index.isin(df.columns)].to_dict())
+
+
+class ExpandingAggregates:
+    """
+    Point-in-time statistics: each row only sees itself and earlier transactions.
+
+    Rows are put in time order once (stably, so same-time rows keep their input
+    order) and every statistic is a cumulative count or sum within its group,
+    one vectorized pass per group. FeatureService keeps the same running
+    counts and sums online, so serving reproduces these values in O(1) per
+    transaction.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.order = np.argsort(df['DateTime'].to_numpy(), kind='stable')
+
+    def _sorted(self, columns):
+        return self.df[columns].iloc[self.order].reset_index(drop=True)
+
+    def _unsort(self, values):
+        """Map values computed in time order back to the rows of df"""
+        result = np.empty(len(values), dtype=np.asarray(values).dtype)
+        result[self.order] = values
+        return result
+
+    def count(self, columns):
+        """Transactions per group up to and including each row"""
+        sorted_df = self._sorted(columns)
+        counts = sorted_df.groupby(columns, observed=True, dropna=False, sort=False).cumcount() + 1
+        return self._unsort(counts.to_numpy())
+
+    def distinct(self, key, column):
+        """Distinct values of column per key up to and including each row"""
+        sorted_df = self._sorted([key, column])
+        first_seen = (~sorted_df.duplicated([key, column])).astype(np.int64)
+        return self._unsort(first_seen.groupby(sorted_df[key], sort=False).cumsum().to_numpy())
+
+    def mean(self, key, column='Amount'):
+        """Mean of column per key over each row and the ones before it"""
+        sorted_df = self._sorted([key, column])
+        groups = sorted_df.groupby(key, sort=False)[column]
+        return self._unsort((groups.cumsum() / (groups.cumcount() + 1)).to_numpy())
+
+    def prior_mean_std(self, key, column='Amount'):
+        """
+        Mean and sample standard deviation of column per key over earlier rows only.
+        A row with no earlier rows gets its own value as the mean; the standard
+        deviation is 0 until there are two earlier rows.
+
+        Returns:
+            (mean, std) arrays aligned with df
+        """
+        sorted_df = self._sorted([key, column])
+        values = sorted_df[column].to_numpy(dtype=float)
+        groups = sorted_df.groupby(key, sort=False)[column]
+
+        n = groups.cumcount().to_numpy()
+        total = groups.cumsum().to_numpy() - values
+        total_sq = (sorted_df[column] ** 2).groupby(sorted_df[key], sort=False).cumsum().to_numpy() - values ** 2
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(n > 0, total / n, values)
+            variance = np.where(n > 1, (total_sq - total * total / n) / (n - 1), 0.0)
+        std = np.sqrt(np.clip(variance, 0, None))
+        return self._unsort(mean), self._unsort(std)
+
+    def per_day(self, key):
+        """Transactions per active day for each key, up to and including each row"""
+        sorted_df = self._sorted([key, 'DateTime'])
+        groups = sorted_df.groupby(key, sort=False)['DateTime']
+        days = (sorted_df['DateTime'] - groups.transform('first')).dt.days + 1
+        return self._unsort((groups.cumcount() + 1).to_numpy() / days.to_numpy())
+
+
+class RiskTableBuilder:
+    """
+    Smoothed fraud rate tables behind the risk score features, as served by
+    FeatureService. The rates are FeatureAggregates.fraud_rate, the same
+    ones create_risk_scores computes offline.
+
+    Labelled chunks are folded into the fraud rate tables of a
+    FeatureAggregates one at a time, so the tables can be built from the
+    full dataset, or they can be taken from aggregates already built during
+    feature engineering. save() writes them as key and rate arrays that
+    FeatureService loads into dictionaries for O(1) lookups.
+    """
+
+    # Table name -> column it is keyed by
+    TABLES = {
+        'mcc': 'MCC',
+        'state': 'Merchant State',
+        'hour': 'hour',
+        'txn_type': 'Use Chip'
+    }
+
+    def __init__(self, aggregates=None, smoothing=RISK_SMOOTHING):
+        """
+        Args:
+            aggregates: FeatureAggregates with fraud rate tables to start from
+            smoothing: Pseudo-count toward the global fraud rate
+        """
+        self.aggregates = aggregates if aggregates is not None else FeatureAggregates()
+        self.smoothing = smoothing
+
+    def update(self, df):
+        """
+        Add one chunk of labelled transactions to the counts.
+
+        Args:
+            df: Transactions with the fraud label and DateTime (or hour) converted
+
+        Returns:
+            self
+        """
+        self.aggregates.merge(FeatureAggregates.from_labels(df))
+        return self
+
+    @property
+    def total_count(self):
+        return self.aggregates.total_count
+
+    @property
+    def global_rate(self):
+        return self.aggregates.global_fraud_rate
+
+    def rates(self, name):
+        """
+        Smoothed fraud rates of one table.
+
+        Args:
+            name: Table name (a key of TABLES)
+
+        Returns:
+            Series of rates indexed by key
+        """
+        return self.aggregates.fraud_rate(self.TABLES[name], self.smoothing)
+
+    def save(self, path=RISK_TABLES_PATH, source_key=None):
+        """
+        Write the tables as <name>_keys / <name>_rates arrays, plus the
+        global rate that unseen keys fall back to.
+
+        Args:
+            path: Output .npz file
+            source_key: Optional key of the data the tables were built from,
+                        read back by risk_tables_key
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        arrays = {'global_rate': np.float64(self.global_rate)}
+        if source_key is not None:
+            arrays['source_key'] = np.str_(source_key)
+        for name in self.TABLES:
+            rates = self.rates(name)
+            keys = rates.index.to_numpy()
+            arrays[f'{name}_keys'] = keys.astype(np.int64) if pd.api.types.is_integer_dtype(keys) else keys.astype(str)
+            arrays[f'{name}_rates'] = rates.to_numpy(dtype=np.float32)
+
+        temp_path = f"{path}.tmp.npz"
+        np.savez(temp_path, **arrays)
+        os.replace(temp_path, path)
+
+
 class FraudFeatureEngine:
     """
     Generates features for fraud detection from transaction data.
     Focuses on velocity, behavioral patterns, and risk indicators.
     """
 
-    def __init__(self):
+    def __init__(self, verbose=True):
         self.user_profiles = {}
         self.merchant_risk_scores = {}
         self.mcc_risk_scores = {}
         self.geo_risk_scores = {}
+        self.verbose = verbose
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    def optimize_dtypes(self, df):
+        """
+        Cast engineered columns to their FEATURE_DTYPES types in place.
+        Integer casts are skipped for columns with missing values (e.g. from a
+        left merge), which keep their float type.
+        """
+        for column, dtype in FEATURE_DTYPES.items():
+            if column not in df.columns or df[column].dtype == dtype:
+                continue
+            if pd.api.types.is_integer_dtype(dtype) and df[column].isna().any():
+                continue
+            df[column] = df[column].astype(dtype)
+        return df
 
     def create_temporal_features(self, df):
         """
         Extract time-based features that capture transaction timing patterns.
         Fraud often occurs at unusual times or with unusual frequency.
         """
-        print("Creating temporal features...")
+        self._log("Creating temporal features...")
 
         # Ensure DateTime column exists
         if 'DateTime' not in df.columns:
-            df['DateTime'] = pd.to_datetime(
-                df['Year'].astype(str) + '-' +
-                df['Month'].astype(str) + '-' +
-                df['Day'].astype(str) + ' ' +
-                df['Time'].astype(str)
-            )
+            df['DateTime'] = build_datetime(df)
 
         # Basic temporal features
         df['hour'] = df['DateTime'].dt.hour
@@ -45,7 +571,7 @@ class FraudFeatureEngine:
         df['year'] = df['DateTime'].dt.year
 
         # Is weekend
-        df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
+        df['is_weekend'] = (df['day_of_week'] >= 5).astype(np.int8)
 
         # Time of day categories
         df['time_of_day'] = pd.cut(df['hour'],
@@ -61,57 +587,128 @@ class FraudFeatureEngine:
         df['dow_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
         df['dow_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
 
-        print(f"Created {8} temporal features")
-        return df
+        self._log(f"Created {8} temporal features")
+        return self.optimize_dtypes(df)
 
-    def create_velocity_features(self, df):
+    def create_velocity_features(self, df, history=None):
         """
         Calculate transaction velocity features.
         Fraudsters often make multiple transactions in short time windows.
+
+        Args:
+            df: Transaction dataframe
+            history: Optional VelocityHistory carrying earlier chunks' recent transactions
         """
-        print("Creating velocity features...")
+        self._log("Creating velocity features...")
+
+        if history is not None:
+            df = history.prepend(df)
 
         # Sort by user, card, and datetime for proper window calculations
         df = df.sort_values(['User', 'Card', 'DateTime']).reset_index(drop=True)
 
-        # Time since last transaction for same user
-        df['time_since_last_txn'] = df.groupby(['User', 'Card'])['DateTime'].diff().dt.total_seconds()
-        df['time_since_last_txn'] = df['time_since_last_txn'].fillna(86400)  # Default 24 hours
+        # Number the (User, Card) runs of the sorted frame
+        users = df['User'].to_numpy()
+        cards = df['Card'].to_numpy()
+        group_start = np.ones(len(df), dtype=bool)
+        group_start[1:] = (users[1:] != users[:-1]) | (cards[1:] != cards[:-1])
+        group_ids = np.cumsum(group_start) - 1
+        first_row = np.flatnonzero(group_start)[group_ids]
+
+        times = df['DateTime'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+        # Time since last transaction for same card
+        time_since_last = np.empty(len(df))
+        time_since_last[1:] = np.diff(times) / 1e9
+        time_since_last[group_start] = 86400  # Default 24 hours
+        df['time_since_last_txn'] = time_since_last
+
+        # One sweep finds where every row's trailing window starts
+        starts = self._window_starts(group_ids, times, ['1h', '24h', '7D'])
+
+        # Window totals are differences of running totals; amount totals
+        # restart at every card to keep rounding error small
+        amounts = df['Amount'].to_numpy(dtype=float)
+        has_amount = ~np.isnan(amounts)
+        running_count = np.concatenate([[0], np.cumsum(has_amount)])
+        running_amount = pd.Series(np.where(has_amount, amounts, 0.0)).groupby(group_ids).cumsum().to_numpy()
+        positions = np.arange(len(df))
+
+        def window_count(start):
+            return running_count[positions + 1] - running_count[start]
+
+        def window_sum(start):
+            before = np.where(start > first_row, running_amount[start - 1], 0.0)
+            return running_amount - before
 
         # Transaction count in last 1 hour
-        df['txn_count_1h'] = df.groupby(['User', 'Card']).rolling(
-            window='1H', on='DateTime'
-        )['Amount'].count().reset_index(drop=True)
+        df['txn_count_1h'] = window_count(starts['1h'])
 
         # Transaction count in last 24 hours
-        df['txn_count_24h'] = df.groupby(['User', 'Card']).rolling(
-            window='24H', on='DateTime'
-        )['Amount'].count().reset_index(drop=True)
+        df['txn_count_24h'] = window_count(starts['24h'])
 
         # Transaction count in last 7 days
-        df['txn_count_7d'] = df.groupby(['User', 'Card']).rolling(
-            window='7D', on='DateTime'
-        )['Amount'].count().reset_index(drop=True)
+        df['txn_count_7d'] = window_count(starts['7D'])
 
         # Amount spent in last 24 hours
-        df['amount_sum_24h'] = df.groupby(['User', 'Card']).rolling(
-            window='24H', on='DateTime'
-        )['Amount'].sum().reset_index(drop=True)
+        df['amount_sum_24h'] = window_sum(starts['24h'])
 
         # Fill NaN values for velocity features
         velocity_cols = ['txn_count_1h', 'txn_count_24h', 'txn_count_7d', 'amount_sum_24h']
         for col in velocity_cols:
             df[col] = df[col].fillna(1)
 
-        print(f"Created 5 velocity features")
-        return df
+        if history is not None:
+            df = history.update(df)
+
+        self._log(f"Created 5 velocity features")
+        return self.optimize_dtypes(df)
 
-    def create_amount_features(self, df):
+    @staticmethod
+    def _window_starts(group_ids, times, windows):
+        """
+        Find the first row of each row's trailing time window, per group.
+
+        Rows must be sorted by group and then time. Times are replaced by their
+        rank among all distinct times, so (group, rank) packs into one sortable
+        int64 key and each window needs a single searchsorted over all rows.
+        Ranks come from one argsort, which also keeps every other searchsorted
+        query in sorted order.
+
+        Args:
+            group_ids: Group number of every row (non-decreasing)
+            times: Row timestamps as int64 nanoseconds
+            windows: Window lengths as pandas offset strings
+
+        Returns:
+            Dictionary mapping each window to an array of start positions
+        """
+        order = np.argsort(times)
+        sorted_times = times[order]
+        is_new = np.ones(len(times), dtype=bool)
+        is_new[1:] = sorted_times[1:] != sorted_times[:-1]
+        distinct_times = sorted_times[is_new]
+
+        n_ranks = len(distinct_times) + 1
+        ranks = np.empty(len(times), dtype=np.int64)
+        ranks[order] = np.cumsum(is_new) - 1
+        keys = group_ids * n_ranks + ranks
+
+        starts = {}
+        opening = np.empty(len(times), dtype=np.int64)
+        for window in windows:
+            # Windows are (t - window, t], so they open at the first time after t - window
+            opening[order] = np.searchsorted(distinct_times, sorted_times - pd.Timedelta(window).value, side='right')
+            starts[window] = np.searchsorted(keys, group_ids * n_ranks + opening)
+        return starts
+
+    def create_amount_features(self, df, aggregates=None, point_in_time=False):
         """
         Create features related to transaction amounts.
         Unusual amounts are strong fraud indicators.
+        With point_in_time, deviations are measured against earlier transactions only.
         """
-        print("Creating amount features...")
+        self._log("Creating amount features...")
 
         # Log transform to handle skewness
         df['amount_log'] = np.log1p(df['Amount'])
@@ -122,108 +719,149 @@ class FraudFeatureEngine:
                                        labels=['very_small', 'small', 'medium', 'large', 'very_large'])
 
         # Is the amount a round number (often indicates fraud)
-        df['is_round_amount'] = ((df['Amount'] % 10 == 0) & (df['Amount'] > 0)).astype(int)
+        df['is_round_amount'] = ((df['Amount'] % 10 == 0) & (df['Amount'] > 0)).astype(np.int8)
+
+        expanding = ExpandingAggregates(df) if point_in_time else None
 
         # Deviation from user's historical average
-        user_avg = df.groupby('User')['Amount'].transform('mean')
-        user_std = df.groupby('User')['Amount'].transform('std')
+        if point_in_time:
+            user_avg, user_std = expanding.prior_mean_std('User')
+        elif aggregates is None:
+            user_avg = df.groupby('User')['Amount'].transform('mean')
+            user_std = df.groupby('User')['Amount'].transform('std')
+        else:
+            user_avg = df['User'].map(aggregates.amount_mean('User'))
+            user_std = df['User'].map(aggregates.amount_std('User'))
         df['amount_vs_user_avg'] = (df['Amount'] - user_avg) / (user_std + 1)
 
         # Deviation from merchant category average
-        mcc_avg = df.groupby('MCC')['Amount'].transform('mean')
-        mcc_std = df.groupby('MCC')['Amount'].transform('std')
+        if point_in_time:
+            mcc_avg, mcc_std = expanding.prior_mean_std('MCC')
+        elif aggregates is None:
+            mcc_avg = df.groupby('MCC')['Amount'].transform('mean')
+            mcc_std = df.groupby('MCC')['Amount'].transform('std')
+        else:
+            mcc_avg = df['MCC'].map(aggregates.amount_mean('MCC'))
+            mcc_std = df['MCC'].map(aggregates.amount_std('MCC'))
         df['amount_vs_mcc_avg'] = (df['Amount'] - mcc_avg) / (mcc_std + 1)
 
         # Is amount negative (refund/chargeback)
-        df['is_refund'] = (df['Amount'] < 0).astype(int)
+        df['is_refund'] = (df['Amount'] < 0).astype(np.int8)
 
-        print(f"Created 6 amount features")
-        return df
+        self._log(f"Created 6 amount features")
+        return self.optimize_dtypes(df)
 
-    def create_merchant_features(self, df):
+    def create_merchant_features(self, df, aggregates=None, point_in_time=False):
         """
         Create merchant-related features.
         Certain merchants and categories have higher fraud rates.
+        With point_in_time, counts only include the transaction and earlier ones.
         """
-        print("Creating merchant features...")
+        self._log("Creating merchant features...")
+
+        expanding = ExpandingAggregates(df) if point_in_time else None
 
         # Transaction count per merchant (merchant popularity)
-        merchant_counts = df['Merchant Name'].value_counts()
-        df['merchant_txn_count'] = df['Merchant Name'].map(merchant_counts)
+        if point_in_time:
+            df['merchant_txn_count'] = expanding.count(['Merchant Name'])
+        else:
+            merchant_counts = df['Merchant Name'].value_counts() if aggregates is None else aggregates.counts['merchant']
+            df['merchant_txn_count'] = df['Merchant Name'].map(merchant_counts)
 
         # Is online transaction
-        df['is_online'] = (df['Merchant City'] == 'ONLINE').astype(int)
+        df['is_online'] = (df['Merchant City'] == 'ONLINE').astype(np.int8)
 
         # MCC frequency features
-        mcc_counts = df['MCC'].value_counts()
-        df['mcc_frequency'] = df['MCC'].map(mcc_counts)
+        if point_in_time:
+            df['mcc_frequency'] = expanding.count(['MCC'])
+        else:
+            mcc_counts = df['MCC'].value_counts() if aggregates is None else aggregates.counts['mcc']
+            df['mcc_frequency'] = df['MCC'].map(mcc_counts)
 
         # User's transaction count with this merchant
-        user_merchant_counts = df.groupby(['User', 'Merchant Name']).size()
-        df['user_merchant_txn_count'] = df.set_index(['User', 'Merchant Name']).index.map(
-            user_merchant_counts
-        ).values
-        df['user_merchant_txn_count'] = df['user_merchant_txn_count'].fillna(0)
+        if point_in_time:
+            df['user_merchant_txn_count'] = expanding.count(['User', 'Merchant Name'])
+        else:
+            if aggregates is None:
+                user_merchant_counts = df.groupby(['User', 'Merchant Name']).size()
+            else:
+                user_merchant_counts = aggregates.counts['user_merchant']
+            df['user_merchant_txn_count'] = df.set_index(['User', 'Merchant Name']).index.map(
+                user_merchant_counts
+            ).values
+            df['user_merchant_txn_count'] = df['user_merchant_txn_count'].fillna(0)
 
         # Is this user's first transaction with this merchant
-        df['is_first_merchant_txn'] = (df['user_merchant_txn_count'] == 1).astype(int)
+        df['is_first_merchant_txn'] = (df['user_merchant_txn_count'] == 1).astype(np.int8)
 
         # Chip usage features
-        df['is_chip_txn'] = (df['Use Chip'] == 'Chip Transaction').astype(int)
-        df['is_swipe_txn'] = (df['Use Chip'] == 'Swipe Transaction').astype(int)
-        df['is_online_txn'] = (df['Use Chip'] == 'Online Transaction').astype(int)
+        df['is_chip_txn'] = (df['Use Chip'] == 'Chip Transaction').astype(np.int8)
+        df['is_swipe_txn'] = (df['Use Chip'] == 'Swipe Transaction').astype(np.int8)
+        df['is_online_txn'] = (df['Use Chip'] == 'Online Transaction').astype(np.int8)
 
-        print(f"Created 8 merchant features")
-        return df
+        self._log(f"Created 8 merchant features")
+        return self.optimize_dtypes(df)
 
-    def create_geographic_features(self, df):
+    def create_geographic_features(self, df, aggregates=None, point_in_time=False):
         """
         Create location-based features.
         Geographic patterns are strong fraud indicators.
+        With point_in_time, state counts only include the transaction and earlier
+        ones; the user's primary state is still taken over all of df.
         """
-        print("Creating geographic features...")
+        self._log("Creating geographic features...")
 
         # State-based features
-        state_txn_counts = df['Merchant State'].value_counts()
-        df['state_txn_count'] = df['Merchant State'].map(state_txn_counts).fillna(0)
+        if point_in_time:
+            state_counts = ExpandingAggregates(df).count(['Merchant State'])
+            df['state_txn_count'] = np.where(df['Merchant State'].isna(), 0, state_counts)
+        else:
+            state_txn_counts = df['Merchant State'].value_counts() if aggregates is None else aggregates.counts['state']
+            df['state_txn_count'] = df['Merchant State'].map(state_txn_counts).astype(float).fillna(0)
 
         # Is international transaction
         international_states = ['Mexico', 'Italy', 'Poland', 'Philippines', 'Peru',
                                'Pakistan', 'China', 'Japan', 'Canada', 'UK']
-        df['is_international'] = df['Merchant State'].isin(international_states).astype(int)
+        df['is_international'] = df['Merchant State'].isin(international_states).astype(np.int8)
 
         # High risk states (based on analysis findings)
         high_risk_states = ['Italy', 'OH']
-        df['is_high_risk_state'] = df['Merchant State'].isin(high_risk_states).astype(int)
+        df['is_high_risk_state'] = df['Merchant State'].isin(high_risk_states).astype(np.int8)
 
         # Primary states (CA and NY account for 70% of transactions)
-        df['is_primary_state'] = df['Merchant State'].isin(['CA', 'NY']).astype(int)
+        df['is_primary_state'] = df['Merchant State'].isin(['CA', 'NY']).astype(np.int8)
 
         # Missing geographic data (often indicates online/virtual transactions)
-        df['missing_geo_data'] = (df['Merchant State'].isna() | df['Zip'].isna()).astype(int)
+        df['missing_geo_data'] = (df['Merchant State'].isna() | df['Zip'].isna()).astype(np.int8)
 
         # Distance from user's home state (would require user location data)
         # For now, using a proxy: same state as most common transaction location
-        user_primary_state = df.groupby('User')['Merchant State'].agg(
-            lambda x: x.mode()[0] if len(x.mode()) > 0 else None
-        )
+        if aggregates is None:
+            user_state_counts = df.groupby(['User', 'Merchant State'], observed=True).size()
+        else:
+            user_state_counts = aggregates.counts['user_state']
+        user_primary_state = FeatureAggregates.most_frequent(user_state_counts)
         df['is_user_primary_state'] = (
             df['Merchant State'] == df['User'].map(user_primary_state)
-        ).astype(int)
+        ).astype(np.int8)
 
-        print(f"Created 6 geographic features")
-        return df
+        self._log(f"Created 6 geographic features")
+        return self.optimize_dtypes(df)
 
-    def create_card_features(self, df, cards_df=None):
+    def create_card_features(self, df, cards_df=None, aggregates=None, point_in_time=False):
         """
         Create card-related features.
         Card characteristics can indicate fraud risk.
+        With point_in_time, card counts only include the transaction and earlier ones.
         """
-        print("Creating card features...")
+        self._log("Creating card features...")
 
         # Transaction count per card
-        card_counts = df.groupby('Card').size()
-        df['card_txn_count'] = df['Card'].map(card_counts)
+        if point_in_time:
+            df['card_txn_count'] = ExpandingAggregates(df).count(['Card'])
+        else:
+            card_counts = df.groupby('Card').size() if aggregates is None else aggregates.counts['card']
+            df['card_txn_count'] = df['Card'].map(card_counts)
 
         # If card data is available, merge relevant features
         if cards_df is not None:
@@ -238,59 +876,92 @@ class FraudFeatureEngine:
                          how='left')
 
             # Encode card features
-            df['card_on_dark_web'] = (df['Card on Dark Web'] == 'Yes').astype(int)
-            df['card_has_chip'] = (df['Has Chip'] == 'YES').astype(int)
+            df['card_on_dark_web'] = (df['Card on Dark Web'] == 'Yes').astype(np.int8)
+            df['card_has_chip'] = (df['Has Chip'] == 'YES').astype(np.int8)
 
             # Chip mismatch (card has chip but swipe used)
             df['chip_mismatch'] = (
                 (df['card_has_chip'] == 1) & (df['is_swipe_txn'] == 1)
-            ).astype(int)
+            ).astype(np.int8)
 
             # Card brand
-            df['is_visa'] = (df['Card Brand'] == 'Visa').astype(int)
-            df['is_mastercard'] = (df['Card Brand'] == 'Mastercard').astype(int)
+            df['is_visa'] = (df['Card Brand'] == 'Visa').astype(np.int8)
+            df['is_mastercard'] = (df['Card Brand'] == 'Mastercard').astype(np.int8)
 
             # Card type
-            df['is_debit'] = df['Card Type'].str.contains('Debit', na=False).astype(int)
-            df['is_credit'] = (df['Card Type'] == 'Credit').astype(int)
+            df['is_debit'] = df['Card Type'].str.contains('Debit', na=False).astype(np.int8)
+            df['is_credit'] = (df['Card Type'] == 'Credit').astype(np.int8)
 
-            print(f"Created 9 card features (with card data)")
+            self._log(f"Created 9 card features (with card data)")
         else:
-            print(f"Created 1 card feature (without supplementary card data)")
+            self._log(f"Created 1 card feature (without supplementary card data)")
 
-        return df
+        return self.optimize_dtypes(df)
 
-    def create_user_behavior_features(self, df, users_df=None):
+    def create_user_behavior_features(self, df, users_df=None, aggregates=None, point_in_time=False):
         """
         Create user behavioral features.
         Changes in user behavior patterns can indicate account takeover.
+        With point_in_time, each row describes the user's history up to and
+        including that transaction.
         """
-        print("Creating user behavior features...")
+        self._log("Creating user behavior features...")
+
+        if point_in_time:
+            expanding = ExpandingAggregates(df)
+            df['user_card_count'] = expanding.distinct('User', 'Card')
+            df['user_merchant_diversity'] = expanding.distinct('User', 'Merchant Name')
+            df['user_mcc_diversity'] = expanding.distinct('User', 'MCC')
+            df['user_avg_amount'] = expanding.mean('User')
+            df['user_txn_per_day'] = expanding.per_day('User')
+            return self._add_user_details(df, users_df)
 
         # Number of unique cards per user
-        user_card_counts = df.groupby('User')['Card'].nunique()
+        if aggregates is None:
+            user_card_counts = df.groupby('User')['Card'].nunique()
+        else:
+            user_card_counts = aggregates.distinct_count('user_card')
         df['user_card_count'] = df['User'].map(user_card_counts)
 
         # Number of unique merchants per user
-        user_merchant_counts = df.groupby('User')['Merchant Name'].nunique()
+        if aggregates is None:
+            user_merchant_counts = df.groupby('User')['Merchant Name'].nunique()
+        else:
+            user_merchant_counts = aggregates.distinct_count('user_merchant')
         df['user_merchant_diversity'] = df['User'].map(user_merchant_counts)
 
         # Number of unique MCCs per user (spending diversity)
-        user_mcc_counts = df.groupby('User')['MCC'].nunique()
+        if aggregates is None:
+            user_mcc_counts = df.groupby('User')['MCC'].nunique()
+        else:
+            user_mcc_counts = aggregates.distinct_count('user_mcc')
         df['user_mcc_diversity'] = df['User'].map(user_mcc_counts)
 
         # User's average transaction amount
-        user_avg_amount = df.groupby('User')['Amount'].mean()
+        if aggregates is None:
+            user_avg_amount = df.groupby('User')['Amount'].mean()
+        else:
+            user_avg_amount = aggregates.amount_mean('User')
         df['user_avg_amount'] = df['User'].map(user_avg_amount)
 
         # User's transaction frequency (transactions per day)
-        user_date_range = df.groupby('User')['DateTime'].agg(lambda x: (x.max() - x.min()).days + 1)
-        user_txn_counts = df.groupby('User').size()
-        df['user_txn_per_day'] = df['User'].map(user_txn_counts / user_date_range)
+        if aggregates is None:
+            user_date_range = df.groupby('User')['DateTime'].agg(lambda x: (x.max() - x.min()).days + 1)
+            user_txn_counts = df.groupby('User').size()
+            user_txn_per_day = user_txn_counts / user_date_range
+        else:
+            user_txn_per_day = aggregates.user_txn_per_day()
+        df['user_txn_per_day'] = df['User'].map(user_txn_per_day)
         df['user_txn_per_day'] = df['user_txn_per_day'].fillna(0)
 
+        return self._add_user_details(df, users_df)
+
+    def _add_user_details(self, df, users_df):
+        """Merge demographic features from the users file, if available"""
         # If user data is available, add demographic features
         if users_df is not None:
+            # Work on a copy so the caller's frame (and later chunks) keep the raw strings
+            users_df = users_df.copy()
             # Convert income and debt to numeric
             users_df['Yearly Income - Person'] = users_df['Yearly Income - Person'].str.replace(
                 '$', ''
@@ -317,34 +988,40 @@ class FraudFeatureEngine:
             # Transaction amount as percentage of annual income
             df['amount_pct_of_income'] = df['Amount'] / (df['Yearly Income - Person'] / 365 + 1)
 
-            print(f"Created 11 user behavior features (with user data)")
+            self._log(f"Created 11 user behavior features (with user data)")
         else:
-            print(f"Created 5 user behavior features (without supplementary user data)")
+            self._log(f"Created 5 user behavior features (without supplementary user data)")
 
-        return df
+        return self.optimize_dtypes(df)
 
-    def create_risk_scores(self, df):
+    def create_risk_scores(self, df, aggregates=None):
         """
         Calculate risk scores based on historical fraud rates.
-        These are learned from the training data.
+        These are learned from the training data, smoothed like the
+        RiskTableBuilder tables FeatureService serves them from.
         """
-        print("Creating risk score features...")
+        self._log("Creating risk score features...")
+
+        if aggregates is None:
+            aggregates = FeatureAggregates.from_labels(df)
+        fraud_rate = aggregates.fraud_rate
+        global_fraud_rate = aggregates.global_fraud_rate
 
         # Calculate fraud rate by merchant category (MCC)
-        mcc_fraud_rate = df.groupby('MCC')['Is Fraud?'].mean()
-        df['mcc_fraud_rate'] = df['MCC'].map(mcc_fraud_rate).fillna(df['Is Fraud?'].mean())
+        mcc_fraud_rate = fraud_rate('MCC')
+        df['mcc_fraud_rate'] = df['MCC'].map(mcc_fraud_rate).fillna(global_fraud_rate)
 
         # Calculate fraud rate by state
-        state_fraud_rate = df.groupby('Merchant State')['Is Fraud?'].mean()
-        df['state_fraud_rate'] = df['Merchant State'].map(state_fraud_rate).fillna(df['Is Fraud?'].mean())
+        state_fraud_rate = fraud_rate('Merchant State')
+        df['state_fraud_rate'] = df['Merchant State'].map(state_fraud_rate).astype(float).fillna(global_fraud_rate)
 
         # Calculate fraud rate by hour
-        hour_fraud_rate = df.groupby('hour')['Is Fraud?'].mean()
-        df['hour_fraud_rate'] = df['hour'].map(hour_fraud_rate).fillna(df['Is Fraud?'].mean())
+        hour_fraud_rate = fraud_rate('hour')
+        df['hour_fraud_rate'] = df['hour'].map(hour_fraud_rate).fillna(global_fraud_rate)
 
         # Calculate fraud rate by transaction type
-        txn_type_fraud_rate = df.groupby('Use Chip')['Is Fraud?'].mean()
-        df['txn_type_fraud_rate'] = df['Use Chip'].map(txn_type_fraud_rate).fillna(df['Is Fraud?'].mean())
+        txn_type_fraud_rate = fraud_rate('Use Chip')
+        df['txn_type_fraud_rate'] = df['Use Chip'].map(txn_type_fraud_rate).astype(float).fillna(global_fraud_rate)
 
         # Composite risk score (weighted average)
         df['composite_risk_score'] = (
@@ -354,10 +1031,11 @@ class FraudFeatureEngine:
             df['txn_type_fraud_rate'] * 0.2
         )
 
-        print(f"Created 5 risk score features")
-        return df
+        self._log(f"Created 5 risk score features")
+        return self.optimize_dtypes(df)
 
-    def create_all_features(self, df, cards_df=None, users_df=None, include_risk_scores=True):
+    def create_all_features(self, df, cards_df=None, users_df=None, include_risk_scores=True,
+                            aggregates=None, history=None, point_in_time=False):
         """
         Generate all features for fraud detection.
         This is the main entry point for the feature engineering pipeline.
@@ -367,35 +1045,239 @@ class FraudFeatureEngine:
             cards_df: Optional card details dataframe
             users_df: Optional user details dataframe
             include_risk_scores: Whether to include risk scores (only for training data)
+            aggregates: Optional FeatureAggregates to use instead of statistics of df itself
+            history: Optional VelocityHistory carrying recent transactions from earlier chunks
+            point_in_time: Compute count, deviation and user behavior features from
+                           each transaction's past only (see ExpandingAggregates),
+                           matching what FeatureService can compute online
         """
-        print("\n" + "=" * 80)
-        print("FEATURE ENGINEERING PIPELINE")
-        print("=" * 80)
-        print(f"\nStarting with {len(df)} transactions and {len(df.columns)} features")
+        if point_in_time and aggregates is not None:
+            raise ValueError("point_in_time features are computed from df itself and can't use aggregates")
+
+        self._log("\n" + "=" * 80)
+        self._log("FEATURE ENGINEERING PIPELINE")
+        self._log("=" * 80)
+        self._log(f"\nStarting with {len(df)} transactions and {len(df.columns)} features")
 
         original_count = len(df)
 
         # Create all feature groups
         df = self.create_temporal_features(df)
-        df = self.create_amount_features(df)
-        df = self.create_merchant_features(df)
-        df = self.create_geographic_features(df)
-        df = self.create_card_features(df, cards_df)
-        df = self.create_user_behavior_features(df, users_df)
+        df = self.create_amount_features(df, aggregates, point_in_time)
+        df = self.create_merchant_features(df, aggregates, point_in_time)
+        df = self.create_geographic_features(df, aggregates, point_in_time)
+        df = self.create_card_features(df, cards_df, aggregates, point_in_time)
+        df = self.create_user_behavior_features(df, users_df, aggregates, point_in_time)
 
         # Velocity features are computationally expensive, do them last
-        df = self.create_velocity_features(df)
+        df = self.create_velocity_features(df, history)
 
         # Risk scores should only be calculated on training data to avoid leakage
         if include_risk_scores:
-            df = self.create_risk_scores(df)
+            df = self.create_risk_scores(df, aggregates)
+
+        self._log("\n" + "=" * 80)
+        self._log(f"Feature engineering complete!")
+        self._log(f"Final dataset: {len(df)} transactions with {len(df.columns)} features")
+        self._log(f"Added {len(df.columns) - 15} new features")
+        self._log("=" * 80)
+
+        return df
+
+    def create_features_streaming(self, chunks, output_path, cards_df=None, users_df=None,
+                                  include_risk_scores=True, state_path=None):
+        """
+        Engineer features for a dataset too large to hold in memory.
+
+        Makes two passes over the chunks: the first accumulates the whole-dataset
+        aggregates, the second computes features chunk by chunk (carrying each
+        card's recent transactions across chunk boundaries) and appends them to
+        output_path. Results match create_all_features on the full dataset, but
+        peak memory depends only on the chunk size and the number of entities.
+
+        Args:
+            chunks: Callable returning a fresh iterator of cleaned transaction chunks
+                    (e.g. CreditCardDataAnalyzer.iter_transaction_chunks)
+            output_path: CSV or .parquet file the engineered features are written to
+            cards_df: Optional card details dataframe
+            users_df: Optional user details dataframe
+            include_risk_scores: Whether to include risk scores (only for training data)
+            state_path: Optional file to save the final aggregates and velocity
+                        history to, for create_features_incremental
+
+        Returns:
+            Dictionary with row count, elapsed seconds and rows per second
+        """
+        print("\n" + "=" * 80)
+        print("STREAMING FEATURE ENGINEERING PIPELINE")
+        print("=" * 80)
+
+        start_time = time.perf_counter()
+
+        print("\nPass 1: accumulating dataset aggregates...")
+        aggregates = FeatureAggregates()
+        for chunk in chunks():
+            aggregates.update(chunk)
+            elapsed = time.perf_counter() - start_time
+            print(f"  {aggregates.total_count:,} rows ({aggregates.total_count / elapsed:,.0f} rows/s)")
+
+        print("\nPass 2: computing features...")
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        temp_path = f"{output_path}.tmp"
+        parquet_writer = ParquetChunkWriter(output_path) if output_path.endswith('.parquet') else None
+
+        verbose = self.verbose
+        self.verbose = False
+        history = VelocityHistory()
+        pass_start = time.perf_counter()
+        rows_written = 0
+        try:
+            for chunk in chunks():
+                features = self.create_all_features(
+                    chunk, cards_df=cards_df, users_df=users_df,
+                    include_risk_scores=include_risk_scores,
+                    aggregates=aggregates, history=history
+                )
+                if parquet_writer is not None:
+                    parquet_writer.write(features)
+                else:
+                    features.to_csv(temp_path, mode='w' if rows_written == 0 else 'a',
+                                    header=rows_written == 0, index=False)
+                rows_written += len(features)
+
+                elapsed = time.perf_counter() - pass_start
+                print(f"  {rows_written:,} rows ({rows_written / elapsed:,.0f} rows/s)")
+        finally:
+            self.verbose = verbose
+
+        if parquet_writer is not None:
+            parquet_writer.close()
+        else:
+            os.replace(temp_path, output_path)
+
+        if state_path is not None:
+            save_feature_state(state_path, aggregates, history)
+
+        total_seconds = time.perf_counter() - start_time
+        summary = {
+            'rows': rows_written,
+            'seconds': total_seconds,
+            'rows_per_second': rows_written / total_seconds if total_seconds else 0.0
+        }
 
         print("\n" + "=" * 80)
-        print(f"Feature engineering complete!")
-        print(f"Final dataset: {len(df)} transactions with {len(df.columns)} features")
-        print(f"Added {len(df.columns) - 15} new features")
+        print(f"Streaming feature engineering complete!")
+        print(f"Wrote {rows_written:,} transactions to {output_path}")
+        print(f"Total time: {total_seconds:.1f}s ({summary['rows_per_second']:,.0f} rows/s)")
         print("=" * 80)
 
+        return summary
+
+    def create_features_incremental(self, df, state_path, cards_df=None, users_df=None,
+                                    include_risk_scores=True):
+        """
+        Engineer features for newly arrived transactions only.
+
+        The aggregates and per-card velocity history of earlier runs are loaded
+        from state_path, the new rows are merged into them, and features are
+        computed for the new rows alone. Work grows with the new rows and the
+        number of entities, not with the full history. The new rows get the
+        same features create_all_features would give them on the combined
+        history; features stored for earlier rows are not revised.
+
+        Without a state file, df is treated as the whole history so far.
+
+        Args:
+            df: New transactions, later than the earlier runs' rows for every card
+            state_path: File with the saved aggregates and velocity history (updated in place)
+            cards_df: Optional card details dataframe
+            users_df: Optional user details dataframe
+            include_risk_scores: Whether to include risk scores (only for training data)
+
+        Returns:
+            DataFrame of the new transactions with all engineered features
+        """
+        if os.path.exists(state_path):
+            aggregates, history = load_feature_state(state_path)
+            self._log(f"Loaded feature state for {aggregates.total_count:,} earlier transactions")
+        else:
+            aggregates, history = FeatureAggregates(), VelocityHistory()
+            self._log("No feature state found, starting a new history")
+
+        aggregates.update(df)
+        df = self.create_all_features(
+            df, cards_df=cards_df, users_df=users_df,
+            include_risk_scores=include_risk_scores,
+            aggregates=aggregates, history=history
+        )
+
+        save_feature_state(state_path, aggregates, history)
+        self._log(f"Feature state now covers {aggregates.total_count:,} transactions")
+        return df
+
+    def create_features_parallel(self, df, cards_df=None, users_df=None, include_risk_scores=True,
+                                 n_jobs=None, partitions_per_job=2):
+        """
+        Engineer features in a process pool, partitioning transactions by user.
+
+        Velocity windows, user behavior, user-merchant counts and primary states
+        only need one user's rows, so each user-hash partition is processed
+        independently. Tables that span users (merchant, MCC, state and card
+        counts, MCC amount statistics and the fraud-rate maps) come from a
+        map-reduce step: workers build FeatureAggregates for their partition
+        and the parent merges the global parts before the feature pass.
+
+        Args:
+            df: Transaction dataframe
+            cards_df: Optional card details dataframe
+            users_df: Optional user details dataframe
+            include_risk_scores: Whether to include risk scores (only for training data)
+            n_jobs: Worker processes (default: all CPU cores)
+            partitions_per_job: Partitions per worker, to even out skewed users
+
+        Returns:
+            DataFrame with all engineered features, sorted by User, Card and DateTime
+        """
+        n_jobs = n_jobs or os.cpu_count() or 1
+        if n_jobs == 1:
+            return self.create_all_features(df, cards_df, users_df, include_risk_scores)
+
+        self._log("\n" + "=" * 80)
+        self._log(f"PARALLEL FEATURE ENGINEERING PIPELINE ({n_jobs} processes)")
+        self._log("=" * 80)
+
+        start_time = time.perf_counter()
+
+        n_partitions = n_jobs * partitions_per_job
+        partition_ids = pd.util.hash_array(df['User'].to_numpy()) % n_partitions
+        partitions = [df[partition_ids == i] for i in range(n_partitions)]
+        partitions = [partition for partition in partitions if len(partition)]
+
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            # Map: aggregates of every partition. Reduce: merge the global tables.
+            partials = list(pool.map(_partition_aggregates, partitions))
+            global_aggregates = FeatureAggregates()
+            for partial in partials:
+                global_aggregates.merge(partial.global_part())
+            self._log(f"Reduced aggregates of {len(partitions)} partitions "
+                      f"in {time.perf_counter() - start_time:.1f}s")
+
+            # Each partition keeps its own per-user tables plus the merged global ones
+            results = pool.map(
+                _partition_features,
+                partitions,
+                [partial.with_global(global_aggregates) for partial in partials],
+                repeat(cards_df), repeat(users_df), repeat(include_risk_scores)
+            )
+            df = pd.concat(list(results), ignore_index=True)
+
+        df = df.sort_values(['User', 'Card', 'DateTime'], kind='mergesort').reset_index(drop=True)
+        # Categoricals created per partition have different categories and concat to object
+        df = self.optimize_dtypes(df)
+
+        seconds = time.perf_counter() - start_time
+        self._log(f"Engineered {len(df):,} transactions in {seconds:.1f}s "
+                  f"({len(df) / seconds:,.0f} rows/s)")
         return df
 
     def get_feature_names(self):
@@ -441,31 +1323,287 @@ class FraudFeatureEngine:
         return feature_names
 
 
-if __name__ == "__main__":
-    print("Loading dataset for feature engineering...")
+def _partition_aggregates(partition):
+    """Pool task: FeatureAggregates of one user partition"""
+    return FeatureAggregates().update(partition)
+
+
+def _partition_features(partition, aggregates, cards_df, users_df, include_risk_scores):
+    """Pool task: engineered features of one user partition"""
+    return FraudFeatureEngine(verbose=False).create_all_features(
+        partition, cards_df=cards_df, users_df=users_df,
+        include_risk_scores=include_risk_scores, aggregates=aggregates
+    )
+
+
+def save_feature_state(path, aggregates, history):
+    """
+    Save the aggregates and velocity history behind incremental feature runs.
+
+    Args:
+        path: Output file
+        aggregates: FeatureAggregates over every transaction processed so far
+        history: VelocityHistory holding each card's trailing window
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    state = {
+        'feature_version': FEATURE_VERSION,
+        'aggregates': aggregates,
+        'history': history
+    }
+    temp_path = f"{path}.tmp"
+    joblib.dump(state, temp_path)
+    os.replace(temp_path, path)
+
+
+def load_feature_state(path):
+    """
+    Load state saved by save_feature_state.
+
+    Args:
+        path: State file
+
+    Returns:
+        (FeatureAggregates, VelocityHistory) tuple
+    """
+    state = joblib.load(path)
+    if state['feature_version'] != FEATURE_VERSION:
+        raise ValueError(
+            f"Feature state in {path} was built by feature version {state['feature_version']}, "
+            f"current version is {FEATURE_VERSION}. Rebuild it with feature_engineering.py --stream"
+        )
+    return state['aggregates'], state['history']
+
+
+def feature_cache_key(analyzer, sample_size=DEFAULT_SAMPLE_SIZE, include_risk_scores=True,
+                      point_in_time=False):
+    """
+    Cache key of the engineered feature dataset for an analyzer's data files.
+
+    Args:
+        analyzer: CreditCardDataAnalyzer pointing at the data directory
+        sample_size: Number of transactions (None for the full dataset)
+        include_risk_scores: Whether the dataset includes risk scores
+        point_in_time: Whether aggregates only use each transaction's past
+
+    Returns:
+        Key for analyzer.cache
+    """
+    sources = [
+        analyzer.transactions_path,
+        f'{analyzer.data_dir}/sd254_cards.csv',
+        f'{analyzer.data_dir}/sd254_users.csv'
+    ]
+    return analyzer.cache.make_key(sources, version=FEATURE_VERSION, raw_version=RAW_DATA_VERSION,
+                                   sample_size=sample_size, include_risk_scores=include_risk_scores,
+                                   point_in_time=point_in_time)
+
+
+def load_feature_dataset(data_dir='detection_data', sample_size=DEFAULT_SAMPLE_SIZE,
+                         include_risk_scores=True, use_cache=True, n_jobs=1, point_in_time=False):
+    """
+    Load the engineered feature dataset, computing and caching it if the
+    source files or FEATURE_VERSION changed since it was last built.
+
+    Args:
+        data_dir: Directory with the raw dataset files
+        sample_size: Number of transactions (None for the full dataset, as
+                     written by feature_engineering.py --stream)
+        include_risk_scores: Whether to include risk scores
+        use_cache: Read and write the Parquet dataset cache
+        n_jobs: Processes to engineer features with on a cache miss (None for all cores)
+        point_in_time: Compute aggregates from each transaction's past only.
+                       Expanding counts span users, so this always runs in one process.
+
+    Returns:
+        DataFrame of transactions with engineered features
+    """
+    analyzer = CreditCardDataAnalyzer(data_dir=data_dir, use_cache=use_cache)
+
+    if analyzer.cache is not None and analyzer.cache.enabled:
+        key = feature_cache_key(analyzer, sample_size, include_risk_scores, point_in_time)
+        df = analyzer.cache.load('features', key)
+        if df is not None:
+            print(f"Loaded engineered features from cache: {analyzer.cache.path('features', key)}")
+            return df
+
+    analyzer.load_data(sample_size=sample_size)
+    if point_in_time:
+        df = FraudFeatureEngine().create_all_features(
+            analyzer.transactions_df,
+            cards_df=analyzer.cards_df,
+            users_df=analyzer.users_df,
+            include_risk_scores=include_risk_scores,
+            point_in_time=True
+        )
+    else:
+        df = FraudFeatureEngine().create_features_parallel(
+            analyzer.transactions_df,
+            cards_df=analyzer.cards_df,
+            users_df=analyzer.users_df,
+            include_risk_scores=include_risk_scores,
+            n_jobs=n_jobs
+        )
+
+    if analyzer.cache is not None and analyzer.cache.enabled:
+        analyzer.cache.save('features', key, df)
+        print(f"Cached engineered features: {analyzer.cache.path('features', key)}")
+    return df
+
+
+def feature_dataset_path(data_dir='detection_data', sample_size=None, include_risk_scores=True):
+    """
+    File of an engineered feature dataset, without loading it.
+
+    Args:
+        data_dir: Directory with the raw dataset files
+        sample_size: Number of transactions (None for the full dataset written by --stream)
+        include_risk_scores: Whether the dataset includes risk scores
+
+    Returns:
+        Path of the cached Parquet file or, when there is none for the full
+        dataset, of the CSV --stream writes with --no-cache
+    """
+    csv_path = f'{data_dir}/transactions_with_features.csv'
+    analyzer = CreditCardDataAnalyzer(data_dir=data_dir)
+    if analyzer.cache is not None and analyzer.cache.enabled:
+        path = analyzer.cache.path('features', feature_cache_key(analyzer, sample_size, include_risk_scores))
+        if not os.path.exists(path) and sample_size is None and os.path.exists(csv_path):
+            path = csv_path
+    else:
+        path = csv_path
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"Engineered features not found at {path}. "
+            "Run feature_engineering.py --stream first."
+        )
+    return path
 
-    # Load data using the analyzer
-    from data_analysis import CreditCardDataAnalyzer
 
-    analyzer = CreditCardDataAnalyzer(data_dir='detection_data')
-    analyzer.load_data(sample_size=100000)
+def risk_tables_key(path=RISK_TABLES_PATH):
+    """Source key saved with the risk tables at path, or None"""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as arrays:
+        return str(arrays['source_key']) if 'source_key' in arrays.files else None
 
-    # Initialize feature engine
-    feature_engine = FraudFeatureEngine()
 
-    # Create all features
-    df_with_features = feature_engine.create_all_features(
-        analyzer.transactions_df,
-        cards_df=analyzer.cards_df,
-        users_df=analyzer.users_df,
-        include_risk_scores=True
+def build_risk_tables(data_dir='detection_data', path=RISK_TABLES_PATH, chunksize=500000,
+                      smoothing=RISK_SMOOTHING, force=False):
+    """
+    Build the smoothed fraud rate tables from the full transactions file,
+    reading it in chunks, and save them for FeatureService.
+
+    The tables are saved with a DatasetCache key of the raw transactions file
+    and the smoothing, so while neither changes they are kept as they are
+    and the file is not read again.
+
+    Args:
+        data_dir: Directory with the raw dataset files
+        path: Output .npz file
+        chunksize: Rows per chunk
+        smoothing: Pseudo-count toward the global fraud rate
+        force: Rebuild even if the saved tables are up to date
+
+    Returns:
+        RiskTableBuilder with the accumulated counts, or None if the saved
+        tables were up to date
+    """
+    analyzer = CreditCardDataAnalyzer(data_dir=data_dir, use_cache=False)
+    key = DatasetCache(f'{data_dir}/cache').make_key(
+        [analyzer.transactions_path], raw_version=RAW_DATA_VERSION, smoothing=smoothing
     )
+    if not force and risk_tables_key(path) == key:
+        print(f"Risk tables are up to date: {path}")
+        return None
+
+    builder = RiskTableBuilder(smoothing=smoothing)
+    print(f"Building risk tables from {analyzer.transactions_path}...")
+    for chunk in analyzer.iter_transaction_chunks(chunksize=chunksize):
+        builder.update(chunk)
+
+    builder.save(path, source_key=key)
+    print(f"Risk tables over {builder.total_count:,} transactions "
+          f"(global fraud rate {builder.global_rate:.4%}) saved to: {path}")
+    return builder
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Engineer fraud detection features')
+    parser.add_argument('--stream', action='store_true',
+                        help='Process the full dataset in chunks instead of a 100k-row sample')
+    parser.add_argument('--chunksize', type=int, default=500000,
+                        help='Rows per chunk in streaming mode')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Worker processes, partitioned by user (0 for all cores)')
+    parser.add_argument('--append', metavar='CSV',
+                        help='Engineer features only for new transactions in CSV, '
+                             'using the state saved by the last --stream or --append run')
+    parser.add_argument('--point-in-time', action='store_true',
+                        help='Compute aggregates from each transaction\'s past only, as FeatureService does online')
+    parser.add_argument('--risk-tables', action='store_true',
+                        help=f'Only build the fraud rate tables served by the API ({RISK_TABLES_PATH})')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Recompute everything and bypass the Parquet dataset cache')
+    args = parser.parse_args()
+
+    if args.point_in_time and (args.stream or args.append):
+        parser.error('--point-in-time is only supported for in-memory feature engineering')
+
+    if args.risk_tables:
+        build_risk_tables(chunksize=args.chunksize, force=args.no_cache)
+        exit(0)
+
+    if args.append:
+        analyzer = CreditCardDataAnalyzer(data_dir='detection_data', use_cache=False)
+        analyzer.load_supplementary_data()
+        new_transactions = analyzer.read_new_transactions(args.append)
+        print(f"Engineering features for {len(new_transactions):,} new transactions...")
+
+        new_features = FraudFeatureEngine().create_features_incremental(
+            new_transactions,
+            FEATURE_STATE_PATH,
+            cards_df=analyzer.cards_df,
+            users_df=analyzer.users_df,
+            include_risk_scores=True
+        )
+
+        output_path = f"{os.path.splitext(args.append)[0]}_features.parquet"
+        new_features.to_parquet(output_path, index=False)
+        print(f"Saved to: {output_path}")
+        exit(0)
+
+    if args.stream:
+        analyzer = CreditCardDataAnalyzer(data_dir='detection_data', use_cache=not args.no_cache)
+
+        if analyzer.cache is not None and analyzer.cache.enabled:
+            output_path = analyzer.cache.path('features', feature_cache_key(analyzer, sample_size=None))
+            if os.path.exists(output_path) and os.path.exists(FEATURE_STATE_PATH):
+                print(f"Engineered features are up to date: {output_path}")
+                exit(0)
+        else:
+            output_path = 'detection_data/transactions_with_features.csv'
+
+        print("Streaming full dataset for feature engineering...")
+        analyzer.load_supplementary_data()
+
+        FraudFeatureEngine().create_features_streaming(
+            lambda: analyzer.iter_transaction_chunks(chunksize=args.chunksize),
+            output_path,
+            cards_df=analyzer.cards_df,
+            users_df=analyzer.users_df,
+            include_risk_scores=True,
+            state_path=FEATURE_STATE_PATH
+        )
+        exit(0)
+
+    print("Loading dataset for feature engineering...")
+    df_with_features = load_feature_dataset(sample_size=DEFAULT_SAMPLE_SIZE, use_cache=not args.no_cache,
+                                            n_jobs=args.jobs or None, point_in_time=args.point_in_time)
 
     print("\nFeature engineering complete!")
     print(f"Sample of engineered features:")
-    print(df_with_features[feature_engine.get_feature_names()[:10]].head())
-
-    # Save engineered features
-    print("\nSaving engineered features...")
-    df_with_features.to_csv('detection_data/transactions_with_features.csv', index=False)
-    print("Saved to: detection_data/transactions_with_features.csv")
+    print(df_with_features[FraudFeatureEngine().get_feature_names()[:10]].head())
@@ -950,23 +950,41 @@ class AlertsPage:
         return pd.DataFrame(data)
         
     # Action methods
+    def update_alert_status(self, alert_id, status):
+        """Persist an alert status change through the API"""
+        try:
+            response = requests.put(
+                f"http://localhost:5000/api/dashboard/alerts/{alert_id}/status",
+                json={'status': status},
+                timeout=5
+            )
+            if response.status_code == 200:
+                return True
+            st.error(f"Could not update alert {alert_id}: {response.json().get('error', response.status_code)}")
+        except requests.RequestException as e:
+            st.error(f"Could not update alert {alert_id}: {e}")
+        return False
+
     def investigate_alert(self, alert_id):
         """Investigate an alert"""
-        st.success(f"Investigation started for alert {alert_id}")
-        time.sleep(1)
-        st.rerun()
+        if self.update_alert_status(alert_id, 'investigating'):
+            st.success(f"Investigation started for alert {alert_id}")
+            time.sleep(1)
+            st.rerun()
         
     def resolve_alert(self, alert_id):
         """Resolve an alert"""
-        st.success(f"Alert {alert_id} has been resolved")
-        time.sleep(1)
-        st.rerun()
+        if self.update_alert_status(alert_id, 'resolved'):
+            st.success(f"Alert {alert_id} has been resolved")
+            time.sleep(1)
+            st.rerun()
         
     def mark_false_positive(self, alert_id):
         """Mark alert as false positive"""
-        st.warning(f"Alert {alert_id} marked as false positive")
-        time.sleep(1)
-        st.rerun()
+        if self.update_alert_status(alert_id, 'false_positive'):
+            st.warning(f"Alert {alert_id} marked as false positive")
+            time.sleep(1)
+            st.rerun()
         
     def add_alert_note(self, alert_id):
         """Add note to alert"""
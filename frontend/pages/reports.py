@@ -215,6 +215,24 @@ h1, h2, h3 {
 </style>
 """
 
+def threshold_confusion_counts(scores, labels, thresholds):
+    """
+    True positive, false positive, true negative and false negative counts at
+    each threshold (scores >= threshold are flagged). The scores are sorted
+    once and each threshold is a binary search over cumulative fraud counts.
+    """
+    scores = np.asarray(scores, dtype=float)
+    labels = np.asarray(labels).astype(bool)
+    order = np.argsort(-scores, kind='stable')
+    fraud_counts = np.concatenate([[0], np.cumsum(labels[order])])
+    
+    flagged = np.searchsorted(-scores[order], -np.asarray(thresholds, dtype=float), side='right')
+    tp = fraud_counts[flagged]
+    fp = flagged - tp
+    fn = fraud_counts[-1] - tp
+    tn = len(scores) - fraud_counts[-1] - fp
+    return tp, fp, tn, fn
+
 class ReportsPage:
     def __init__(self):
         self.setup_page()
@@ -1147,25 +1165,14 @@ class ReportsPage:
         """Calculate ROC curve data"""
         # Simplified ROC calculation
         thresholds = np.linspace(0, 1, 100)
-        tpr_values = []
-        fpr_values = []
+        tp, fp, tn, fn = threshold_confusion_counts(data['risk_score'], data['is_fraud'], thresholds)
         
-        for threshold in thresholds:
-            predictions = (data['risk_score'] >= threshold).astype(int)
-            
-            tp = ((predictions == 1) & (data['is_fraud'] == 1)).sum()
-            fp = ((predictions == 1) & (data['is_fraud'] == 0)).sum()
-            tn = ((predictions == 0) & (data['is_fraud'] == 0)).sum()
-            fn = ((predictions == 0) & (data['is_fraud'] == 1)).sum()
-            
-            tpr = tp / (tp + fn) if (tp + fn) > 0 else 0
-            fpr = fp / (fp + tn) if (fp + tn) > 0 else 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tpr_values = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+            fpr_values = np.where(fp + tn > 0, fp / (fp + tn), 0.0)
             
-            tpr_values.append(tpr)
-            fpr_values.append(fpr)
-            
-        # Calculate AUC using trapezoidal rule
-        auc = np.trapz(tpr_values, fpr_values)
+        # Calculate AUC using trapezoidal rule (FPR falls as the threshold rises)
+        auc = np.sum((fpr_values[:-1] - fpr_values[1:]) * (tpr_values[:-1] + tpr_values[1:]) / 2)
         
         return pd.DataFrame({
             'fpr': fpr_values,
@@ -1192,28 +1199,19 @@ class ReportsPage:
     def analyze_risk_thresholds(self, data):
         """Analyze performance at different risk thresholds"""
         thresholds = np.linspace(0.1, 0.9, 50)
-        results = []
+        tp, fp, tn, fn = threshold_confusion_counts(data['risk_score'], data['is_fraud'], thresholds)
         
-        for threshold in thresholds:
-            predictions = (data['risk_score'] >= threshold).astype(int)
-            
-            tp = ((predictions == 1) & (data['is_fraud'] == 1)).sum()
-            fp = ((predictions == 1) & (data['is_fraud'] == 0)).sum()
-            tn = ((predictions == 0) & (data['is_fraud'] == 0)).sum()
-            fn = ((predictions == 0) & (data['is_fraud'] == 1)).sum()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+            recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+            f1_score = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
             
-            precision = tp / (tp + fp) if (tp + fp) > 0 else 0
-            recall = tp / (tp + fn) if (tp + fn) > 0 else 0
-            f1_score = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-            
-            results.append({
-                'threshold': threshold,
-                'precision': precision,
-                'recall': recall,
-                'f1_score': f1_score
-            })
-            
-        return pd.DataFrame(results)
+        return pd.DataFrame({
+            'threshold': thresholds,
+            'precision': precision,
+            'recall': recall,
+            'f1_score': f1_score
+        })
         
     def fetch_model_performance_data(self):
         """Fetch model performance data over time"""
@@ -0,0 +1,367 @@
+"""
+Hyperparameter Search
+Successive halving search over the XGBoost and LightGBM hyperparameters of
+FraudModelTrainer. Many sampled configurations are trained on small stratified
+subsets of the training data with few boosting rounds; after each rung only the
+best 1/eta of them move on to eta times more rows and rounds. Trials run in
+parallel worker processes that memory-map the training data.
+
+Run with: python hyperparameter_search.py [--models xgboost lightgbm] [--configs 27] [--latency-penalty 0.01]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.metrics import average_precision_score, log_loss
+from sklearn.model_selection import train_test_split
+
+from model_training import (
+    FraudModelTrainer, boosting_rounds, memmap_path, BEST_PARAMS_PATH, MAX_BOOSTING_ROUNDS
+)
+
+# Values sampled for each hyperparameter
+SEARCH_SPACES = {
+    'xgboost': {
+        'max_depth': [3, 4, 6, 8, 10],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2, 0.3],
+        'subsample': [0.6, 0.8, 1.0],
+        'colsample_bytree': [0.5, 0.8, 1.0],
+        'min_child_weight': [1, 5, 20],
+        'reg_lambda': [0.1, 1.0, 10.0]
+    },
+    'lightgbm': {
+        'num_leaves': [15, 31, 63, 127],
+        'max_depth': [-1, 4, 6, 8],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2, 0.3],
+        'min_child_samples': [20, 100, 500],
+        'subsample': [0.6, 0.8, 1.0],
+        'subsample_freq': [1],
+        'colsample_bytree': [0.5, 0.8, 1.0],
+        'reg_lambda': [0.0, 1.0, 10.0]
+    }
+}
+
+
+def stratified_order(y, random_state=42):
+    """
+    Shuffled row order in which every prefix has close to the class ratio of
+    y, so the first n rows form a stratified subsample of n rows.
+    """
+    rng = np.random.default_rng(random_state)
+    y = np.asarray(y)
+    position = np.empty(len(y))
+    for label in np.unique(y):
+        rows = np.flatnonzero(y == label)
+        position[rng.permutation(rows)] = (np.arange(len(rows)) + 0.5) / len(rows)
+    return np.argsort(position, kind='stable')
+
+
+def tree_depth(model_name, params):
+    """Upper bound on the depth of the trees a configuration grows"""
+    if model_name == 'xgboost':
+        return params.get('max_depth', 6)
+    max_depth = params.get('max_depth', 6)
+    leaf_depth = params.get('num_leaves', 31) - 1
+    return leaf_depth if max_depth <= 0 else min(max_depth, leaf_depth)
+
+
+def score_predictions(y_true, y_prob, objective):
+    """
+    Validation score to maximize: PR-AUC, negative log loss, or a callable
+    objective(y_true, y_prob).
+    """
+    if callable(objective):
+        return objective(y_true, y_prob)
+    if objective == 'pr_auc':
+        return average_precision_score(y_true, y_prob)
+    if objective == 'logloss':
+        return -log_loss(y_true, y_prob, labels=[0, 1])
+    raise ValueError(f"Unknown objective: {objective}")
+
+
+def _run_trial(model_name, params, n_rows, max_rounds, paths, objective, latency_penalty):
+    """
+    Pool task: train one configuration on the first n_rows of the stratified
+    order with up to max_rounds boosting rounds, early stopping on the
+    validation rows. Only the rows a trial uses are read from the memory maps.
+
+    Returns:
+        Dictionary describing the trial
+    """
+    X_train, y_train, order, X_val, y_val, val_rows = [np.load(path, mmap_mode='r') for path in paths]
+    rows = np.sort(order[:n_rows])
+    X_val, y_val = X_val[val_rows], y_val[val_rows]
+    trial = {'params': params, 'rows': n_rows}
+
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = getattr(FraudModelTrainer(), f'train_{model_name}')(
+                X_train[rows], y_train[rows],
+                n_jobs=1,
+                eval_set=(X_val, y_val),
+                early_stopping_metric=objective if objective in ['pr_auc', 'logloss'] else 'pr_auc',
+                params={**params, 'n_estimators': max_rounds}
+            )
+    except Exception as e:
+        trial.update(error=str(e), objective=-np.inf)
+        return trial
+
+    rounds = boosting_rounds(model)
+    score = score_predictions(y_val, model.predict_proba(X_val)[:, 1], objective)
+    # Thousands of tree node visits per prediction
+    cost = rounds * tree_depth(model_name, params) / 1000
+    trial.update(
+        rounds=rounds,
+        score=score,
+        cost=cost,
+        objective=score - latency_penalty * cost,
+        seconds=time.perf_counter() - start
+    )
+    return trial
+
+
+class SuccessiveHalvingSearch:
+    """
+    Budget-aware hyperparameter search for the XGBoost or LightGBM model of
+    FraudModelTrainer.
+
+    Sampled configurations start on a small stratified subset of the training
+    rows with few boosting rounds. Each rung keeps the best 1/eta of the
+    configurations and gives them eta times more rows and rounds, until the
+    last rung trains on all rows with up to max_rounds rounds.
+    """
+
+    def __init__(self, model_name='xgboost', n_configs=27, eta=3, max_rounds=MAX_BOOSTING_ROUNDS,
+                 min_rows=5000, objective='pr_auc', latency_penalty=0.0, n_workers=None,
+                 random_state=42):
+        """
+        Args:
+            model_name: 'xgboost' or 'lightgbm'
+            n_configs: Number of configurations sampled for the first rung
+            eta: Fraction of configurations dropped at each rung is 1 - 1/eta
+            max_rounds: Boosting rounds allowed in the last rung
+            min_rows: Smallest training subset a trial uses
+            objective: 'pr_auc', 'logloss', or a picklable callable
+                       objective(y_true, y_prob) to maximize on the validation set
+            latency_penalty: Objective penalty per thousand tree node visits per
+                             prediction (boosting rounds x tree depth), favoring
+                             models with fewer or shallower trees
+            n_workers: Trial processes (default: all cores), each using one core
+            random_state: Seed for configuration sampling and row order
+        """
+        self.model_name = model_name
+        self.n_configs = n_configs
+        self.eta = eta
+        self.max_rounds = max_rounds
+        self.min_rows = min_rows
+        self.objective = objective
+        self.latency_penalty = latency_penalty
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.random_state = random_state
+        self.trials = []
+        self.best_trial = None
+
+    def sample_configurations(self):
+        """Draw n_configs random configurations from the search space"""
+        rng = np.random.default_rng(self.random_state)
+        space = SEARCH_SPACES[self.model_name]
+        return [
+            {name: values[rng.integers(len(values))] for name, values in space.items()}
+            for _ in range(self.n_configs)
+        ]
+
+    def rungs(self, n_rows):
+        """
+        Budgets of each rung for a training set of n_rows.
+
+        Returns:
+            List of (configurations, training rows, boosting rounds)
+        """
+        n_rungs = int(math.log(self.n_configs) / math.log(self.eta) + 1e-9) + 1
+        budgets = []
+        for rung in range(n_rungs):
+            scale = self.eta ** (rung - n_rungs + 1)
+            budgets.append((
+                max(1, self.n_configs // self.eta ** rung),
+                min(n_rows, max(self.min_rows, int(n_rows * scale))),
+                max(1, int(self.max_rounds * scale))
+            ))
+        return budgets
+
+    def fit(self, X_train, y_train, X_val=None, y_val=None, train_rows=None, val_rows=None):
+        """
+        Run the search.
+
+        The validation set is either X_val/y_val or, to validate on part of a
+        memory-mapped training matrix without copying it, the val_rows of
+        X_train. Trial processes index the memory maps with the row numbers.
+
+        Args:
+            X_train: Training features
+            y_train: Training labels
+            X_val: Validation features trials are scored and early-stopped on
+            y_val: Validation labels
+            train_rows: Rows of X_train to train on (default: all)
+            val_rows: Rows of X_train to validate on when X_val is None
+
+        Returns:
+            Best hyperparameters, with n_estimators set to the rounds it kept
+        """
+        print("\n" + "=" * 80)
+        print(f"SUCCESSIVE HALVING SEARCH: {self.model_name.upper()}")
+        print("=" * 80)
+
+        configs = self.sample_configurations()
+        self.trials = []
+
+        y_train = np.asarray(y_train)
+        train_rows = np.arange(len(y_train)) if train_rows is None else np.asarray(train_rows)
+        order = train_rows[stratified_order(y_train[train_rows], self.random_state)]
+        if X_val is not None:
+            val_rows = np.arange(len(y_val))
+        elif val_rows is None:
+            raise ValueError("Pass a validation set as X_val and y_val, or as val_rows of X_train")
+
+        temp_dir = tempfile.mkdtemp(prefix='fraud_search_')
+        try:
+            arrays = [('X', X_train), ('y', y_train), ('order', order),
+                      ('X_val', X_val), ('y_val', y_val), ('val_rows', val_rows)]
+            paths = {
+                name: memmap_path(array, os.path.join(temp_dir, f'{name}.npy'))
+                for name, array in arrays if array is not None
+            }
+            # Without a separate validation set, trials validate on rows of X_train
+            paths.setdefault('X_val', paths['X'])
+            paths.setdefault('y_val', paths['y'])
+            paths = [paths[name] for name, _ in arrays]
+
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                budgets = self.rungs(len(train_rows))
+                for rung, (n_configs, n_rows, max_rounds) in enumerate(budgets, 1):
+                    configs = configs[:n_configs]
+                    print(f"\nRung {rung}/{len(budgets)}: {len(configs)} configurations, "
+                          f"{n_rows:,} rows, up to {max_rounds} rounds")
+
+                    start = time.perf_counter()
+                    futures = [
+                        executor.submit(_run_trial, self.model_name, params, n_rows, max_rounds, paths,
+                                        self.objective, self.latency_penalty)
+                        for params in configs
+                    ]
+                    results = sorted((future.result() for future in futures),
+                                     key=lambda trial: trial['objective'], reverse=True)
+                    for trial in results:
+                        trial['rung'] = rung
+                        if 'error' in trial:
+                            print(f"  Trial failed: {trial['error']}")
+                    self.trials.extend(results)
+
+                    best = results[0]
+                    print(f"  Best objective {best['objective']:.4f} "
+                          f"(score {best.get('score', np.nan):.4f}, {best.get('rounds', 0)} rounds) "
+                          f"in {time.perf_counter() - start:.1f}s")
+                    configs = [trial['params'] for trial in results]
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        succeeded = [trial for trial in results if 'error' not in trial]
+        if not succeeded:
+            raise RuntimeError(f"Every {self.model_name} trial of the last rung failed: {results[0]['error']}")
+        self.best_trial = succeeded[0]
+        return self.best_params
+
+    @property
+    def best_params(self):
+        """Hyperparameters of the best successful final-rung trial, for FraudModelTrainer params"""
+        if self.best_trial is None:
+            return None
+        return {**self.best_trial['params'], 'n_estimators': self.best_trial['rounds']}
+
+    def print_summary(self, top=5):
+        """Print the best trials of the last rung"""
+        last_rung = max(trial['rung'] for trial in self.trials)
+        print(f"\n{'Objective':>10}{'Score':>9}{'Rounds':>8}{'Cost':>8}  Parameters")
+        for trial in [t for t in self.trials if t['rung'] == last_rung and 'error' not in t][:top]:
+            print(f"{trial['objective']:>10.4f}{trial['score']:>9.4f}{trial['rounds']:>8}"
+                  f"{trial['cost']:>8.2f}  {trial['params']}")
+
+    def save_best_params(self, filepath=BEST_PARAMS_PATH):
+        """Add the best hyperparameters to the JSON file model_training.py --tuned-params reads"""
+        best_params = {}
+        if os.path.exists(filepath):
+            with open(filepath) as f:
+                best_params = json.load(f)
+        best_params[self.model_name] = self.best_params
+
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'w') as f:
+            json.dump(best_params, f, indent=2)
+        print(f"\nBest {self.model_name} hyperparameters saved to: {filepath}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Successive halving hyperparameter search')
+    parser.add_argument('--models', nargs='+', default=['xgboost', 'lightgbm'], choices=list(SEARCH_SPACES),
+                        help='Models to tune')
+    parser.add_argument('--configs', type=int, default=27, help='Configurations sampled for the first rung')
+    parser.add_argument('--eta', type=int, default=3, help='Keep the best 1/eta configurations at each rung')
+    parser.add_argument('--max-rounds', type=int, default=MAX_BOOSTING_ROUNDS,
+                        help='Boosting rounds allowed in the last rung')
+    parser.add_argument('--min-rows', type=int, default=5000, help='Smallest training subset of a trial')
+    parser.add_argument('--objective', choices=['pr_auc', 'logloss'], default='pr_auc',
+                        help='Validation metric to maximize')
+    parser.add_argument('--latency-penalty', type=float, default=0.0,
+                        help='Objective penalty per thousand tree node visits per prediction')
+    parser.add_argument('--workers', type=int, help='Trial processes (default: all cores)')
+    parser.add_argument('--full', action='store_true',
+                        help='Search on the full dataset (as written by feature_engineering.py --stream)')
+    parser.add_argument('--out-of-core', action='store_true',
+                        help='Search on the memory-mapped matrices of model_training.py --out-of-core')
+    args = parser.parse_args()
+
+    from data_preprocessing import FraudDataPreprocessor, load_arrays, ARTIFACTS_DIR
+
+    print("Loading preprocessed data...")
+    if args.out_of_core:
+        X_train, _, y_train, _ = load_arrays()
+    else:
+        from feature_engineering import load_feature_dataset, DEFAULT_SAMPLE_SIZE
+
+        df = load_feature_dataset(sample_size=None if args.full else DEFAULT_SAMPLE_SIZE)
+        X_train, _, y_train, _ = FraudDataPreprocessor().prepare_data_for_training(
+            df, test_size=0.2, balance_method='none', inplace=True, artifact_dir=ARTIFACTS_DIR
+        )
+
+    # Validate on part of the training split, keeping the test split for final evaluation.
+    # Rows are passed as indices so a memory-mapped X_train is never copied into RAM
+    y_train = np.asarray(y_train)
+    train_rows, val_rows = train_test_split(np.arange(len(y_train)), test_size=0.2,
+                                            stratify=y_train, random_state=42)
+    train_rows.sort()
+    val_rows.sort()
+    print(f"Searching on {len(train_rows):,} training and {len(val_rows):,} validation rows")
+
+    for model_name in args.models:
+        search = SuccessiveHalvingSearch(
+            model_name,
+            n_configs=args.configs,
+            eta=args.eta,
+            max_rounds=args.max_rounds,
+            min_rows=args.min_rows,
+            objective=args.objective,
+            latency_penalty=args.latency_penalty,
+            n_workers=args.workers
+        )
+        search.fit(X_train, y_train, train_rows=train_rows, val_rows=val_rows)
+        search.print_summary()
+        search.save_best_params()
@@ -11,54 +11,245 @@ from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import (
     classification_report, confusion_matrix, roc_auc_score,
-    roc_curve, precision_recall_curve, f1_score,
-    precision_score, recall_score, accuracy_score
+    roc_curve, precision_recall_curve, average_precision_score
 )
 from xgboost import XGBClassifier
 from lightgbm import LGBMClassifier
+import lightgbm
 import joblib
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from threadpoolctl import threadpool_limits
 import warnings
 warnings.filterwarnings('ignore')
 
+# Early stopping: boosting round cap, patience, and metric names per library
+MAX_BOOSTING_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 50
+EARLY_STOPPING_METRICS = {
+    'pr_auc': {'xgboost': 'aucpr', 'lightgbm': 'average_precision'},
+    'logloss': {'xgboost': 'logloss', 'lightgbm': 'binary_logloss'}
+}
+
+# Tuned hyperparameters written by hyperparameter_search.py
+BEST_PARAMS_PATH = 'models/best_params.json'
+
+# Decision thresholds saved with a model when none were optimized (same as
+# app/model_loader.py): medium risk is flagged as fraud, high risk is blocked
+DEFAULT_THRESHOLDS = {'medium': 0.5, 'high': 0.8}
+
+def balanced_class_weight(y, sample_weight=None):
+    """
+    class_weight='balanced' computed from weighted class totals, so rows
+    downsampled with inverse-fraction weights are balanced like the full data.
+
+    Returns:
+        Dictionary of class -> weight
+    """
+    y = np.asarray(y)
+    weights = np.ones(len(y)) if sample_weight is None else np.asarray(sample_weight)
+    total = weights.sum()
+    return {label: total / (2 * weights[y == label].sum()) for label in [0, 1]}
+
+def threshold_sweep(y_true, y_prob, thresholds=None, amounts=None):
+    """
+    Classification metrics at many decision thresholds in one pass: the
+    scores are sorted once and the rows flagged at each threshold are
+    counted with a binary search over cumulative fraud counts.
+
+    Args:
+        y_true: True labels
+        y_prob: Predicted fraud probabilities
+        thresholds: Thresholds to evaluate (default: every distinct probability)
+        amounts: Optional transaction amounts, to add the fraud amount missed
+                 at each threshold
+
+    Returns:
+        DataFrame of threshold, flagged, precision, recall, f1_score and
+        false_positive_rate (and missed_fraud_amount), with rows flagged
+        when y_prob >= threshold
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    y_prob = np.asarray(y_prob)
+
+    order = np.argsort(-y_prob, kind='stable')
+    descending = -y_prob[order]
+    fraud_counts = np.concatenate([[0], np.cumsum(y_true[order])])
+    if thresholds is None:
+        # Distinct probabilities in ascending order, read off the sorted scores
+        distinct = np.concatenate([[True], descending[1:] != descending[:-1]])
+        thresholds = -descending[distinct][::-1]
+    thresholds = np.asarray(thresholds, dtype=float)
+
+    flagged = np.searchsorted(descending, -thresholds, side='right')
+    tp = fraud_counts[flagged]
+    fp = flagged - tp
+    n_fraud = fraud_counts[-1]
+    n_legit = len(y_true) - n_fraud
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sweep = pd.DataFrame({
+            'threshold': thresholds,
+            'flagged': flagged,
+            'precision': np.where(flagged > 0, tp / flagged, 0.0),
+            'recall': tp / n_fraud if n_fraud else np.zeros(len(thresholds)),
+            'f1_score': np.where(flagged + n_fraud > 0, 2 * tp / (flagged + n_fraud), 0.0),
+            'false_positive_rate': fp / n_legit if n_legit else np.zeros(len(thresholds))
+        })
+
+    if amounts is not None:
+        fraud_amounts = np.concatenate([[0], np.cumsum(np.where(y_true, amounts, 0)[order])])
+        sweep['missed_fraud_amount'] = fraud_amounts[-1] - fraud_amounts[flagged]
+    return sweep
+
+class ThresholdOptimizer:
+    """
+    Chooses the API decision thresholds of a model by expected cost on
+    labelled data. Every flagged transaction costs review_cost to review and
+    every missed fraud costs its absolute amount, refunds included
+    (default_fraud_loss when amounts are unknown). The medium threshold, at which transactions are flagged as
+    fraud and challenged, minimizes the total cost. The high threshold, at
+    which they are blocked, is the lowest one above it whose precision
+    reaches block_precision. If flagging nothing is cheapest, the default
+    thresholds are kept instead, so the API still flags transactions.
+    """
+
+    def __init__(self, review_cost=5.0, default_fraud_loss=100.0, block_precision=0.9):
+        self.review_cost = review_cost
+        self.default_fraud_loss = default_fraud_loss
+        self.block_precision = block_precision
+        self.cost_curve_ = None
+
+    def cost_curve(self, y_true, y_prob, amounts=None):
+        """
+        Precision, recall and expected cost at every distinct threshold, and
+        at an infinite threshold that flags nothing.
+
+        Returns:
+            threshold_sweep DataFrame with an expected_cost column
+        """
+        amounts = np.full(len(y_prob), self.default_fraud_loss) if amounts is None else np.abs(amounts)
+        curve = threshold_sweep(y_true, y_prob, amounts=amounts)
+        curve = pd.concat([curve, threshold_sweep(y_true, y_prob, [np.inf], amounts)], ignore_index=True)
+        curve['expected_cost'] = self.review_cost * curve['flagged'] + curve['missed_fraud_amount']
+        return curve
+
+    def optimize(self, y_true, y_prob, amounts=None):
+        """
+        Choose the medium and high risk thresholds.
+
+        Args:
+            y_true: True labels
+            y_prob: Predicted fraud probabilities
+            amounts: Optional transaction amounts (the loss of a missed fraud)
+
+        Returns:
+            Dictionary with 'medium' and 'high' thresholds
+        """
+        amounts = np.full(len(y_prob), self.default_fraud_loss) if amounts is None else np.abs(amounts)
+        curve = self.cost_curve_ = self.cost_curve(y_true, y_prob, amounts)
+        best = curve.loc[curve['expected_cost'].idxmin()]
+        medium = float(best['threshold'])
+        if not np.isfinite(medium):
+            print(f"\nWarning: flagging nothing is cheapest at review cost {self.review_cost}; "
+                  f"keeping the default thresholds {DEFAULT_THRESHOLDS}")
+            return dict(DEFAULT_THRESHOLDS)
+
+        confident = curve[(curve['threshold'] >= medium) & (curve['precision'] >= self.block_precision)]
+        high = float(confident['threshold'].min()) if len(confident) else max(medium, DEFAULT_THRESHOLDS['high'])
+
+        print(f"\nDecision thresholds: medium {medium:.4f}, high {high:.4f}")
+        return {'medium': medium, 'high': high}
+
+    def expected_cost(self, y_true, y_prob, threshold, amounts=None):
+        """
+        Expected cost of flagging the rows with y_prob >= threshold.
+
+        Returns:
+            threshold_sweep row (a Series) with an expected_cost entry
+        """
+        amounts = np.full(len(y_prob), self.default_fraud_loss) if amounts is None else np.abs(amounts)
+        row = threshold_sweep(y_true, y_prob, [threshold], amounts).iloc[0]
+        row['expected_cost'] = self.review_cost * row['flagged'] + row['missed_fraud_amount']
+        return row
+
+    def report(self, y_true, y_prob, thresholds, amounts=None, label='Test'):
+        """Print the expected cost of thresholds on labelled data, against the default threshold"""
+        chosen = self.expected_cost(y_true, y_prob, thresholds['medium'], amounts)
+        default = self.expected_cost(y_true, y_prob, DEFAULT_THRESHOLDS['medium'], amounts)
+        print(f"  {label} expected cost {chosen['expected_cost']:,.2f} "
+              f"(vs {default['expected_cost']:,.2f} at threshold {DEFAULT_THRESHOLDS['medium']})")
+        print(f"  {label} precision {chosen['precision']:.4f}, recall {chosen['recall']:.4f}, "
+              f"{int(chosen['flagged'])} of {len(y_prob)} flagged")
+
+def boosting_rounds(model):
+    """Number of boosting rounds in a fitted XGBoost or LightGBM model, else None"""
+    if isinstance(model, XGBClassifier):
+        return model.get_booster().num_boosted_rounds()
+    if isinstance(model, LGBMClassifier):
+        return model.booster_.current_iteration()
+    return None
+
 class FraudModelTrainer:
     """
     Trains various machine learning models for fraud detection.
     Evaluates performance using appropriate metrics for imbalanced data.
     """
 
+    # Model name -> display name, in training order
+    MODEL_NAMES = {
+        'logistic_regression': 'Logistic Regression',
+        'random_forest': 'Random Forest',
+        'xgboost': 'XGBoost',
+        'lightgbm': 'LightGBM'
+    }
+
     def __init__(self):
         self.models = {}
         self.model_results = {}
+        self.training_times = {}
         self.best_model = None
         self.best_model_name = None
+        self.y_test = None
+        self.thresholds = None
 
-    def train_logistic_regression(self, X_train, y_train, class_weight='balanced'):
+    def train_logistic_regression(self, X_train, y_train, class_weight='balanced', sample_weight=None,
+                                  n_jobs=-1):
         """
         Train logistic regression baseline model.
         Simple but effective starting point.
         """
         print("\nTraining Logistic Regression...")
 
+        if class_weight == 'balanced' and sample_weight is not None:
+            class_weight = balanced_class_weight(y_train, sample_weight)
+
         model = LogisticRegression(
             class_weight=class_weight,
             max_iter=1000,
             random_state=42,
-            n_jobs=-1
+            n_jobs=n_jobs
         )
 
-        model.fit(X_train, y_train)
+        model.fit(X_train, y_train, sample_weight=sample_weight)
         self.models['logistic_regression'] = model
 
         print("Logistic Regression training complete")
         return model
 
-    def train_random_forest(self, X_train, y_train, class_weight='balanced'):
+    def train_random_forest(self, X_train, y_train, class_weight='balanced', sample_weight=None, n_jobs=-1):
         """
         Train Random Forest classifier.
         Good for capturing non-linear patterns and feature importance.
         """
         print("\nTraining Random Forest...")
 
+        if class_weight == 'balanced' and sample_weight is not None:
+            class_weight = balanced_class_weight(y_train, sample_weight)
+
         model = RandomForestClassifier(
             n_estimators=100,
             max_depth=10,
@@ -66,67 +257,106 @@ class FraudModelTrainer:
             min_samples_leaf=5,
             class_weight=class_weight,
             random_state=42,
-            n_jobs=-1,
+            n_jobs=n_jobs,
             verbose=0
         )
 
-        model.fit(X_train, y_train)
+        model.fit(X_train, y_train, sample_weight=sample_weight)
         self.models['random_forest'] = model
 
         print("Random Forest training complete")
         return model
 
-    def train_xgboost(self, X_train, y_train):
+    def train_xgboost(self, X_train, y_train, sample_weight=None, n_jobs=-1, eval_set=None,
+                      early_stopping_metric='pr_auc', params=None):
         """
         Train XGBoost classifier.
         State-of-the-art gradient boosting for fraud detection.
+
+        Given an eval_set (X_val, y_val), boosting runs for up to MAX_BOOSTING_ROUNDS
+        and stops once early_stopping_metric ('pr_auc' or 'logloss') has not improved
+        on the validation set for EARLY_STOPPING_ROUNDS. The model is then truncated
+        to its best round. params overrides the default hyperparameters, e.g. with
+        those found by hyperparameter_search.py.
         """
         print("\nTraining XGBoost...")
 
         # Calculate scale_pos_weight for imbalanced data
-        scale_pos_weight = (y_train == 0).sum() / (y_train == 1).sum()
+        class_weight = balanced_class_weight(y_train, sample_weight)
+        scale_pos_weight = class_weight[1] / class_weight[0]
 
         model = XGBClassifier(
-            n_estimators=100,
+            n_estimators=100 if eval_set is None else MAX_BOOSTING_ROUNDS,
             max_depth=6,
             learning_rate=0.1,
             subsample=0.8,
             colsample_bytree=0.8,
             scale_pos_weight=scale_pos_weight,
             random_state=42,
-            n_jobs=-1,
-            eval_metric='logloss'
+            n_jobs=n_jobs,
+            eval_metric='logloss' if eval_set is None else EARLY_STOPPING_METRICS[early_stopping_metric]['xgboost'],
+            early_stopping_rounds=None if eval_set is None else EARLY_STOPPING_ROUNDS
         )
+        model.set_params(**(params or {}))
+        max_rounds = model.n_estimators
+
+        if eval_set is None:
+            model.fit(X_train, y_train, sample_weight=sample_weight)
+        else:
+            model.fit(X_train, y_train, sample_weight=sample_weight, eval_set=[eval_set], verbose=False)
+            rounds, best_score = model.best_iteration + 1, model.best_score
+
+            # Drop the rounds boosted after the best one, so the saved model is smaller
+            model._Booster = model.get_booster()[:rounds]
+            model.set_params(n_estimators=rounds, early_stopping_rounds=None)
+            print(f"Early stopping: best validation {early_stopping_metric} {best_score:.4f} "
+                  f"at round {rounds} of {max_rounds}")
 
-        model.fit(X_train, y_train)
         self.models['xgboost'] = model
 
         print("XGBoost training complete")
         return model
 
-    def train_lightgbm(self, X_train, y_train):
+    def train_lightgbm(self, X_train, y_train, sample_weight=None, n_jobs=-1, eval_set=None,
+                       early_stopping_metric='pr_auc', params=None):
         """
         Train LightGBM classifier.
         Fast and efficient gradient boosting.
+
+        Early stopping on an eval_set and params work as in train_xgboost.
+        LightGBM keeps only the trees up to the best round when fitting ends.
         """
         print("\nTraining LightGBM...")
 
         # Calculate scale_pos_weight
-        scale_pos_weight = (y_train == 0).sum() / (y_train == 1).sum()
+        class_weight = balanced_class_weight(y_train, sample_weight)
+        scale_pos_weight = class_weight[1] / class_weight[0]
 
         model = LGBMClassifier(
-            n_estimators=100,
+            n_estimators=100 if eval_set is None else MAX_BOOSTING_ROUNDS,
             max_depth=6,
             learning_rate=0.1,
             subsample=0.8,
             colsample_bytree=0.8,
             scale_pos_weight=scale_pos_weight,
             random_state=42,
-            n_jobs=-1,
+            n_jobs=n_jobs,
             verbose=-1
         )
+        model.set_params(**(params or {}))
+        max_rounds = model.n_estimators
+
+        if eval_set is None:
+            model.fit(X_train, y_train, sample_weight=sample_weight)
+        else:
+            metric = EARLY_STOPPING_METRICS[early_stopping_metric]['lightgbm']
+            model.set_params(metric=metric)
+            model.fit(X_train, y_train, sample_weight=sample_weight, eval_set=[eval_set],
+                      callbacks=[lightgbm.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)])
+            print(f"Early stopping: best validation {early_stopping_metric} "
+                  f"{model.best_score_['valid_0'][metric]:.4f} "
+                  f"at round {model.best_iteration_} of {max_rounds}")
 
-        model.fit(X_train, y_train)
         self.models['lightgbm'] = model
 
         print("LightGBM training complete")
@@ -135,21 +365,29 @@ class FraudModelTrainer:
     def evaluate_model(self, model, model_name, X_test, y_test):
         """
         Comprehensive model evaluation with fraud-specific metrics.
+        The test set is scored once; predictions, probabilities and the
+        confusion matrix are kept in model_results for the plots.
         """
         print(f"\n{'=' * 80}")
         print(f"EVALUATING {model_name.upper()}")
         print(f"{'=' * 80}")
 
-        # Make predictions
-        y_pred = model.predict(X_test)
+        # Flag at the default medium threshold, with probability >= threshold
+        # like threshold_sweep and the API
+        y_test = np.asarray(y_test)
         y_pred_proba = model.predict_proba(X_test)[:, 1]
+        y_pred = (y_pred_proba >= DEFAULT_THRESHOLDS['medium']).astype(int)
+        self.y_test = y_test
 
         # Calculate metrics
-        accuracy = accuracy_score(y_test, y_pred)
-        precision = precision_score(y_test, y_pred)
-        recall = recall_score(y_test, y_pred)
-        f1 = f1_score(y_test, y_pred)
+        cm = confusion_matrix(y_test, y_pred, labels=[0, 1])
+        (tn, fp), (fn, tp) = cm
+        accuracy = (tp + tn) / cm.sum()
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * tp / (2 * tp + fp + fn) if tp else 0.0
         auc_roc = roc_auc_score(y_test, y_pred_proba)
+        pr_auc = average_precision_score(y_test, y_pred_proba)
 
         # Store results
         self.model_results[model_name] = {
@@ -158,6 +396,8 @@ class FraudModelTrainer:
             'recall': recall,
             'f1_score': f1,
             'auc_roc': auc_roc,
+            'pr_auc': pr_auc,
+            'confusion_matrix': cm,
             'predictions': y_pred,
             'probabilities': y_pred_proba
         }
@@ -169,15 +409,20 @@ class FraudModelTrainer:
         print(f"  Recall:    {recall:.4f}")
         print(f"  F1-Score:  {f1:.4f}")
         print(f"  AUC-ROC:   {auc_roc:.4f}")
+        print(f"  PR-AUC:    {pr_auc:.4f}")
+
+        sweep = threshold_sweep(y_test, y_pred_proba)
+        best = sweep.loc[sweep['f1_score'].idxmax()]
+        print(f"  Best F1 {best['f1_score']:.4f} at threshold {best['threshold']:.4f} "
+              f"(precision {best['precision']:.4f}, recall {best['recall']:.4f})")
 
         # Confusion Matrix
         print(f"\nConfusion Matrix:")
-        cm = confusion_matrix(y_test, y_pred)
         print(cm)
-        print(f"\n  True Negatives:  {cm[0, 0]}")
-        print(f"  False Positives: {cm[0, 1]}")
-        print(f"  False Negatives: {cm[1, 0]}")
-        print(f"  True Positives:  {cm[1, 1]}")
+        print(f"\n  True Negatives:  {tn}")
+        print(f"  False Positives: {fp}")
+        print(f"  False Negatives: {fn}")
+        print(f"  True Positives:  {tp}")
 
         # Classification Report
         print(f"\nClassification Report:")
@@ -185,46 +430,182 @@ class FraudModelTrainer:
 
         return self.model_results[model_name]
 
-    def train_all_models(self, X_train, y_train):
+    def threshold_sweep(self, model_name, thresholds=None):
+        """
+        Precision, recall, F1 and false positive rate of an evaluated model
+        across decision thresholds, from its cached test probabilities.
+
+        Args:
+            model_name: Name of a model scored by evaluate_model
+            thresholds: Thresholds to evaluate (default: every distinct probability)
+
+        Returns:
+            DataFrame with one row per threshold
+        """
+        return threshold_sweep(self.y_test, self.model_results[model_name]['probabilities'], thresholds)
+
+    def optimize_thresholds(self, X_val, y_val, amounts=None, test_amounts=None, optimizer=None):
+        """
+        Choose the API decision thresholds of the best model on a validation
+        split, then report their expected cost on the test set from the cached
+        test probabilities, which played no part in choosing them. They are
+        saved with the model by save_best_model.
+
+        Args:
+            X_val: Validation features, disjoint from the training and test rows
+            y_val: Validation labels
+            amounts: Transaction amounts of the validation rows (the loss of a missed fraud)
+            test_amounts: Transaction amounts of the test rows
+            optimizer: ThresholdOptimizer with the cost settings (default costs if None)
+
+        Returns:
+            Dictionary with 'medium' and 'high' thresholds
+        """
+        if self.best_model_name is None:
+            print("No best model identified yet. Run evaluate_all_models first.")
+            return None
+
+        optimizer = optimizer or ThresholdOptimizer()
+        y_val_proba = self.best_model.predict_proba(X_val)[:, 1]
+        self.thresholds = optimizer.optimize(y_val, y_val_proba, amounts)
+        optimizer.report(y_val, y_val_proba, self.thresholds, amounts, label='Validation')
+        optimizer.report(self.y_test, self.model_results[self.best_model_name]['probabilities'],
+                         self.thresholds, test_amounts)
+        return self.thresholds
+
+    def _ensure_evaluated(self, X_test, y_test):
+        """Score any trained model that has no cached test results yet"""
+        for model_name, model in self.models.items():
+            if model_name not in self.model_results:
+                self.evaluate_model(model, model_name, X_test, y_test)
+
+    def train_all_models(self, X_train, y_train, sample_weight=None, parallel=False, cpu_budget=None,
+                         eval_set=None, early_stopping_metric='pr_auc', model_params=None):
         """
         Train all baseline models.
+        sample_weight carries the weights of downsampled training rows
+        (FraudDataPreprocessor.sample_weight), or None for unweighted rows.
+
+        Args:
+            X_train: Training features
+            y_train: Training labels
+            sample_weight: Optional training sample weights
+            parallel: Fit each model in its own process. The training data is
+                      shared through memory-mapped .npy files instead of being
+                      pickled to every process.
+            cpu_budget: Cores per model, as an int split evenly between the models
+                        or a dictionary of model name -> cores. By default models
+                        run one at a time on all cores, or in parallel on an even
+                        share of them.
+            eval_set: Optional validation (X_val, y_val) for early stopping of
+                      XGBoost and LightGBM
+            early_stopping_metric: 'pr_auc' or 'logloss'
+            model_params: Optional dictionary of model name -> hyperparameter
+                          overrides for XGBoost and LightGBM
+
+        Returns:
+            Names of the models trained successfully
         """
         print("\n" + "=" * 80)
         print("TRAINING ALL BASELINE MODELS")
         print("=" * 80)
 
+        model_jobs = self._model_jobs(cpu_budget, parallel)
+        if parallel:
+            results = self._train_in_processes(X_train, y_train, sample_weight, model_jobs,
+                                               eval_set, early_stopping_metric, model_params)
+        else:
+            results = []
+            for name, n_jobs in model_jobs.items():
+                try:
+                    model, timing = self._fit_timed(name, X_train, y_train, sample_weight, n_jobs,
+                                                    eval_set, early_stopping_metric,
+                                                    (model_params or {}).get(name))
+                    results.append((name, model, timing, None))
+                except Exception as e:
+                    results.append((name, None, None, str(e)))
+
         models_trained = []
+        for name, model, timing, error in results:
+            if error is not None:
+                print(f"Error training {self.MODEL_NAMES[name]}: {error}")
+                continue
+            self.models[name] = model
+            self.training_times[name] = timing
+            models_trained.append(name)
 
-        # Train Logistic Regression
-        try:
-            self.train_logistic_regression(X_train, y_train)
-            models_trained.append('logistic_regression')
-        except Exception as e:
-            print(f"Error training Logistic Regression: {e}")
+        print(f"\n{len(models_trained)} models trained successfully")
+        self._print_training_times()
+        return models_trained
 
-        # Train Random Forest
-        try:
-            self.train_random_forest(X_train, y_train)
-            models_trained.append('random_forest')
-        except Exception as e:
-            print(f"Error training Random Forest: {e}")
+    def _model_jobs(self, cpu_budget, parallel):
+        """Cores for each model (-1 for all) from a cpu_budget argument"""
+        if isinstance(cpu_budget, dict):
+            return {name: cpu_budget.get(name, 1) for name in self.MODEL_NAMES}
+        if cpu_budget is None:
+            if not parallel:
+                return {name: -1 for name in self.MODEL_NAMES}
+            cpu_budget = os.cpu_count() or 1
+        per_model = max(1, cpu_budget // len(self.MODEL_NAMES)) if parallel else cpu_budget
+        return {name: per_model for name in self.MODEL_NAMES}
+
+    def _fit_timed(self, name, X_train, y_train, sample_weight, n_jobs, eval_set=None,
+                   early_stopping_metric='pr_auc', params=None):
+        """
+        Train one model with its native and BLAS threads limited to n_jobs.
+        eval_set and params only apply to the boosting models.
 
-        # Train XGBoost
-        try:
-            self.train_xgboost(X_train, y_train)
-            models_trained.append('xgboost')
-        except Exception as e:
-            print(f"Error training XGBoost: {e}")
+        Returns:
+            (model, dictionary of cores, wall-clock and CPU seconds)
+        """
+        fit_params = {'sample_weight': sample_weight, 'n_jobs': n_jobs}
+        if eval_set is not None and name in ['xgboost', 'lightgbm']:
+            fit_params.update(eval_set=eval_set, early_stopping_metric=early_stopping_metric)
+        if params and name in ['xgboost', 'lightgbm']:
+            fit_params['params'] = params
+
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        with threadpool_limits(limits=None if n_jobs == -1 else n_jobs):
+            model = getattr(self, f'train_{name}')(X_train, y_train, **fit_params)
+        timing = {
+            'n_jobs': n_jobs,
+            'wall_seconds': time.perf_counter() - start_wall,
+            'cpu_seconds': time.process_time() - start_cpu
+        }
+        return model, timing
 
-        # Train LightGBM
+    def _train_in_processes(self, X_train, y_train, sample_weight, model_jobs, eval_set=None,
+                            early_stopping_metric='pr_auc', model_params=None):
+        """Fit each model in a separate process on memory-mapped training data"""
+        X_val, y_val = eval_set if eval_set is not None else (None, None)
+        temp_dir = tempfile.mkdtemp(prefix='fraud_training_')
         try:
-            self.train_lightgbm(X_train, y_train)
-            models_trained.append('lightgbm')
-        except Exception as e:
-            print(f"Error training LightGBM: {e}")
-
-        print(f"\n{len(models_trained)} models trained successfully")
-        return models_trained
+            paths = [
+                memmap_path(array, os.path.join(temp_dir, f'{name}.npy'))
+                for name, array in [('X', X_train), ('y', y_train), ('w', sample_weight),
+                                    ('X_val', X_val), ('y_val', y_val)]
+            ]
+            print(f"Training {len(model_jobs)} models in parallel "
+                  f"({', '.join(f'{name}: {jobs} cores' for name, jobs in model_jobs.items())})")
+
+            with ProcessPoolExecutor(max_workers=len(model_jobs)) as executor:
+                futures = [executor.submit(_train_model_task, name, paths, n_jobs, early_stopping_metric,
+                                           (model_params or {}).get(name))
+                           for name, n_jobs in model_jobs.items()]
+                return [future.result() for future in futures]
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _print_training_times(self):
+        """Print cores, wall-clock and CPU time and boosting rounds of each trained model"""
+        if not self.training_times:
+            return
+        print(f"\n{'Model':<22}{'Cores':>7}{'Wall':>10}{'CPU':>10}{'Rounds':>8}")
+        for name, timing in self.training_times.items():
+            cores = 'all' if timing['n_jobs'] == -1 else timing['n_jobs']
+            rounds = boosting_rounds(self.models[name]) or '-'
+            print(f"{self.MODEL_NAMES[name]:<22}{cores:>7}"
+                  f"{timing['wall_seconds']:>9.1f}s{timing['cpu_seconds']:>9.1f}s{rounds:>8}")
 
     def evaluate_all_models(self, X_test, y_test):
         """
@@ -311,18 +692,19 @@ class FraudModelTrainer:
 
     def plot_roc_curves(self, X_test, y_test, save_path='plots/roc_curves.png'):
         """
-        Plot ROC curves for all models.
+        Plot ROC curves for all models from their cached test probabilities.
         """
         print("\nCreating ROC curves...")
+        self._ensure_evaluated(X_test, y_test)
 
         plt.figure(figsize=(10, 8))
 
         colors = ['#3498db', '#2ecc71', '#e74c3c', '#f39c12']
 
-        for idx, (model_name, model) in enumerate(self.models.items()):
-            y_pred_proba = model.predict_proba(X_test)[:, 1]
-            fpr, tpr, _ = roc_curve(y_test, y_pred_proba)
-            auc = roc_auc_score(y_test, y_pred_proba)
+        for idx, model_name in enumerate(self.models):
+            results = self.model_results[model_name]
+            fpr, tpr, _ = roc_curve(y_test, results['probabilities'])
+            auc = results['auc_roc']
 
             plt.plot(fpr, tpr, label=f'{model_name.replace("_", " ").title()} (AUC = {auc:.3f})',
                     linewidth=2, color=colors[idx % len(colors)])
@@ -342,19 +724,53 @@ class FraudModelTrainer:
 
         print(f"ROC curves saved to: {save_path}")
 
+    def plot_precision_recall_curves(self, X_test, y_test, save_path='plots/precision_recall_curves.png'):
+        """
+        Plot precision-recall curves for all models from their cached test probabilities.
+        """
+        print("\nCreating precision-recall curves...")
+        self._ensure_evaluated(X_test, y_test)
+
+        plt.figure(figsize=(10, 8))
+
+        colors = ['#3498db', '#2ecc71', '#e74c3c', '#f39c12']
+
+        for idx, model_name in enumerate(self.models):
+            results = self.model_results[model_name]
+            precision, recall, _ = precision_recall_curve(y_test, results['probabilities'])
+
+            plt.plot(recall, precision,
+                    label=f'{model_name.replace("_", " ").title()} (PR-AUC = {results["pr_auc"]:.3f})',
+                    linewidth=2, color=colors[idx % len(colors)])
+
+        plt.axhline(np.mean(y_test), color='k', linestyle='--', label='Random Classifier', linewidth=1)
+        plt.xlim([0.0, 1.0])
+        plt.ylim([0.0, 1.05])
+        plt.xlabel('Recall', fontsize=12)
+        plt.ylabel('Precision', fontsize=12)
+        plt.title('Precision-Recall Curves - Model Comparison', fontsize=14, fontweight='bold')
+        plt.legend(loc='upper right', fontsize=10)
+        plt.grid(alpha=0.3)
+
+        plt.tight_layout()
+        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        plt.close()
+
+        print(f"Precision-recall curves saved to: {save_path}")
+
     def plot_confusion_matrices(self, X_test, y_test, save_path='plots/confusion_matrices.png'):
         """
-        Plot confusion matrices for all models.
+        Plot confusion matrices for all models from their cached test predictions.
         """
         print("\nCreating confusion matrices...")
+        self._ensure_evaluated(X_test, y_test)
 
         n_models = len(self.models)
         fig, axes = plt.subplots(2, 2, figsize=(15, 12))
         axes = axes.ravel()
 
-        for idx, (model_name, model) in enumerate(self.models.items()):
-            y_pred = model.predict(X_test)
-            cm = confusion_matrix(y_test, y_pred)
+        for idx, model_name in enumerate(self.models):
+            cm = self.model_results[model_name]['confusion_matrix']
 
             sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=axes[idx],
                        cbar=True, square=True)
@@ -378,13 +794,13 @@ class FraudModelTrainer:
             print("No best model identified yet. Run evaluate_all_models first.")
             return
 
-        import os
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
 
         model_data = {
             'model': self.best_model,
             'model_name': self.best_model_name,
-            'metrics': self.model_results[self.best_model_name]
+            'metrics': self.model_results[self.best_model_name],
+            'thresholds': self.thresholds or DEFAULT_THRESHOLDS
         }
 
         joblib.dump(model_data, filepath)
@@ -394,7 +810,6 @@ class FraudModelTrainer:
         """
         Save all trained models.
         """
-        import os
         os.makedirs(directory, exist_ok=True)
 
         for model_name, model in self.models.items():
@@ -403,39 +818,145 @@ class FraudModelTrainer:
             print(f"Saved {model_name} to: {filepath}")
 
 
+def memmap_path(array, path):
+    """
+    .npy file another process can memory-map array from: the file behind
+    array when it is a whole memory-mapped .npy file, otherwise a copy saved
+    to path. None stays None.
+    """
+    if array is None:
+        return None
+    if isinstance(array, np.memmap) and str(array.filename or '').endswith('.npy'):
+        if np.load(array.filename, mmap_mode='r').shape == array.shape:
+            return str(array.filename)
+    np.save(path, np.asarray(array))
+    return path
+
+
+def _train_model_task(name, paths, n_jobs, early_stopping_metric='pr_auc', params=None):
+    """Pool task: train one model on memory-mapped data, returning (name, model, timing, error)"""
+    X_train, y_train, sample_weight, X_val, y_val = [
+        np.load(path, mmap_mode='r') if path is not None else None for path in paths
+    ]
+    eval_set = (X_val, y_val) if X_val is not None else None
+    try:
+        model, timing = FraudModelTrainer()._fit_timed(name, X_train, y_train, sample_weight, n_jobs,
+                                                       eval_set, early_stopping_metric, params)
+        return name, model, timing, None
+    except Exception as e:
+        return name, None, None, str(e)
+
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Train fraud detection models')
+    parser.add_argument('--full', action='store_true',
+                        help='Train on the full dataset (as written by feature_engineering.py --stream)')
+    parser.add_argument('--out-of-core', action='store_true',
+                        help='Preprocess the full dataset in chunks into memory-mapped matrices '
+                             '(no resampling; models weight classes instead)')
+    parser.add_argument('--balance', choices=['smote', 'smotetomek', 'undersample', 'downsample',
+                                              'minority_smote', 'none'],
+                        help='Class imbalance handling (default: smote, or none with --out-of-core, '
+                             'which supports downsample and minority_smote)')
+    parser.add_argument('--point-in-time', action='store_true',
+                        help='Train on point-in-time features that match online serving')
+    parser.add_argument('--parallel', action='store_true',
+                        help='Train the models at the same time in separate processes')
+    parser.add_argument('--cpu-budget', type=int,
+                        help='Cores shared by the models with --parallel, or used by each model without it '
+                             '(default: all)')
+    parser.add_argument('--early-stopping', nargs='?', const='pr_auc', choices=list(EARLY_STOPPING_METRICS),
+                        help='Stop XGBoost/LightGBM boosting when the validation metric stops improving '
+                             '(default metric: pr_auc) on the validation half of the held-out split')
+    parser.add_argument('--tuned-params', nargs='?', const=BEST_PARAMS_PATH,
+                        help='Train XGBoost/LightGBM with the hyperparameters found by hyperparameter_search.py '
+                             f'(default file: {BEST_PARAMS_PATH})')
+    parser.add_argument('--review-cost', type=float, default=5.0,
+                        help='Cost of reviewing a flagged transaction, for choosing the API decision thresholds')
+    parser.add_argument('--block-precision', type=float, default=0.9,
+                        help='Precision required of the high risk (block) threshold')
+    args = parser.parse_args()
+
+    if args.out_of_core and args.point_in_time:
+        parser.error('--out-of-core trains on the streamed full dataset, which has no point-in-time variant')
+    if args.out_of_core and args.balance not in [None, 'none', 'downsample', 'minority_smote']:
+        parser.error(f'--balance {args.balance} needs the training set in memory')
+
     print("Loading preprocessed data...")
 
     # Load data
-    from data_preprocessing import FraudDataPreprocessor
+    from data_preprocessing import FraudDataPreprocessor, ARTIFACTS_DIR
+    from feature_engineering import load_feature_dataset, feature_dataset_path, DEFAULT_SAMPLE_SIZE
 
-    df = pd.read_csv('detection_data/transactions_with_features.csv')
-    print(f"Loaded {len(df)} transactions")
-
-    # Preprocess data
-    print("\nPreprocessing data...")
     preprocessor = FraudDataPreprocessor()
 
-    X_train, X_test, y_train, y_test = preprocessor.prepare_data_for_training(
-        df,
-        test_size=0.2,
-        balance_method='smote',
-        sampling_strategy='auto',
-        scale=True
-    )
+    if args.out_of_core:
+        # Scaled matrices are memory-mapped from disk rather than held in RAM
+        X_train, X_test, y_train, y_test = preprocessor.prepare_data_out_of_core(
+            feature_dataset_path(sample_size=None),
+            test_size=0.2,
+            balance_method=args.balance or 'none'
+        )
+    else:
+        df = load_feature_dataset(sample_size=None if args.full else DEFAULT_SAMPLE_SIZE,
+                                  point_in_time=args.point_in_time)
+        print(f"Loaded {len(df)} transactions")
+
+        # Preprocess data
+        print("\nPreprocessing data...")
+        X_train, X_test, y_train, y_test = preprocessor.prepare_data_for_training(
+            df,
+            test_size=0.2,
+            balance_method=args.balance or 'smote',
+            sampling_strategy='auto',
+            scale=True,
+            inplace=True,
+            artifact_dir=ARTIFACTS_DIR
+        )
 
     # Initialize trainer
     trainer = FraudModelTrainer()
 
+    model_params = None
+    if args.tuned_params:
+        import json
+        with open(args.tuned_params) as f:
+            model_params = json.load(f)
+        print(f"Using tuned hyperparameters from {args.tuned_params} for {', '.join(model_params)}")
+
+    # Hold out half of the untouched test split as the validation set for early
+    # stopping and the decision thresholds, since the training split may contain
+    # resampled rows
+    from sklearn.model_selection import train_test_split
+    X_val, X_test, y_val, y_test = train_test_split(X_test, y_test, test_size=0.5,
+                                                    stratify=y_test, random_state=42)
+    eval_set = (X_val, y_val) if args.early_stopping else None
+    print(f"Validating on {len(y_val)} rows, evaluating on {len(y_test)} test rows")
+
     # Train all models
-    trainer.train_all_models(X_train, y_train)
+    trainer.train_all_models(X_train, y_train, sample_weight=preprocessor.sample_weight,
+                             parallel=args.parallel, cpu_budget=args.cpu_budget,
+                             eval_set=eval_set, early_stopping_metric=args.early_stopping or 'pr_auc',
+                             model_params=model_params)
 
     # Evaluate all models
     trainer.evaluate_all_models(X_test, y_test)
 
+    # Choose the API decision thresholds by expected cost on the validation rows,
+    # a missed fraud costing its amount, and report their cost on the test rows
+    trainer.optimize_thresholds(
+        X_val, y_val,
+        amounts=preprocessor.unscale_column(X_val, 'Amount'),
+        test_amounts=preprocessor.unscale_column(X_test, 'Amount'),
+        optimizer=ThresholdOptimizer(review_cost=args.review_cost, block_precision=args.block_precision)
+    )
+
     # Create visualizations
     trainer.compare_models()
     trainer.plot_roc_curves(X_test, y_test)
+    trainer.plot_precision_recall_curves(X_test, y_test)
     trainer.plot_confusion_matrices(X_test, y_test)
 
     # Save models
@@ -443,7 +964,6 @@ if __name__ == "__main__":
     trainer.save_all_models()
 
     # Save preprocessor for API use
-    import os
     os.makedirs('models', exist_ok=True)
     preprocessor_data = {
         'scaler': preprocessor.scaler,
@@ -453,6 +973,11 @@ if __name__ == "__main__":
     joblib.dump(preprocessor_data, 'models/preprocessor.pkl')
     print("Preprocessor saved to: models/preprocessor.pkl")
 
+    # Save fraud rate tables so the API can compute risk score features
+    # (kept as they are while the raw transactions file is unchanged)
+    from feature_engineering import build_risk_tables
+    build_risk_tables()
+
     print("\n" + "=" * 80)
     print("MODEL TRAINING COMPLETE")
     print("=" * 80)
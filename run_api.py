@@ -3,7 +3,7 @@ Flask API Server Runner
 Main entry point for the fraud detection API service
 """
 
-from app import app, socketio
+from app import app, socketio, start_archiver
 import os
 
 if __name__ == '__main__':
@@ -21,6 +21,11 @@ if __name__ == '__main__':
     print(f"Health Check: http://{host}:{port}/api/health")
     print("=" * 80)
 
+    # Export closed prediction partitions to the Parquet archive in the background
+    # (in the serving process only, not in the debug reloader's watcher process)
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_archiver()
+
     # Run with SocketIO for WebSocket support
     socketio.run(
         app,
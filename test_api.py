@@ -122,6 +122,26 @@ def test_model_info():
     assert 'model_type' in response.json()
     print("PASSED")
 
+def test_cache_stats():
+    """Test dashboard statistics cache counters"""
+    print("\n" + "=" * 80)
+    print("TEST: Cache Statistics")
+    print("=" * 80)
+
+    before = requests.get(f'{BASE_URL}/api/cache/stats').json()
+
+    # Two identical requests: the second should be served from the cache
+    requests.get(f'{BASE_URL}/api/dashboard/merchant-stats')
+    requests.get(f'{BASE_URL}/api/dashboard/merchant-stats')
+
+    response = requests.get(f'{BASE_URL}/api/cache/stats')
+    print(f"Status Code: {response.status_code}")
+    print(f"Response: {json.dumps(response.json(), indent=2)}")
+
+    assert response.status_code == 200
+    assert response.json()['hits'] + response.json()['misses'] >= before['hits'] + before['misses'] + 2
+    print("PASSED")
+
 def test_error_handling():
     """Test API error handling"""
     print("\n" + "=" * 80)
@@ -158,6 +178,7 @@ def run_all_tests():
         test_model_info,
         test_single_prediction,
         test_batch_prediction,
+        test_cache_stats,
         test_error_handling
     ]
 
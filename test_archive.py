@@ -0,0 +1,100 @@
+"""
+Prediction Archive Tests
+Exports predictions from a temporary SQLite backend to a temporary Parquet
+archive and reads them back with query_archive.
+
+Run with: pytest test_archive.py
+"""
+
+import os
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from app import database as db
+from app.archive import PredictionArchiver, query_archive
+from app.database import SQLiteBackend
+
+
+@pytest.fixture
+def backend(tmp_path):
+    """Empty SQLite backend installed as the active backend"""
+    previous = db.get_backend()
+    backend = SQLiteBackend(str(tmp_path / 'test.db'))
+    backend.init_database()
+    db.set_backend(backend)
+    yield backend
+    db.set_backend(previous)
+
+@pytest.fixture
+def archiver(tmp_path):
+    return PredictionArchiver(archive_dir=str(tmp_path / 'archive'), row_group_size=2)
+
+def _save(backend, index, timestamp, probability=0.1):
+    backend.save_prediction({
+        'transaction_id': f'txn_{index}',
+        'amount': 10.0 + index,
+        'is_fraud': probability >= 0.5,
+        'fraud_probability': probability,
+        'risk_score': probability * 100,
+        'risk_level': 'medium' if probability >= 0.5 else 'low'
+    })
+    with backend.get_db_connection() as conn:
+        conn.execute('UPDATE predictions SET timestamp = ? WHERE transaction_id = ?',
+                     (timestamp, f'txn_{index}'))
+        conn.commit()
+
+
+def test_exports_closed_days_only(backend, archiver):
+    _save(backend, 0, '2024-01-01 08:00:00')
+    _save(backend, 1, '2024-01-01 23:59:59')
+    _save(backend, 2, '2024-01-03 10:00:00')
+    _save(backend, 3, '2024-01-04 09:00:00')
+
+    written = archiver.export_closed_partitions(now=datetime(2024, 1, 4, 12, 0))
+
+    # 2024-01-02 has no rows and 2024-01-04 is still open
+    assert written == [('2024-01-01', 2), ('2024-01-03', 1)]
+    assert [day.strftime('%Y-%m-%d') for day in archiver.exported_days()] == ['2024-01-01', '2024-01-03']
+    assert not os.path.exists(archiver.partition_path(datetime(2024, 1, 4)))
+
+def test_reexport_is_idempotent(backend, archiver):
+    _save(backend, 0, '2024-01-01 08:00:00')
+    _save(backend, 1, '2024-01-02 08:00:00')
+    archiver.export_closed_partitions(now=datetime(2024, 1, 2, 12, 0))
+    path = archiver.partition_path(datetime(2024, 1, 1))
+    modified = os.path.getmtime(path)
+
+    assert archiver.export_closed_partitions(now=datetime(2024, 1, 2, 18, 0)) == []
+    assert os.path.getmtime(path) == modified
+
+    # Once the next day closes only that day is written
+    assert archiver.export_closed_partitions(now=datetime(2024, 1, 3, 0, 0)) == [('2024-01-02', 1)]
+    assert len(query_archive(archive_dir=archiver.archive_dir)) == 2
+
+def test_query_archive_filters(backend, archiver):
+    probabilities = [0.1, 0.6, 0.9, 0.3, 0.95]
+    for index, probability in enumerate(probabilities):
+        _save(backend, index, f'2024-01-0{1 + index // 3} 0{index}:00:00', probability)
+    archiver.export_closed_partitions(now=datetime(2024, 1, 3))
+
+    result = query_archive(min_probability=0.5, archive_dir=archiver.archive_dir)
+    assert sorted(result['transaction_id']) == ['txn_1', 'txn_2', 'txn_4']
+
+    result = query_archive(start='2024-01-01 01:00:00', end='2024-01-02', max_probability=0.9,
+                           columns=['transaction_id', 'fraud_probability'], archive_dir=archiver.archive_dir)
+    assert list(result.columns) == ['transaction_id', 'fraud_probability']
+    assert list(result['transaction_id']) == ['txn_1']
+
+    # Date bounds prune whole partitions: a corrupt file outside the range is never opened
+    with open(archiver.partition_path(datetime(2024, 1, 2)), 'wb') as f:
+        f.write(b'not parquet')
+    result = query_archive(start='2024-01-01', end='2024-01-01 23:00:00', archive_dir=archiver.archive_dir)
+    assert sorted(result['transaction_id']) == ['txn_0', 'txn_1', 'txn_2']
+
+def test_query_missing_archive_is_empty(tmp_path):
+    result = query_archive(archive_dir=str(tmp_path / 'missing'))
+    assert result.empty
+    assert 'fraud_probability' in result.columns
@@ -0,0 +1,194 @@
+"""
+Data Preprocessing Tests
+Checks label encoding of categorical columns against scikit-learn, and that
+preprocessing artifacts stored with ArrayStore are reused across runs, and
+that time-ordered splits are disjoint and never test on the past.
+
+Run with: pytest test_data_preprocessing.py
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from data_preprocessing import FraudDataPreprocessor, TemporalSplitter, encode_labels
+
+
+@pytest.fixture
+def features():
+    """Small engineered feature frame with missing values and a rare fraud label"""
+    rng = np.random.default_rng(5)
+    n = 600
+    return pd.DataFrame({
+        'Amount': rng.gamma(2, 40, n),
+        'txn_count_24h': rng.integers(0, 20, n).astype('int32'),
+        'mcc_fraud_rate': np.where(rng.random(n) < 0.05, np.nan, rng.random(n)).astype('float32'),
+        'Use Chip': pd.Series(rng.choice(['Chip', 'Swipe', 'Online', None], n), dtype='category'),
+        'User': rng.integers(0, 30, n),
+        'Is Fraud?': (rng.random(n) < 0.08).astype('int8')
+    })
+
+@pytest.fixture
+def feature_file(tmp_path):
+    """Parquet feature file of 2,000 transactions over 100 days, out of time order"""
+    pytest.importorskip('pyarrow')
+    rng = np.random.default_rng(11)
+    n = 2000
+    df = pd.DataFrame({
+        'row': np.arange(n),
+        'DateTime': pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 100 * 24 * 60, n), unit='min'),
+        'Amount': rng.gamma(2, 40, n)
+    })
+    path = str(tmp_path / 'features.parquet')
+    df.to_parquet(path, index=False)
+    return path, df
+
+def _read_splits(fold):
+    return {name: pd.read_parquet(path) for name, (path, _) in fold.items()}
+
+def _assert_time_ordered(splits, names):
+    """Splits are disjoint and each one ends before the next one starts"""
+    rows = [set(splits[name]['row']) for name in names]
+    for i, first in enumerate(rows):
+        for second in rows[i + 1:]:
+            assert not first & second
+    for earlier, later in zip(names, names[1:]):
+        assert splits[earlier]['DateTime'].max() < splits[later]['DateTime'].min()
+
+def _artifacts(directory):
+    return sorted(name.split('-')[0] for name in os.listdir(directory))
+
+@pytest.mark.parametrize('values', [
+    pd.Series(['Chip', 'Swipe', None, 'Online', 'Chip', np.nan]),
+    pd.Series([5411, 5812, 5411, 7995]),
+    pd.Series(['CA', 'TX', None, 'CA'], dtype='category'),
+])
+def test_encode_labels_matches_label_encoder(values):
+    encoder = LabelEncoder()
+    expected = encoder.fit_transform(values.astype(str))
+
+    codes = encode_labels(values, encoder.classes_)
+
+    assert codes.dtype == np.int64
+    np.testing.assert_array_equal(codes, expected)
+
+def test_unknown_labels_map_past_the_last_class():
+    classes = np.array(['CA', 'NY', 'TX'])
+    codes = encode_labels(pd.Series(['TX', 'Italy', 'CA', None, 'Italy']), classes)
+    np.testing.assert_array_equal(codes, [2, 3, 0, 3, 3])
+
+def test_unseen_categories_outside_training():
+    preprocessor = FraudDataPreprocessor()
+    train = pd.DataFrame({'Use Chip': ['Chip', 'Swipe', 'Chip']})
+    preprocessor.encode_categorical_features(train, ['Use Chip'], is_training=True)
+
+    test = pd.DataFrame({'Use Chip': pd.Series(['Swipe', 'Online'], dtype='category')})
+    preprocessor.encode_categorical_features(test, ['Use Chip'], is_training=False)
+
+    assert list(train['Use Chip']) == [0, 1, 0]
+    assert list(test['Use Chip']) == [1, 2]
+
+def test_artifacts_match_in_memory_pipeline(features, tmp_path):
+    expected = FraudDataPreprocessor().prepare_data_for_training(features, balance_method='none')
+    stored = FraudDataPreprocessor().prepare_data_for_training(features, balance_method='none',
+                                                               artifact_dir=str(tmp_path))
+
+    for a, b in zip(expected, stored):
+        np.testing.assert_allclose(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+
+def test_second_run_reuses_artifacts(features, tmp_path, capsys):
+    artifact_dir = str(tmp_path)
+    first = FraudDataPreprocessor().prepare_data_for_training(features.copy(), balance_method='undersample',
+                                                              artifact_dir=artifact_dir)
+    assert _artifacts(artifact_dir) == ['encoded', 'resampled', 'split']
+    modified = {name: os.path.getmtime(os.path.join(artifact_dir, name)) for name in os.listdir(artifact_dir)}
+    capsys.readouterr()
+
+    preprocessor = FraudDataPreprocessor()
+    second = preprocessor.prepare_data_for_training(features.copy(), balance_method='undersample',
+                                                    artifact_dir=artifact_dir)
+
+    output = capsys.readouterr().out
+    assert 'Loaded encoded features' in output
+    assert 'Loaded undersample training set' in output
+    assert {name: os.path.getmtime(os.path.join(artifact_dir, name)) for name in os.listdir(artifact_dir)} == modified
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+    assert preprocessor.feature_columns == ['Amount', 'txn_count_24h', 'mcc_fraud_rate', 'Use Chip']
+    assert list(preprocessor.label_encoders['Use Chip'].classes_) == ['Chip', 'Online', 'Swipe']
+
+def test_new_balance_method_reuses_encoding_and_split(features, tmp_path):
+    artifact_dir = str(tmp_path)
+    FraudDataPreprocessor().prepare_data_for_training(features, balance_method='none', artifact_dir=artifact_dir)
+    assert _artifacts(artifact_dir) == ['encoded', 'split']
+
+    FraudDataPreprocessor().prepare_data_for_training(features, balance_method='undersample',
+                                                      artifact_dir=artifact_dir)
+    assert _artifacts(artifact_dir) == ['encoded', 'resampled', 'split']
+
+    # Different data gets its own encoded matrix
+    FraudDataPreprocessor().prepare_data_for_training(features.iloc[:500], balance_method='none',
+                                                      artifact_dir=artifact_dir)
+    assert _artifacts(artifact_dir) == ['encoded', 'encoded', 'resampled', 'split', 'split']
+
+def test_split_from_cutoffs(feature_file, tmp_path):
+    path, df = feature_file
+    splitter = TemporalSplitter.from_cutoffs('2019-03-01', '2019-03-21')
+
+    [fold] = splitter.split_to_disk(path, str(tmp_path / 'splits'), chunksize=300)
+    splits = _read_splits(fold)
+
+    _assert_time_ordered(splits, ['train', 'validation', 'test'])
+    assert sum(count for _, count in fold.values()) == len(df)
+    assert splits['train']['DateTime'].max() < pd.Timestamp('2019-03-01') <= splits['validation']['DateTime'].min()
+    assert splits['validation']['DateTime'].max() < pd.Timestamp('2019-03-21') <= splits['test']['DateTime'].min()
+    assert len(splits['test']) == (df['DateTime'] >= pd.Timestamp('2019-03-21')).sum()
+
+def test_split_from_fractions(feature_file, tmp_path):
+    path, df = feature_file
+    splitter = TemporalSplitter.from_fractions(path, validation_size=0.1, test_size=0.2, chunksize=300)
+
+    [fold] = splitter.split_to_disk(path, str(tmp_path / 'splits'))
+    splits = _read_splits(fold)
+
+    _assert_time_ordered(splits, ['train', 'validation', 'test'])
+    # Cutoffs fall on midnights, so each fraction is within about a day of rows
+    per_day = len(df) / 100
+    assert abs(fold['test'][1] - 0.2 * len(df)) <= 2 * per_day
+    assert abs(fold['validation'][1] - 0.1 * len(df)) <= 2 * per_day
+
+def test_rolling_origin_folds(feature_file, tmp_path):
+    path, df = feature_file
+    splitter = TemporalSplitter.rolling_origin('2019-03-01', n_folds=3, horizon='10D', validation='5D', window='30D')
+
+    folds = splitter.split_to_disk(path, str(tmp_path / 'splits'))
+
+    assert len(folds) == 3
+    test_starts = []
+    for k, fold in enumerate(folds):
+        assert os.path.dirname(fold['test'][0]).endswith(f'fold_{k}')
+        splits = _read_splits(fold)
+        _assert_time_ordered(splits, ['train', 'validation', 'test'])
+
+        origin = pd.Timestamp('2019-03-01') + pd.Timedelta(days=10 * k)
+        train_end = origin - pd.Timedelta(days=5)
+        assert splits['train']['DateTime'].min() >= train_end - pd.Timedelta(days=30)
+        assert splits['test']['DateTime'].min() >= origin
+        assert splits['test']['DateTime'].max() < origin + pd.Timedelta(days=10)
+        test_starts.append(splits['test']['DateTime'].min())
+
+    # Each fold tests on a later period than the one before
+    assert test_starts == sorted(test_starts)
+
+def test_empty_splits_are_not_written(feature_file, tmp_path):
+    path, _ = feature_file
+    output_dir = str(tmp_path / 'splits')
+    TemporalSplitter.from_cutoffs('2019-03-01').split_to_disk(path, output_dir)
+    assert os.path.exists(os.path.join(output_dir, 'test.parquet'))
+
+    [fold] = TemporalSplitter.from_cutoffs('2020-01-01').split_to_disk(path, output_dir)
+    assert list(fold) == ['train']
+    assert not os.path.exists(os.path.join(output_dir, 'test.parquet'))
@@ -0,0 +1,208 @@
+"""
+Storage Backend Tests
+Runs the same checks against the SQLite backend and, when PostgreSQL binaries
+are available (on PATH or in $PG_BIN), a throwaway local PostgreSQL server.
+
+Run with: pytest test_database.py
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+
+import pytest
+
+from app.database import SQLiteBackend, StorageBackend
+
+
+def _find_pg_binary(name):
+    pg_bin = os.environ.get('PG_BIN')
+    if pg_bin and os.path.exists(os.path.join(pg_bin, name)):
+        return os.path.join(pg_bin, name)
+    return shutil.which(name)
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture(scope='module')
+def postgres_dsn():
+    """Start a temporary PostgreSQL server for the duration of the module"""
+    pytest.importorskip('psycopg2')
+
+    initdb = _find_pg_binary('initdb')
+    pg_ctl = _find_pg_binary('pg_ctl')
+    if not initdb or not pg_ctl:
+        pytest.skip('PostgreSQL binaries not found (set PG_BIN to their directory)')
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        pytest.skip('PostgreSQL refuses to run as root')
+
+    data_dir = tempfile.mkdtemp(prefix='fraud_pg_')
+    port = _free_port()
+
+    subprocess.run([initdb, '-D', data_dir, '-U', 'postgres', '-A', 'trust'],
+                   check=True, capture_output=True)
+    subprocess.run([pg_ctl, '-D', data_dir, '-w', '-l', os.path.join(data_dir, 'server.log'),
+                    '-o', f'-p {port} -k {data_dir} -h 127.0.0.1', 'start'],
+                   check=True, capture_output=True)
+    try:
+        yield f'postgresql://postgres@127.0.0.1:{port}/postgres'
+    finally:
+        subprocess.run([pg_ctl, '-D', data_dir, '-m', 'immediate', 'stop'], capture_output=True)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+@pytest.fixture(params=['sqlite', 'postgres'])
+def backend(request, tmp_path):
+    """Fresh storage backend with an empty predictions table"""
+    if request.param == 'sqlite':
+        backend = SQLiteBackend(str(tmp_path / 'test.db'))
+        backend.init_database()
+        yield backend
+    else:
+        from app.postgres_backend import PostgresBackend
+
+        backend = PostgresBackend(request.getfixturevalue('postgres_dsn'))
+        backend.init_database()
+        with backend.get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('TRUNCATE predictions, alerts RESTART IDENTITY')
+        yield backend
+        backend.close()
+
+def _prediction(index, probability=0.1):
+    return {
+        'transaction_id': f'txn_{index}',
+        'amount': 10.0 + index,
+        'merchant_state': 'CA',
+        'merchant_city': 'San Francisco' if index % 2 else None,
+        'mcc': 5411,
+        'use_chip': 'Chip Transaction',
+        'is_fraud': probability >= 0.5,
+        'fraud_probability': probability,
+        'risk_score': probability * 100,
+        'risk_level': 'high' if probability >= 0.8 else 'medium' if probability >= 0.5 else 'low'
+    }
+
+
+def test_save_and_read_back(backend):
+    prediction_id = backend.save_prediction(_prediction(1, probability=0.95))
+
+    rows = backend.get_recent_predictions(limit=10)
+    assert len(rows) == 1
+    assert rows[0]['id'] == prediction_id
+    assert rows[0]['transaction_id'] == 'txn_1'
+    assert rows[0]['is_fraud'] == 1
+    assert isinstance(rows[0]['timestamp'], str)
+
+def test_bulk_insert_skips_duplicates(backend):
+    backend.save_prediction(_prediction(0))
+
+    saved = backend.save_predictions([_prediction(i) for i in range(5)])
+
+    assert saved == 4
+    rows = backend.get_recent_predictions(limit=10)
+    assert [row['transaction_id'] for row in rows] == [f'txn_{i}' for i in (4, 3, 2, 1, 0)]
+    assert rows[0]['merchant_city'] is None
+
+def test_keyset_pagination(backend):
+    backend.save_predictions([_prediction(i) for i in range(10)])
+
+    first_page = backend.get_recent_predictions(limit=4)
+    older_page = backend.get_recent_predictions(limit=4, before_id=first_page[-1]['id'])
+    newer_rows = backend.get_recent_predictions(limit=4, after_id=older_page[0]['id'])
+
+    assert [row['id'] for row in first_page] == [10, 9, 8, 7]
+    assert [row['id'] for row in older_page] == [6, 5, 4, 3]
+    assert [row['id'] for row in newer_rows] == [10, 9, 8, 7]
+
+def test_alerts_materialized_on_write(backend):
+    probabilities = [0.1, 0.55, 0.75, 0.95, 0.92]
+    backend.save_predictions([_prediction(i, p) for i, p in enumerate(probabilities[:3])])
+    backend.save_prediction(_prediction(3, probabilities[3]))
+    backend.save_prediction(dict(_prediction(4, probabilities[4]), amount=900.0))
+
+    alerts = backend.get_alerts()
+    assert [row['transaction_id'] for row in alerts] == ['txn_4', 'txn_3', 'txn_2', 'txn_1']
+    assert alerts[0]['severity'] == 'critical'
+    assert alerts[0]['status'] == 'active'
+    assert alerts[0]['title'] == 'Fraud Alert - CRITICAL'
+    assert alerts[0]['description'] == 'Transaction of $900.00 flagged with 92.0% fraud probability'
+
+    assert [row['transaction_id'] for row in backend.get_alerts(severity='critical')] == ['txn_4']
+    assert [row['transaction_id'] for row in backend.get_alerts(severity='high')] == ['txn_3']
+    assert len(backend.get_alerts(severity='medium')) == 2
+
+def test_alerts_follow_stored_decision(backend):
+    # The decision made with the model's thresholds wins over the raw probability
+    backend.save_predictions([
+        dict(_prediction(0, 0.6), is_fraud=False, risk_level='low'),
+        dict(_prediction(1, 0.3), is_fraud=True, risk_level='medium')
+    ])
+    backend.save_prediction(dict(_prediction(2, 0.3), is_fraud=True, risk_level='high'))
+
+    alerts = backend.get_alerts()
+    assert [(row['transaction_id'], row['severity']) for row in alerts] == [('txn_2', 'high'), ('txn_1', 'medium')]
+
+def test_alert_pagination_and_status(backend):
+    backend.save_predictions([_prediction(i, 0.95) for i in range(6)])
+
+    first_page = backend.get_alerts(severity='high', limit=4)
+    older_page = backend.get_alerts(severity='high', limit=4, before_id=first_page[-1]['id'])
+    newer_page = backend.get_alerts(severity='high', limit=3, after_id=older_page[0]['id'])
+    assert [row['id'] for row in first_page] == [6, 5, 4, 3]
+    assert [row['id'] for row in older_page] == [2, 1]
+    assert [row['id'] for row in newer_page] == [5, 4, 3]
+
+    assert backend.update_alert_status(3, 'resolved')
+    assert not backend.update_alert_status(999, 'resolved')
+    with pytest.raises(ValueError):
+        backend.update_alert_status(3, 'deleted')
+
+    assert [row['id'] for row in backend.get_alerts(status='resolved')] == [3]
+    assert len(backend.get_alerts(status='active')) == 5
+
+def test_aggregate_queries(backend):
+    backend.save_predictions([_prediction(i, 0.9 if i < 2 else 0.1) for i in range(6)])
+
+    stats = backend.get_fraud_statistics(hours=24)
+    assert stats['total'] == 6
+    assert stats['fraud_count'] == 2
+
+    hourly = backend.get_hourly_statistics(hours=24)
+    assert sum(row['transaction_count'] for row in hourly) == 6
+    assert hourly[0]['hour'].endswith(':00:00')
+
+    distribution = {row['risk_level']: row['count'] for row in backend.get_risk_distribution()}
+    assert distribution == {'high': 2, 'low': 4}
+
+    merchants = backend.get_merchant_statistics()
+    assert sum(row['transaction_count'] for row in merchants) == 6
+
+def test_concurrent_batches_count_only_their_own_rows(backend):
+    counts = []
+
+    def writer(offset):
+        for batch in range(5):
+            start = offset + batch * 20
+            counts.append(backend.save_predictions([_prediction(i, 0.95) for i in range(start, start + 20)]))
+
+    threads = [threading.Thread(target=writer, args=(offset,)) for offset in range(0, 400, 100)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counts == [20] * 20
+    assert len(backend.get_alerts(limit=1000)) == 400
+
+def test_incomplete_backend_cannot_be_created():
+    class PartialBackend(StorageBackend):
+        def init_database(self):
+            pass
+
+    with pytest.raises(TypeError, match='abstract'):
+        PartialBackend()
@@ -0,0 +1,83 @@
+"""
+Feature Service Tests
+Checks that the features FeatureService computes online, one transaction at
+a time, match the point-in-time features engineered offline, and that
+transactions arriving out of time order are handled.
+
+Run with: pytest test_feature_service.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.feature_service import FeatureService
+from data_analysis import CreditCardDataAnalyzer
+from feature_engineering import FraudFeatureEngine
+
+
+@pytest.fixture
+def transactions(tmp_path):
+    """Cleaned transactions from a raw IBM-format file of 1,000 rows, in time order"""
+    rng = np.random.default_rng(9)
+    n = 1000
+    raw = pd.DataFrame({
+        'User': rng.integers(0, 20, n),
+        'Card': rng.integers(0, 3, n),
+        'Year': 2019,
+        'Month': rng.integers(1, 4, n),
+        'Day': rng.integers(1, 29, n),
+        'Time': [f'{h:02d}:{m:02d}' for h, m in zip(rng.integers(0, 24, n), rng.integers(0, 60, n))],
+        'Amount': [f'${amount:.2f}' for amount in rng.gamma(2, 40, n)],
+        'Use Chip': rng.choice(['Chip Transaction', 'Swipe Transaction', 'Online Transaction'], n),
+        'Merchant Name': rng.integers(0, 100, n),
+        'Merchant City': rng.choice(['Springfield', 'ONLINE'], n),
+        'Merchant State': rng.choice(['CA', 'TX', 'NY', 'Italy'], n, p=[0.5, 0.3, 0.19, 0.01]),
+        'Zip': 12345.0,
+        'MCC': rng.choice([5411, 5812, 5999, 7995], n, p=[0.5, 0.3, 0.19, 0.01]),
+        'Errors?': '',
+        'Is Fraud?': np.where(rng.random(n) < 0.05, 'Yes', 'No')
+    })
+    raw.to_csv(tmp_path / 'credit_card_transactions-ibm_v2.csv', index=False)
+    analyzer = CreditCardDataAnalyzer(data_dir=str(tmp_path), use_cache=False)
+    df = pd.concat(analyzer.iter_transaction_chunks(), ignore_index=True)
+    return df.sort_values('DateTime', kind='stable').reset_index(drop=True)
+
+@pytest.fixture
+def service(tmp_path):
+    """Feature service without risk tables"""
+    service = FeatureService()
+    service.risk_tables_path = str(tmp_path / 'missing_risk_tables.npz')
+    return service
+
+def _transaction(user, timestamp, amount=50.0):
+    return {'User': user, 'Card': 0, 'Amount': amount, 'DateTime': timestamp,
+            'Merchant Name': 1, 'MCC': 5411, 'Merchant State': 'CA'}
+
+
+def test_online_features_match_point_in_time_features(transactions, service):
+    df = transactions.assign(row=np.arange(len(transactions)))
+    offline = FraudFeatureEngine(verbose=False).create_all_features(
+        df.copy(), include_risk_scores=False, point_in_time=True
+    )
+    # Velocity features reorder rows by card
+    offline = offline.sort_values('row').reset_index(drop=True)
+
+    online = pd.DataFrame([service.compute_features(transaction) for transaction in df.to_dict('records')])
+
+    shared = [column for column in online.columns if column in offline.columns]
+    assert len(shared) > 30
+    for column in shared:
+        np.testing.assert_allclose(online[column].to_numpy(dtype=float), offline[column].to_numpy(dtype=float),
+                                   rtol=1e-5, err_msg=column)
+
+def test_out_of_order_transactions(service):
+    first = service.compute_features(_transaction(1, '2019-03-05 12:00'))
+    earlier = service.compute_features(_transaction(1, '2019-03-01 09:00'))
+    later = service.compute_features(_transaction(1, '2019-03-04 13:00'))
+
+    assert first['user_txn_per_day'] == 1.0
+    assert earlier['user_txn_per_day'] == 2.0
+    # Days are counted from the earliest transaction, 03-01, not the first to arrive
+    assert later['user_txn_per_day'] == pytest.approx(3 / 4)
+    assert service.user_profiles[1]['first_seen'] == pd.Timestamp('2019-03-01 09:00')
@@ -0,0 +1,114 @@
+"""
+Keyset Pagination Tests
+Checks the query builder behind the paginated storage methods and the
+cursors returned by the recent-transactions and alerts endpoints.
+
+Run with: pytest test_pagination.py
+"""
+
+import sqlite3
+
+import pytest
+
+from app import app
+from app import database as db
+from app.database import SQLiteBackend, _paginate
+from app.routes import _paginate_rows
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Test client backed by an empty SQLite database"""
+    previous = db.get_backend()
+    backend = SQLiteBackend(str(tmp_path / 'test.db'))
+    backend.init_database()
+    db.set_backend(backend)
+    yield app.test_client(), backend
+    db.set_backend(previous)
+
+def _prediction(index, probability=0.1):
+    return {
+        'transaction_id': f'txn_{index}',
+        'amount': 10.0 + index,
+        'is_fraud': probability >= 0.5,
+        'fraud_probability': probability,
+        'risk_score': probability * 100,
+        'risk_level': 'high' if probability >= 0.8 else 'medium' if probability >= 0.5 else 'low'
+    }
+
+
+def test_paginate_builds_a_single_where_clause():
+    query, params, ascending = _paginate('SELECT * FROM predictions', [], [], 10)
+    assert query == 'SELECT * FROM predictions ORDER BY id DESC LIMIT ?'
+    assert params == [10]
+    assert not ascending
+
+    query, params, ascending = _paginate(
+        'SELECT * FROM predictions', ['risk_level = ?'], ['high'], 5, before_id=40
+    )
+    assert query == 'SELECT * FROM predictions WHERE risk_level = ? AND id < ? ORDER BY id DESC LIMIT ?'
+    assert params == ['high', 40, 5]
+
+    query, params, ascending = _paginate('SELECT * FROM predictions', [], [], 5, after_id=7)
+    assert query == 'SELECT * FROM predictions WHERE id > ? ORDER BY id ASC LIMIT ?'
+    assert ascending
+
+def test_paginate_ignores_where_inside_filters(tmp_path):
+    """A WHERE in a subquery or literal must not be mistaken for the query's own WHERE"""
+    backend = SQLiteBackend(str(tmp_path / 'test.db'))
+    backend.init_database()
+    backend.save_predictions([_prediction(i, 0.9 if i % 2 else 0.1) for i in range(6)])
+
+    conditions = ["id IN (SELECT id FROM predictions WHERE risk_level = 'high')", "merchant_state IS NOT 'WHERE'"]
+    query, params, _ = _paginate('SELECT * FROM predictions', conditions, [], 2, before_id=6)
+
+    with sqlite3.connect(backend.db_path) as conn:
+        rows = conn.execute(query, params).fetchall()
+    assert [row[0] for row in rows] == [4, 2]
+
+def test_paginate_rows_cursors():
+    rows = [{'id': i} for i in (9, 8, 7)]
+
+    page, cursor = _paginate_rows(rows, 2, after_id=None)
+    assert [row['id'] for row in page] == [9, 8]
+    assert cursor == {'after_id': 9, 'before_id': 8, 'has_more': True}
+
+    # With after_id the look-ahead row is the newest one
+    page, cursor = _paginate_rows(rows, 2, after_id=6)
+    assert [row['id'] for row in page] == [8, 7]
+    assert cursor == {'after_id': 8, 'before_id': 7, 'has_more': True}
+
+    page, cursor = _paginate_rows([], 2, after_id=6)
+    assert cursor == {'after_id': 6, 'before_id': None, 'has_more': False}
+
+def test_recent_transactions_pages_cover_history_once(client):
+    client, backend = client
+    backend.save_predictions([_prediction(i) for i in range(7)])
+
+    seen = []
+    params = {'limit': 3}
+    while True:
+        body = client.get('/api/dashboard/recent-transactions', query_string=params).get_json()
+        seen.extend(row['id'] for row in body['transactions'])
+        if not body['cursor']['has_more']:
+            break
+        params = {'limit': 3, 'before_id': body['cursor']['before_id']}
+
+    assert seen == [7, 6, 5, 4, 3, 2, 1]
+
+def test_polling_returns_only_new_rows(client):
+    client, backend = client
+    backend.save_predictions([_prediction(i, 0.95) for i in range(3)])
+
+    body = client.get('/api/dashboard/alerts', query_string={'limit': 10}).get_json()
+    cursor = body['cursor']['after_id']
+    assert [alert['id'] for alert in body['alerts']] == [3, 2, 1]
+
+    backend.save_predictions([_prediction(i, 0.95) for i in range(3, 5)])
+    body = client.get('/api/dashboard/alerts', query_string={'after_id': cursor}).get_json()
+    assert [alert['id'] for alert in body['alerts']] == [5, 4]
+    assert body['cursor']['after_id'] == 5
+
+    body = client.get('/api/dashboard/alerts', query_string={'after_id': 5}).get_json()
+    assert body['alerts'] == []
+    assert body['cursor']['after_id'] == 5
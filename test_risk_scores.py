@@ -0,0 +1,102 @@
+"""
+Risk Score Feature Tests
+Checks that the risk score features engineered offline match the ones
+FeatureService serves online from the saved risk tables, on a small raw
+transactions file in the IBM dataset format.
+
+Run with: pytest test_risk_scores.py
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.feature_service import FeatureService
+from data_analysis import CreditCardDataAnalyzer
+from feature_engineering import (
+    FeatureAggregates, FraudFeatureEngine, RiskTableBuilder, build_risk_tables, risk_tables_key
+)
+
+RISK_FEATURES = ['mcc_fraud_rate', 'state_fraud_rate', 'hour_fraud_rate', 'txn_type_fraud_rate',
+                 'composite_risk_score']
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Data directory with a raw transactions file of 2,000 rows"""
+    rng = np.random.default_rng(3)
+    n = 2000
+    raw = pd.DataFrame({
+        'User': rng.integers(0, 50, n),
+        'Card': rng.integers(0, 3, n),
+        'Year': 2019,
+        'Month': rng.integers(1, 13, n),
+        'Day': rng.integers(1, 29, n),
+        'Time': [f'{h:02d}:{m:02d}' for h, m in zip(rng.integers(0, 24, n), rng.integers(0, 60, n))],
+        'Amount': [f'${amount:.2f}' for amount in rng.gamma(2, 40, n)],
+        'Use Chip': rng.choice(['Chip Transaction', 'Swipe Transaction', 'Online Transaction'], n),
+        'Merchant Name': rng.integers(0, 200, n),
+        'Merchant City': 'Springfield',
+        'Merchant State': rng.choice(['CA', 'TX', 'NY', 'Italy'], n, p=[0.5, 0.3, 0.19, 0.01]),
+        'Zip': 12345.0,
+        'MCC': rng.choice([5411, 5812, 5999, 7995], n, p=[0.5, 0.3, 0.19, 0.01]),
+        'Errors?': '',
+        'Is Fraud?': np.where(rng.random(n) < 0.05, 'Yes', 'No')
+    })
+    raw.to_csv(tmp_path / 'credit_card_transactions-ibm_v2.csv', index=False)
+    return str(tmp_path)
+
+def _transactions(data_dir):
+    analyzer = CreditCardDataAnalyzer(data_dir=data_dir, use_cache=False)
+    return pd.concat(analyzer.iter_transaction_chunks(), ignore_index=True)
+
+
+def test_offline_and_online_risk_features_match(data_dir, tmp_path):
+    df = _transactions(data_dir)
+    engine = FraudFeatureEngine(verbose=False)
+    offline = engine.create_risk_scores(engine.create_temporal_features(df.copy()))
+
+    path = str(tmp_path / 'risk_tables.npz')
+    build_risk_tables(data_dir=data_dir, path=path, chunksize=300)
+    service = FeatureService()
+    service.risk_tables_path = path
+
+    online = pd.DataFrame([
+        service._compute_risk_features(transaction['DateTime'], transaction)
+        for transaction in df.to_dict('records')
+    ])
+    np.testing.assert_allclose(online[RISK_FEATURES], offline[RISK_FEATURES], rtol=1e-6)
+
+def test_risk_tables_from_feature_aggregates(data_dir):
+    df = _transactions(data_dir)
+    chunked = FeatureAggregates()
+    for start in range(0, len(df), 700):
+        chunked.update(df.iloc[start:start + 700])
+
+    streamed = RiskTableBuilder().update(df.iloc[:1000]).update(df.iloc[1000:])
+    from_aggregates = RiskTableBuilder(chunked)
+    for name in RiskTableBuilder.TABLES:
+        pd.testing.assert_series_equal(from_aggregates.rates(name), streamed.rates(name))
+
+    # Offline features from the same aggregates are the smoothed rates
+    engine = FraudFeatureEngine(verbose=False)
+    features = engine.create_risk_scores(engine.create_temporal_features(df.copy()), chunked)
+    expected = df['MCC'].map(streamed.rates('mcc')).astype('float32')
+    np.testing.assert_allclose(features['mcc_fraud_rate'], expected, rtol=1e-6)
+
+def test_risk_tables_rebuilt_only_when_data_changes(data_dir, tmp_path):
+    path = str(tmp_path / 'risk_tables.npz')
+    assert build_risk_tables(data_dir=data_dir, path=path) is not None
+    key = risk_tables_key(path)
+    assert key is not None
+
+    # Unchanged raw data: the saved tables are kept
+    assert build_risk_tables(data_dir=data_dir, path=path) is None
+    assert build_risk_tables(data_dir=data_dir, path=path, smoothing=10) is not None
+    assert risk_tables_key(path) != key
+
+    transactions = os.path.join(data_dir, 'credit_card_transactions-ibm_v2.csv')
+    pd.read_csv(transactions).iloc[:-1].to_csv(transactions, index=False)
+    assert build_risk_tables(data_dir=data_dir, path=path, smoothing=10) is not None
@@ -0,0 +1,145 @@
+"""
+Decision Threshold Tests
+Compares the vectorized threshold sweeps with a plain per-threshold loop,
+on scores with many ties, and checks that only finite thresholds are saved
+and served.
+
+Run with: pytest test_thresholds.py
+"""
+
+import json
+
+import joblib
+import numpy as np
+import pytest
+
+from model_training import DEFAULT_THRESHOLDS, FraudModelTrainer, ThresholdOptimizer, threshold_sweep
+
+
+@pytest.fixture
+def scored():
+    """Labels, probabilities rounded to create ties, and signed amounts"""
+    rng = np.random.default_rng(7)
+    y_true = rng.random(500) < 0.1
+    y_prob = np.round(np.clip(0.3 * y_true + rng.random(500) * 0.7, 0, 1), 1)
+    amounts = rng.normal(80, 60, 500)
+    return y_true, y_prob, amounts
+
+def _loop_counts(y_true, y_prob, threshold):
+    flagged = y_prob >= threshold
+    tp = int(np.sum(flagged & y_true))
+    fp = int(np.sum(flagged & ~y_true))
+    return tp, fp, int(np.sum(~flagged & ~y_true)), int(np.sum(~flagged & y_true))
+
+def _precision(y_true, y_prob, threshold):
+    tp, fp, _, _ = _loop_counts(y_true, y_prob, threshold)
+    return tp / (tp + fp) if tp + fp else 0.0
+
+def _loop_cost(y_true, y_prob, threshold, amounts, review_cost):
+    flagged = y_prob >= threshold
+    return review_cost * flagged.sum() + np.abs(amounts)[y_true & ~flagged].sum()
+
+
+def test_threshold_sweep_matches_loop(scored):
+    y_true, y_prob, amounts = scored
+    thresholds = np.concatenate([np.unique(y_prob), [0.0, 0.25, 0.5, 1.5, np.inf]])
+
+    sweep = threshold_sweep(y_true, y_prob, thresholds, amounts)
+
+    for row in sweep.itertuples():
+        tp, fp, tn, fn = _loop_counts(y_true, y_prob, row.threshold)
+        assert row.flagged == tp + fp
+        assert row.precision == pytest.approx(tp / (tp + fp) if tp + fp else 0.0)
+        assert row.recall == pytest.approx(tp / (tp + fn))
+        assert row.f1_score == pytest.approx(2 * tp / (2 * tp + fp + fn))
+        assert row.false_positive_rate == pytest.approx(fp / (fp + tn))
+        assert row.missed_fraud_amount == pytest.approx(amounts[y_true & (y_prob < row.threshold)].sum())
+
+def test_default_thresholds_are_distinct_probabilities(scored):
+    y_true, y_prob, _ = scored
+    sweep = threshold_sweep(y_true, y_prob)
+    assert list(sweep['threshold']) == list(np.unique(y_prob))
+
+def test_optimizer_matches_loop(scored):
+    y_true, y_prob, amounts = scored
+    optimizer = ThresholdOptimizer(review_cost=20.0, block_precision=0.6)
+
+    thresholds = optimizer.optimize(y_true, y_prob, amounts)
+
+    candidates = list(np.unique(y_prob)) + [np.inf]
+    costs = [_loop_cost(y_true, y_prob, t, amounts, 20.0) for t in candidates]
+    medium = candidates[int(np.argmin(costs))]
+    high = min(t for t in candidates if t >= medium and _precision(y_true, y_prob, t) >= 0.6)
+    assert thresholds == {'medium': medium, 'high': high}
+
+    row = optimizer.expected_cost(y_true, y_prob, medium, amounts)
+    assert row['expected_cost'] == pytest.approx(min(costs))
+
+def test_cost_curve_ends_with_flag_nothing(scored):
+    y_true, y_prob, amounts = scored
+    curve = ThresholdOptimizer().cost_curve(y_true, y_prob, amounts)
+
+    last = curve.iloc[-1]
+    assert last['threshold'] == np.inf
+    assert last['flagged'] == 0
+    assert last['expected_cost'] == pytest.approx(np.abs(amounts[y_true]).sum())
+
+def test_defaults_when_reviews_cost_more_than_fraud(scored, capsys):
+    # Flagging nothing is cheapest, but the saved thresholds must stay finite
+    y_true, y_prob, _ = scored
+    optimizer = ThresholdOptimizer(review_cost=1e6)
+    thresholds = optimizer.optimize(y_true, y_prob)
+
+    assert optimizer.cost_curve_.loc[optimizer.cost_curve_['expected_cost'].idxmin(), 'threshold'] == np.inf
+    assert thresholds == DEFAULT_THRESHOLDS
+    assert thresholds is not DEFAULT_THRESHOLDS
+    assert 'Warning: flagging nothing is cheapest' in capsys.readouterr().out
+
+def test_loader_replaces_non_finite_thresholds(tmp_path, capsys):
+    from app.model_loader import ModelLoader
+
+    path = str(tmp_path / 'model.pkl')
+    joblib.dump({'model': 'model', 'thresholds': {'medium': np.inf, 'high': np.inf}}, path)
+    loader = ModelLoader()
+    previous = loader.model_path, loader._model, loader._thresholds
+    try:
+        loader.model_path = path
+        loader.load_model(force_reload=True)
+        assert loader.get_thresholds() == DEFAULT_THRESHOLDS
+        assert 'not finite' in capsys.readouterr().out
+        # Served by /api/model/info, so it has to be valid JSON
+        json.dumps(loader.get_model_info(), allow_nan=False)
+    finally:
+        loader.model_path, loader._model, loader._thresholds = previous
+
+def test_high_threshold_fallback(scored):
+    # No cut reaches the block precision, so the high threshold falls back to the default
+    y_true, y_prob, amounts = scored
+    thresholds = ThresholdOptimizer(block_precision=1.01).optimize(y_true, y_prob, amounts)
+    assert thresholds['high'] == max(thresholds['medium'], DEFAULT_THRESHOLDS['high'])
+
+def test_evaluate_model_flags_at_threshold():
+    class FixedModel:
+        def predict_proba(self, X):
+            return np.column_stack([1 - X, X])
+
+    y_prob = np.array([0.2, 0.5, 0.5, 0.7, 0.9, 0.1])
+    y_true = np.array([0, 1, 0, 1, 1, 0])
+    trainer = FraudModelTrainer()
+    results = trainer.evaluate_model(FixedModel(), 'fixed', y_prob, y_true)
+
+    assert list(results['predictions']) == [0, 1, 1, 1, 1, 0]
+    sweep = trainer.threshold_sweep('fixed', [DEFAULT_THRESHOLDS['medium']]).iloc[0]
+    assert results['precision'] == pytest.approx(sweep['precision'])
+    assert results['recall'] == pytest.approx(sweep['recall'])
+
+def test_report_confusion_counts_match_loop(scored):
+    pytest.importorskip('streamlit')
+    from frontend.pages.reports import threshold_confusion_counts
+
+    y_true, y_prob, _ = scored
+    thresholds = np.concatenate([np.unique(y_prob), [0.05, np.inf]])
+    tp, fp, tn, fn = threshold_confusion_counts(y_prob, y_true, thresholds)
+
+    for i, threshold in enumerate(thresholds):
+        assert (tp[i], fp[i], tn[i], fn[i]) == _loop_counts(y_true, y_prob, threshold)
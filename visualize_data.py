@@ -187,7 +187,7 @@ class FraudDataVisualizer:
         axes[1, 0].set_title('Top 10 Merchant States')
 
         # Fraud rate by chip usage
-        chip_fraud = self.df.groupby('Use Chip')['Is Fraud?'].mean() * 100
+        chip_fraud = self.df.groupby('Use Chip', observed=True)['Is Fraud?'].mean() * 100
         axes[1, 1].bar(range(len(chip_fraud)), chip_fraud.values, color='#e74c3c')
         axes[1, 1].set_xticks(range(len(chip_fraud)))
         axes[1, 1].set_xticklabels(chip_fraud.index, rotation=45)